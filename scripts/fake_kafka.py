@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""An in-process stand-in for a Kafka producer and broker."""
+
+import threading
+import time
+import zlib
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+# The fixed header of a Kafka record batch (magic v2), sent once per batch.
+RECORD_BATCH_OVERHEAD = 61
+
+
+@dataclass(frozen=True)
+class BrokerModel:
+    """
+    How long the simulated broker takes to answer a produce request.
+
+    The defaults approximate a broker in the same region: a few milliseconds of
+    round trip, a link shared with other traffic, and the extra wait for followers
+    to replicate a batch before ``acks=all`` is answered.
+    """
+
+    round_trip_ms: float = 2.0
+    bandwidth_bytes_per_second: float = 50 * 1024 * 1024
+    replication_ms: float = 3.0
+    partitions: int = 6
+
+
+class TransactionStateError(Exception):
+    """A transactional call was made in a state the producer does not allow it in."""
+
+
+class FakeMessage:
+    """A produced message, shaped like ``confluent_kafka.Message``."""
+
+    __slots__ = (
+        "_topic",
+        "_partition",
+        "_key",
+        "_value",
+        "_headers",
+        "_produced_at",
+        "_latency",
+        "_transaction",
+    )
+
+    def __init__(
+        self,
+        topic: str,
+        partition: int,
+        key: bytes | None,
+        value: bytes,
+        headers: list[tuple[str, bytes]] | None,
+    ) -> None:
+        self._topic = topic
+        self._partition = partition
+        self._key = key
+        self._value = value
+        self._headers = headers
+        self._produced_at = time.perf_counter()
+        self._latency: float | None = None
+        self._transaction: int | None = None
+
+    def topic(self) -> str:
+        return self._topic
+
+    def partition(self) -> int:
+        return self._partition
+
+    def key(self) -> bytes | None:
+        return self._key
+
+    def value(self) -> bytes:
+        return self._value
+
+    def headers(self) -> list[tuple[str, bytes]] | None:
+        return self._headers
+
+    def latency(self) -> float | None:
+        """Seconds from ``produce`` to the broker's acknowledgement."""
+        return self._latency
+
+    def __len__(self) -> int:
+        return len(self._value)
+
+
+def _compressor(codec: str) -> Callable[[bytes], bytes]:
+    """Returns the compression function for a ``compression.type`` value."""
+    if codec == "none":
+        return lambda data: data
+    if codec == "gzip":
+        return lambda data: zlib.compress(data, wbits=31)
+    if codec == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ValueError("compression.type=zstd needs the zstandard package") from e
+        return zstandard.ZstdCompressor().compress
+    if codec == "lz4":
+        try:
+            import lz4.frame
+        except ImportError as e:
+            raise ValueError("compression.type=lz4 needs the lz4 package") from e
+        return lz4.frame.compress
+    raise ValueError(f"Unsupported compression.type: {codec!r}")
+
+
+def _record_bytes(message: FakeMessage) -> bytes:
+    parts = [message._key or b"", message._value]
+    for name, header in message._headers or ():
+        parts += [name.encode("utf-8"), header or b""]
+    return b"".join(parts)
+
+
+class _Batch:
+    __slots__ = ("created_at", "size", "messages")
+
+    def __init__(self, created_at: float) -> None:
+        self.created_at = created_at
+        self.size = 0
+        self.messages: list[tuple[FakeMessage, Callable | None]] = []
+
+
+def _encode(data: str | bytes | None) -> bytes | None:
+    if data is None or isinstance(data, bytes):
+        return data
+    return data.encode("utf-8")
+
+
+class FakeProducer:
+    """
+    An in-process producer that batches like librdkafka and sends to a simulated broker.
+
+    It follows the ``confluent_kafka.Producer`` interface (``produce``, ``poll``,
+    ``flush`` and ``len()``) so code written against the real producer can run
+    against it without a broker, and it honours the settings that shape producer
+    throughput:
+
+    - ``linger.ms``: how long a partition's batch waits for more messages.
+    - ``batch.size``: the uncompressed bytes at which a batch is sent without waiting.
+    - ``compression.type``: ``none``, ``gzip``, or ``zstd``/``lz4`` if their packages
+      are installed. Compression runs for real, so its CPU cost is included.
+    - ``acks``: ``0`` completes on send, ``1`` after a round trip, ``all`` also waits
+      for replication.
+    - ``max.in.flight.requests.per.connection``: concurrent produce requests.
+
+    Delivery callbacks run from ``poll`` and ``flush`` on the caller's thread, as with
+    librdkafka. The wire bytes of every request are counted in ``bytes_sent``.
+    Sending runs on threads of the producer's own, which ``close`` stops.
+
+    With a ``transactional.id``, the producer follows the transactional API
+    (``init_transactions``, ``begin_transaction``, ``commit_transaction`` and
+    ``abort_transaction``) and only produces inside a transaction. Delivered
+    messages are kept in ``log``; ``messages`` reads them back as a consumer with
+    either isolation level would see them.
+    """
+
+    def __init__(
+        self, config: dict[str, Any] | None = None, broker: BrokerModel | None = None
+    ) -> None:
+        """
+        Initializes the producer and starts its sender thread.
+
+        Args:
+            config: librdkafka-style producer settings. Unknown keys are ignored.
+            broker: The simulated broker. Defaults to ``BrokerModel()``.
+
+        Raises:
+            ValueError: If the compression codec is not supported.
+        """
+        config = config or {}
+        self.linger = float(config.get("linger.ms", 5)) / 1000
+        self.batch_size = int(config.get("batch.size", 1_000_000))
+        self.acks = str(config.get("acks", "all"))
+        self.max_in_flight = int(config.get("max.in.flight.requests.per.connection", 5))
+        self._compress = _compressor(str(config.get("compression.type", "none")))
+        self.broker = broker or BrokerModel()
+
+        self.transactional_id = config.get("transactional.id")
+        self.bytes_sent = 0
+        self.requests_sent = 0
+        self.log: list[FakeMessage] = []
+        self._transactions: list[str] = []
+        self._transaction: int | None = None
+        self._transactions_ready = False
+        self._pending = 0
+        self._batches: dict[tuple[str, int], deque[_Batch]] = {}
+        self._deliveries: deque[tuple[Callable, FakeMessage]] = deque()
+        self._in_flight = threading.Semaphore(self.max_in_flight)
+        self._condition = threading.Condition()
+        self._flushing = 0
+        self._stopping = threading.Event()
+        self._transmitters: list[threading.Thread] = []
+        self._sender = threading.Thread(
+            target=self._send_batches, name="fake-kafka-sender", daemon=True
+        )
+        self._sender.start()
+
+    def produce(
+        self,
+        topic: str,
+        value: str | bytes | None = None,
+        key: str | bytes | None = None,
+        partition: int = -1,
+        on_delivery: Callable[[Any, FakeMessage], None] | None = None,
+        headers: dict[str, str | bytes] | list[tuple[str, str | bytes]] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Queues a message for its partition's next batch."""
+        key = _encode(key)
+        value = _encode(value) or b""
+        if partition < 0:
+            partition = (
+                zlib.crc32(key) % self.broker.partitions if key is not None else 0
+            )
+        if isinstance(headers, dict):
+            headers = list(headers.items())
+        if headers is not None:
+            headers = [(name, _encode(header)) for name, header in headers]
+        message = FakeMessage(topic, partition, key, value, headers)
+        if self.transactional_id is not None:
+            if self._transaction is None:
+                raise TransactionStateError(
+                    "A transactional producer can only produce inside a transaction"
+                )
+            message._transaction = self._transaction
+        size = len(_record_bytes(message))
+        callback = on_delivery or kwargs.get("callback")
+
+        with self._condition:
+            batches = self._batches.setdefault((topic, partition), deque())
+            # A batch is closed once the next message would take it past batch.size.
+            if not batches or (
+                batches[-1].messages and batches[-1].size + size > self.batch_size
+            ):
+                batches.append(_Batch(message._produced_at))
+                if len(batches) > 1:
+                    self._condition.notify_all()
+            batches[-1].messages.append((message, callback))
+            batches[-1].size += size
+            self._pending += 1
+
+    def _ready_batch(
+        self, now: float
+    ) -> list[tuple[FakeMessage, Callable | None]] | None:
+        """Pops the oldest batch that is full or has lingered long enough. Called with the lock held."""
+        for topic_partition, batches in self._batches.items():
+            batch = batches[0]
+            if (
+                self._flushing
+                or len(batches) > 1
+                or batch.size >= self.batch_size
+                or now - batch.created_at >= self.linger
+            ):
+                batches.popleft()
+                if not batches:
+                    del self._batches[topic_partition]
+                return batch.messages
+        return None
+
+    def _send_batches(self) -> None:
+        while True:
+            # Batches keep filling up while every request slot is taken.
+            self._in_flight.acquire()
+            with self._condition:
+                batch = self._ready_batch(time.perf_counter())
+                while batch is None:
+                    if self._stopping.is_set():
+                        self._in_flight.release()
+                        return
+                    if self._batches:
+                        oldest = min(
+                            batches[0].created_at for batches in self._batches.values()
+                        )
+                        timeout = max(0.0, oldest + self.linger - time.perf_counter())
+                    else:
+                        timeout = None
+                    self._condition.wait(timeout)
+                    batch = self._ready_batch(time.perf_counter())
+                transmitter = threading.Thread(
+                    target=self._transmit, args=(batch,), daemon=True
+                )
+                self._transmitters = [
+                    thread for thread in self._transmitters if thread.is_alive()
+                ]
+                self._transmitters.append(transmitter)
+            transmitter.start()
+
+    def _transmit(self, messages: list[tuple[FakeMessage, Callable | None]]) -> None:
+        try:
+            # Keys, values and headers are all compressed together in a record batch.
+            records = b"".join(_record_bytes(message) for message, _ in messages)
+            wire_bytes = RECORD_BATCH_OVERHEAD + len(self._compress(records))
+            seconds = wire_bytes / self.broker.bandwidth_bytes_per_second
+            if self.acks != "0":
+                seconds += self.broker.round_trip_ms / 1000
+            if self.acks in ("all", "-1"):
+                seconds += self.broker.replication_ms / 1000
+            time.sleep(seconds)
+        finally:
+            self._in_flight.release()
+
+        delivered_at = time.perf_counter()
+        with self._condition:
+            self.bytes_sent += wire_bytes
+            self.requests_sent += 1
+            for message, callback in messages:
+                self.log.append(message)
+                message._latency = delivered_at - message._produced_at
+                if callback is not None:
+                    self._deliveries.append((callback, message))
+            self._pending -= len(messages)
+            self._condition.notify_all()
+
+    def poll(self, timeout: float | None = None) -> int:
+        """Serves pending delivery callbacks and returns how many ran."""
+        served = 0
+        while True:
+            with self._condition:
+                if not self._deliveries:
+                    return served
+                callback, message = self._deliveries.popleft()
+            callback(None, message)
+            served += 1
+
+    def flush(self, timeout: float | None = None) -> int:
+        """
+        Sends every queued batch without lingering and waits for their acknowledgements.
+
+        Returns:
+            The number of messages still undelivered when ``timeout`` expired.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+        try:
+            while True:
+                self.poll()
+                with self._condition:
+                    if self._pending == 0 and not self._deliveries:
+                        return 0
+                    remaining = (
+                        None if deadline is None else deadline - time.perf_counter()
+                    )
+                    if remaining is not None and remaining <= 0:
+                        return self._pending
+                    if not self._deliveries:
+                        self._condition.wait(remaining)
+        finally:
+            with self._condition:
+                self._flushing -= 1
+
+    def close(self, timeout: float | None = None) -> int:
+        """
+        Flushes the producer, then stops its sender thread and waits for the requests in flight.
+
+        Returns:
+            The number of messages still undelivered when ``timeout`` expired.
+        """
+        remaining = self.flush(timeout)
+        with self._condition:
+            self._stopping.set()
+            self._condition.notify_all()
+        self._sender.join()
+        with self._condition:
+            transmitters = list(self._transmitters)
+        for transmitter in transmitters:
+            transmitter.join()
+        return remaining
+
+    def init_transactions(self, timeout: float | None = None) -> None:
+        """Prepares the producer for transactions, aborting one left open by an earlier session."""
+        if self.transactional_id is None:
+            raise TransactionStateError("Transactions need a transactional.id")
+        if self._transaction is not None:
+            self.abort_transaction(timeout)
+        self._transactions_ready = True
+
+    def begin_transaction(self) -> None:
+        """Starts a transaction that the following messages are produced in."""
+        if not self._transactions_ready:
+            raise TransactionStateError("init_transactions must be called first")
+        if self._transaction is not None:
+            raise TransactionStateError("A transaction is already open")
+        self._transactions.append("open")
+        self._transaction = len(self._transactions) - 1
+
+    def commit_transaction(self, timeout: float | None = None) -> None:
+        """Delivers the transaction's messages and makes them visible to read-committed consumers."""
+        self._end_transaction("committed", timeout)
+
+    def abort_transaction(self, timeout: float | None = None) -> None:
+        """Ends the transaction so that read-committed consumers never see its messages."""
+        self._end_transaction("aborted", timeout)
+
+    def _end_transaction(self, outcome: str, timeout: float | None) -> None:
+        if self._transaction is None:
+            raise TransactionStateError("No transaction is open")
+        if self.flush(timeout):
+            raise TransactionStateError(
+                "Timed out waiting for the transaction's messages to be delivered"
+            )
+        self._transactions[self._transaction] = outcome
+        self._transaction = None
+
+    def messages(self, isolation_level: str = "read_committed") -> list[FakeMessage]:
+        """
+        Returns the delivered messages a consumer with ``isolation_level`` would read.
+
+        ``read_uncommitted`` sees every message. ``read_committed`` skips those of
+        aborted transactions and, as with Kafka's last stable offset, reads a
+        partition only up to the first message of a transaction still open.
+        """
+        with self._condition:
+            log = list(self.log)
+        if isolation_level == "read_uncommitted":
+            return log
+        visible, blocked = [], set()
+        for message in log:
+            topic_partition = (message._topic, message._partition)
+            if topic_partition in blocked:
+                continue
+            outcome = (
+                "committed"
+                if message._transaction is None
+                else self._transactions[message._transaction]
+            )
+            if outcome == "open":
+                blocked.add(topic_partition)
+            elif outcome == "committed":
+                visible.append(message)
+        return visible
+
+    def __len__(self) -> int:
+        return self._pending + len(self._deliveries)
@@ -0,0 +1,176 @@
+import argparse
+import itertools
+import json
+import statistics
+import time
+import uuid
+
+from scripts.fake_kafka import BrokerModel, FakeProducer
+from scripts.synthetic_payload import build_response
+from src.services.parser import invoice_metadata, parse_invoices
+
+SETTINGS = {
+    "linger_ms": "linger.ms",
+    "batch_size": "batch.size",
+    "compression": "compression.type",
+    "acks": "acks",
+    "max_in_flight": "max.in.flight.requests.per.connection",
+}
+
+
+def build_messages(
+    invoices: int, lines_per_invoice: int, keys: str
+) -> list[tuple[str, str]]:
+    """Returns (key, value) pairs shaped like the messages KafkaProducerClient publishes."""
+    body = build_response(invoices, lines_per_invoice).decode("utf-8")
+    trace_id = str(uuid.uuid4())
+    messages = []
+    for invoice in parse_invoices(body):
+        # The service keys every message of a run by its trace ID.
+        key = invoice_metadata(invoice)[1] if keys == "vendor" else trace_id
+        messages.append((key, json.dumps({"invoice": invoice})))
+    return messages
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Returns the value below which ``fraction`` of ``values`` fall."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(producer, topic: str, messages: list[tuple[str, str]]) -> dict:
+    """Produces every message, flushes and returns the throughput and latency measured."""
+    latencies = []
+
+    def on_delivery(err, message) -> None:
+        if err is None:
+            latencies.append(message.latency())
+
+    start = time.perf_counter()
+    for key, value in messages:
+        while True:
+            try:
+                producer.produce(
+                    topic,
+                    value=value,
+                    key=key,
+                    headers={"trace_id": key},
+                    on_delivery=on_delivery,
+                )
+                break
+            except BufferError:
+                # The real producer's local queue is full; wait for deliveries.
+                producer.poll(0.1)
+        producer.poll(0)
+    remaining = producer.flush(60)
+    seconds = time.perf_counter() - start
+
+    payload_bytes = sum(len(key) + len(value) for key, value in messages)
+    return {
+        "messages_per_second": len(latencies) / seconds,
+        "payload_mb_per_second": payload_bytes / seconds / 1e6,
+        "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+        "latency_p95_ms": percentile(latencies, 0.95) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "latency_mean_ms": statistics.fmean(latencies) * 1000,
+        "payload_bytes": payload_bytes,
+        "wire_bytes": getattr(producer, "bytes_sent", None),
+        "requests": getattr(producer, "requests_sent", None),
+        "undelivered": remaining,
+    }
+
+
+def csv(cast):
+    """Returns an argparse type that splits a comma-separated value and casts each item."""
+    return lambda value: [cast(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure Kafka producer throughput and latency over a grid of producer settings"
+    )
+    parser.add_argument("--invoices", type=int, default=5_000)
+    parser.add_argument("--lines-per-invoice", type=int, default=5)
+    parser.add_argument(
+        "--keys",
+        choices=("trace", "vendor"),
+        default="trace",
+        help="Key messages by one trace ID per run, as the service does, or by vendor",
+    )
+    parser.add_argument("--linger-ms", type=csv(float), default=[0, 5, 20])
+    parser.add_argument(
+        "--batch-size", type=csv(int), default=[16_384, 131_072, 1_000_000]
+    )
+    parser.add_argument("--compression", type=csv(str), default=["none", "gzip"])
+    parser.add_argument("--acks", type=csv(str), default=["1", "all"])
+    parser.add_argument("--max-in-flight", type=csv(int), default=[1, 5])
+    parser.add_argument(
+        "--round-trip-ms", type=float, default=BrokerModel.round_trip_ms
+    )
+    parser.add_argument(
+        "--replication-ms", type=float, default=BrokerModel.replication_ms
+    )
+    parser.add_argument(
+        "--bandwidth-mb",
+        type=float,
+        default=BrokerModel.bandwidth_bytes_per_second / 1024 / 1024,
+    )
+    parser.add_argument(
+        "--bootstrap-servers",
+        help="Produce to this broker with confluent_kafka instead of the in-process fake",
+    )
+    parser.add_argument("--topic", default="producer-sweep")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    messages = build_messages(args.invoices, args.lines_per_invoice, args.keys)
+    broker = BrokerModel(
+        round_trip_ms=args.round_trip_ms,
+        replication_ms=args.replication_ms,
+        bandwidth_bytes_per_second=args.bandwidth_mb * 1024 * 1024,
+    )
+    if args.bootstrap_servers:
+        from confluent_kafka import Producer
+
+    results = []
+    grid = itertools.product(
+        args.linger_ms, args.batch_size, args.compression, args.acks, args.max_in_flight
+    )
+    for values in grid:
+        settings = dict(zip(SETTINGS, values))
+        config = {SETTINGS[name]: value for name, value in settings.items()}
+        if args.bootstrap_servers:
+            producer = Producer({"bootstrap.servers": args.bootstrap_servers, **config})
+            results.append({**settings, **run(producer, args.topic, messages)})
+        else:
+            producer = FakeProducer(config, broker)
+            try:
+                results.append({**settings, **run(producer, args.topic, messages)})
+            finally:
+                producer.close()
+
+    results.sort(key=lambda result: result["messages_per_second"], reverse=True)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'linger':>7}{'batch':>9}{'codec':>6}{'acks':>5}{'infl':>5}"
+        f"{'msg/s':>10}{'MB/s':>7}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}{'wire MB':>9}{'reqs':>6}"
+    )
+    for result in results:
+        wire = (
+            "-" if result["wire_bytes"] is None else f"{result['wire_bytes'] / 1e6:.2f}"
+        )
+        requests = "-" if result["requests"] is None else result["requests"]
+        print(
+            f"{result['linger_ms']:>7g}{result['batch_size']:>9}{result['compression']:>6}"
+            f"{result['acks']:>5}{result['max_in_flight']:>5}"
+            f"{result['messages_per_second']:>10.0f}{result['payload_mb_per_second']:>7.1f}"
+            f"{result['latency_p50_ms']:>8.1f}{result['latency_p95_ms']:>8.1f}{result['latency_p99_ms']:>8.1f}"
+            f"{wire:>9}{requests:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import logging
+import os
+import time
+
+from x35_json_logging import dynamic_context, initialize_logging
+
+from src.services.run_logging import InvoiceLogSampler, RunSummary
+
+logger = logging.getLogger("x35.logging_benchmark")
+
+
+def legacy_loop(invoice_ids: list[str]) -> None:
+    """The per-invoice logging pattern used before sampling was introduced."""
+    for invoice_id in invoice_ids:
+        with dynamic_context(invoice_id=invoice_id, vendor_id="vendor"):
+            logger.info(f"Publishing invoice {invoice_id}.")
+
+
+def sampled_loop(invoice_ids: list[str], sample_rate: int) -> None:
+    """The sampled, lazily formatted pattern used by publish_invoices."""
+    sampler = InvoiceLogSampler(sample_rate)
+    summary = RunSummary()
+    with summary.timed("publish"):
+        for invoice_id in invoice_ids:
+            if sampler.should_log():
+                with dynamic_context(invoice_id=invoice_id, vendor_id="vendor"):
+                    logger.info("Publishing invoice %s.", invoice_id)
+            summary.count("invoices_published")
+    logger.info("Invoice processing run finished.", extra=summary.as_extra())
+
+
+def baseline_loop(invoice_ids: list[str]) -> None:
+    """The same loop with no logging at all, used to isolate logging overhead."""
+    for _ in invoice_ids:
+        pass
+
+
+def measure(loop, invoice_ids: list[str], repeat: int, *args) -> float:
+    """Returns the fastest time in seconds of ``repeat`` runs of ``loop``."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loop(invoice_ids, *args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure per-invoice logging overhead in each logging mode"
+    )
+    parser.add_argument("--invoices", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sample-rates", type=int, nargs="+", default=[1, 10, 100, 0])
+    args = parser.parse_args()
+
+    initialize_logging()
+    invoice_ids = [str(i) for i in range(args.invoices)]
+    # Keep the formatter in the measurement but discard the output.
+    with open(os.devnull, "w") as devnull:
+        handlers = [
+            handler
+            for handler in logging.getLogger().handlers
+            if isinstance(handler, logging.StreamHandler)
+        ]
+        streams = [handler.setStream(devnull) for handler in handlers]
+        try:
+            baseline = measure(baseline_loop, invoice_ids, args.repeat)
+            results = [
+                (
+                    "legacy (f-string, every invoice)",
+                    measure(legacy_loop, invoice_ids, args.repeat),
+                )
+            ]
+            for rate in args.sample_rates:
+                label = "off (summary only)" if rate == 0 else f"sampled 1/{rate}"
+                results.append(
+                    (label, measure(sampled_loop, invoice_ids, args.repeat, rate))
+                )
+        finally:
+            for handler, stream in zip(handlers, streams):
+                handler.setStream(stream)
+
+    print(f"{'mode':<36}{'total ms':>12}{'overhead ns/invoice':>22}")
+    for label, seconds in results:
+        overhead_ns = (seconds - baseline) / args.invoices * 1e9
+        print(f"{label:<36}{seconds * 1e3:>12.2f}{overhead_ns:>22.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import gc
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable
+
+import lxml
+
+from scripts.synthetic_payload import build_response
+from src.services.change_detection import fingerprint
+from src.services.parser import invoice_metadata, parse_invoice_slices, parse_invoices
+
+# Named response shapes, each generated deterministically from its arguments.
+CORPUS = {
+    "baseline": {"invoices": 2000, "lines_per_invoice": 5},
+    "many_lines": {"invoices": 200, "lines_per_invoice": 60},
+    "namespaced": {"invoices": 2000, "lines_per_invoice": 5, "namespace": True},
+    "escaped": {"invoices": 2000, "lines_per_invoice": 5, "escaped": True},
+    "unicode": {"invoices": 2000, "lines_per_invoice": 5, "unicode": True},
+}
+
+ENVELOPE_SIZE = 20
+
+# Short benchmarks are looped until a timing covers at least this long, so timer
+# resolution and scheduling jitter stay small against the measurement.
+MIN_TIMING_SECONDS = 0.05
+
+
+def calibration() -> int:
+    """A fixed pure-Python workload that tracks the speed of the machine at the moment."""
+    return sum(index * index % 7 for index in range(200_000))
+
+
+def _benchmarks(body: bytes) -> dict[str, Callable[[], object]]:
+    """Returns the benchmarks for one response, with their inputs prepared up front."""
+    text = body.decode("utf-8")
+    invoices = parse_invoices(text)
+    slices = parse_invoice_slices(body)
+
+    def metadata():
+        for invoice in invoices:
+            invoice_metadata(invoice)
+
+    def fingerprints():
+        for invoice in invoices:
+            fingerprint(invoice)
+
+    def messages():
+        # What the Kafka client builds and the producer serializes per invoice.
+        for invoice in slices:
+            json.dumps({"invoice": str(invoice, "utf-8")}).encode("utf-8")
+
+    def envelopes():
+        for start in range(0, len(invoices), ENVELOPE_SIZE):
+            json.dumps({"invoices": invoices[start : start + ENVELOPE_SIZE]}).encode(
+                "utf-8"
+            )
+
+    return {
+        "parse_invoices": lambda: parse_invoices(text),
+        "parse_invoice_slices": lambda: parse_invoice_slices(body),
+        "invoice_metadata": metadata,
+        "fingerprint": fingerprints,
+        "serialize_message": messages,
+        "serialize_envelope": envelopes,
+    }
+
+
+def _time(function: Callable[[], object], number: int = 1) -> float:
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - start) / number
+
+
+def measure(
+    function: Callable[[], object], repeat: int
+) -> tuple[list[float], list[float]]:
+    """
+    Times ``function`` ``repeat`` times, each right after a call of ``calibration``.
+
+    Returns:
+        The wall times per call, and the ratio of each to the calibration call
+        before it. Pairing the calls means a machine that is slower for a while
+        slows both down alike, so the ratios hold steady where wall times do not.
+    """
+    number = max(1, math.ceil(MIN_TIMING_SECONDS / _time(function)))
+    calibration()
+    timings, ratios = [], []
+    for _ in range(repeat):
+        reference = _time(calibration)
+        timings.append(_time(function, number))
+        ratios.append(timings[-1] / reference)
+    return timings, ratios
+
+
+def run(cases: list[str], repeat: int, scale: float) -> dict:
+    results = {}
+    for case in cases:
+        shape = dict(CORPUS[case])
+        shape["invoices"] = max(1, round(shape["invoices"] * scale))
+        body = build_response(**shape)
+        for name, function in _benchmarks(body).items():
+            timings, ratios = measure(function, repeat)
+            results[f"{case}/{name}"] = {
+                "min_seconds": min(timings),
+                "median_seconds": statistics.median(timings),
+                "relative": statistics.median(ratios),
+                "invoices": shape["invoices"],
+                "bytes": len(body),
+            }
+            print(
+                f"{case + '/' + name:<36}{min(timings) * 1e3:>10.2f} ms"
+                f"{min(timings) / shape['invoices'] * 1e6:>10.2f} us/invoice",
+                file=sys.stderr,
+            )
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "lxml": lxml.__version__,
+            "machine": platform.machine(),
+            "scale": scale,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    threshold: float,
+    absolute: bool = False,
+    allow_missing: bool = False,
+) -> bool:
+    """
+    Prints the change of each benchmark and returns True if none regressed.
+
+    By default the median time relative to the calibration workload is compared,
+    which cancels out differences in machine speed. With ``absolute`` the fastest
+    wall time of the repeats is compared instead. A benchmark of the baseline
+    missing from the current results fails the comparison, unless
+    ``allow_missing`` is set, e.g. when only some cases were run.
+    """
+    key = "min_seconds" if absolute else "relative"
+    if baseline["environment"] != current["environment"]:
+        print(
+            f"warning: environments differ: {baseline['environment']} vs {current['environment']}",
+            file=sys.stderr,
+        )
+    passed = True
+    print(f"{'benchmark':<36}{'baseline ms':>12}{'current ms':>12}{'change':>9}")
+    for name, before in baseline["results"].items():
+        after = current["results"].get(name)
+        if after is None:
+            passed = passed and allow_missing
+            print(
+                f"{name:<36}{before['min_seconds'] * 1e3:>12.2f}{'missing':>12}"
+                f"{'' if allow_missing else '  FAILED'}"
+            )
+            continue
+        change = after[key] / before[key] - 1
+        regressed = change > threshold
+        passed = passed and not regressed
+        print(
+            f"{name:<36}{before['min_seconds'] * 1e3:>12.2f}"
+            f"{after['min_seconds'] * 1e3:>12.2f}{change:>+9.1%}"
+            f"{'  REGRESSED' if regressed else ''}"
+        )
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark invoice parsing, metadata extraction and message serialization"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser(
+        "run", help="Run the benchmarks and print or save the results"
+    )
+    run_parser.add_argument("--output", help="Write the results to this JSON file")
+    run_parser.add_argument("--repeat", type=int, default=7)
+    run_parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply the invoice count of every case",
+    )
+    run_parser.add_argument(
+        "--case", choices=CORPUS, action="append", help="Only run these cases"
+    )
+
+    compare_parser = commands.add_parser(
+        "compare",
+        help="Exit with an error if any benchmark regressed against a baseline",
+    )
+    compare_parser.add_argument("baseline", help="Results saved from an earlier run")
+    compare_parser.add_argument("current", help="Results of the run to check")
+    compare_parser.add_argument(
+        "--absolute",
+        action="store_true",
+        help="Compare wall times instead of times relative to the calibration workload",
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="The slowdown tolerated before a benchmark counts as regressed, e.g. 0.15 for 15%%",
+    )
+    compare_parser.add_argument(
+        "--allow-missing",
+        action="store_true",
+        help="Do not fail on baseline benchmarks missing from the current results, e.g. after --case",
+    )
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(args.case or list(CORPUS), args.repeat, args.scale)
+        output = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(output)
+        else:
+            print(output)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if not compare(
+        baseline, current, args.threshold, args.absolute, args.allow_missing
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import gc
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from lxml import etree
+
+from scripts.synthetic_payload import build_response
+from src.services.parser import parse_invoice_slices, parse_invoices
+
+MODES = ("strings", "slices")
+
+
+def consume_strings(body: bytes) -> int:
+    """The string path: one re-serialized string per invoice, re-encoded and re-parsed to publish."""
+    invoices = parse_invoices(body.decode("utf-8"))
+    size = 0
+    for invoice in invoices:
+        invoice_xml = etree.fromstring(invoice.encode("utf-8"))
+        invoice_xml.findtext("invoice_id")
+        size += len(invoice)
+    return size
+
+
+def consume_slices(body: bytes) -> int:
+    """The zero-copy path: views into one buffer, each decoded only when handed to Kafka."""
+    invoices = parse_invoice_slices(body)
+    size = 0
+    for index, invoice in enumerate(invoices):
+        invoices.metadata[index]
+        size += len(str(invoice, "utf-8"))
+    return size
+
+
+def run(mode: str, invoices: int) -> None:
+    body = build_response(invoices)
+    consume = consume_strings if mode == "strings" else consume_slices
+    gc.collect()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    consume(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # tracemalloc slows down Python allocations, so time a separate untraced pass.
+    gc.collect()
+    start = time.perf_counter()
+    consume(body)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux; it also covers libxml2 allocations tracemalloc cannot see.
+    print(f"{mode}\t{len(body)}\t{seconds}\t{peak}\t{(rss_after - rss_before) * 1024}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the memory used by string and zero-copy invoice parsing"
+    )
+    parser.add_argument("--invoices", type=int, default=100_000)
+    parser.add_argument(
+        "--mode", choices=MODES, help="Run a single mode in this process"
+    )
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args.mode, args.invoices)
+        return
+
+    # Each mode runs in a fresh process so peak RSS is not shared between them.
+    print(
+        f"{'mode':<10}{'payload MB':>12}{'seconds':>10}{'py peak MB':>13}{'rss growth MB':>16}"
+    )
+    for mode in MODES:
+        output = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--mode",
+                mode,
+                "--invoices",
+                str(args.invoices),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        _, payload, seconds, peak, rss = output.split()
+        print(
+            f"{mode:<10}{int(payload) / 1e6:>12.1f}{float(seconds):>10.2f}"
+            f"{int(peak) / 1e6:>13.1f}{int(rss) / 1e6:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Republishes archived Bamboorose responses to Kafka for a range of windows.
+
+Every archived response whose available_timestamp window falls in ``[start, end]``
+is read from the response archive and its invoices are published again, without
+calling Bamboorose. The script reads the same environment as the service: the
+archive must be enabled (``ARCHIVE_ENABLED=true``, with ``ARCHIVE_LOCATION``
+pointing at it) and the ``X35_KAFKA_*`` settings select the broker and topic.
+With ``X35_KAFKA_TRANSACTIONAL_ID`` set, each response is republished in a
+transaction of its own.
+
+Usage, from the project root:
+
+    $ PYTHONPATH=. python scripts/replay_archive.py 2023-01-01T00:00:00Z 2023-01-02T00:00:00Z
+"""
+
+import argparse
+import asyncio
+
+from x35_json_logging import initialize_logging
+
+from src.app import get_response_archive, replay_invoices
+from src.clients.kafka import get_kafka_producer_client
+from src.settings.config import get_settings
+
+
+async def replay(start: str, end: str) -> int:
+    """Republishes the archived windows in ``[start, end]`` and returns the number of invoices."""
+    archive = get_response_archive(get_settings())
+    if archive is None:
+        raise ValueError("ARCHIVE_ENABLED must be true to replay from the archive")
+
+    kafka_producer_client = get_kafka_producer_client()
+    try:
+        return await replay_invoices(archive, kafka_producer_client, start, end)
+    finally:
+        await asyncio.to_thread(kafka_producer_client.producer.flush)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Republish archived Bamboorose responses to Kafka"
+    )
+    parser.add_argument(
+        "start",
+        help="First available_timestamp window to replay, e.g. 2023-01-01T00:00:00Z",
+    )
+    parser.add_argument("end", help="Last available_timestamp window to replay")
+    args = parser.parse_args()
+
+    initialize_logging()
+    replayed = asyncio.run(replay(args.start, args.end))
+    print(f"Replayed {replayed} invoices from {args.start} to {args.end}")
+
+
+if __name__ == "__main__":
+    main()
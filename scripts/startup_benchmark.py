@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STAGES = ("import", "create_app", "lifespan")
+
+
+def measure_once() -> dict[str, float]:
+    """Measures each startup stage in this (fresh) process."""
+    timings = {}
+    start = time.perf_counter()
+    from src.app import create_app
+
+    timings["import"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app = create_app()
+    timings["create_app"] = time.perf_counter() - start
+
+    async def ready() -> None:
+        start = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            timings["lifespan"] = time.perf_counter() - start
+
+    asyncio.run(ready())
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure import and lifespan-to-ready time of the service"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--max-ready-seconds",
+        type=float,
+        help="Exit with an error if the median total startup time exceeds this",
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once()))
+        return
+
+    # Every run is a fresh interpreter so nothing is already imported or cached.
+    # The drain deadline is zeroed so leaving the lifespan does not wait on the
+    # first ingest run.
+    env = {**os.environ, "APP_SHUTDOWN_DRAIN_SECONDS": "0"}
+    runs = []
+    for _ in range(args.repeat):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child"],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=env,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'stage':<12}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for stage in STAGES:
+        values = [run[stage] * 1e3 for run in runs]
+        print(
+            f"{stage:<12}{statistics.median(values):>12.1f}{min(values):>10.1f}{max(values):>10.1f}"
+        )
+    total = statistics.median(sum(run[stage] for stage in STAGES) for run in runs)
+    print(f"{'total':<12}{total * 1e3:>12.1f}")
+
+    if args.max_ready_seconds is not None and total > args.max_ready_seconds:
+        sys.exit(
+            f"Startup took {total:.3f}s, above the {args.max_ready_seconds}s budget"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import random
+from xml.sax.saxutils import escape
+
+ENVELOPE = (
+    '<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">'
+    "<soapenv:Body>"
+    '<ns1:getCommercialInvoicesByAvailableTimestampResponse xmlns:ns1="http://services.bamboorose.com">'
+    "<ns1:return>{payload}</ns1:return>"
+    "</ns1:getCommercialInvoicesByAvailableTimestampResponse>"
+    "</soapenv:Body>"
+    "</soapenv:Envelope>"
+)
+
+INVOICE = (
+    "<{tag}>"
+    "<invoice_id>INV-{index:08d}</invoice_id>"
+    "<vendor_id>V-{vendor:04d}</vendor_id>"
+    "<vendor_name>{vendor_name}</vendor_name>"
+    "<invoice_date>2023-01-01</invoice_date>"
+    "<currency>USD</currency>"
+    "{lines}"
+    "</{tag}>"
+)
+
+LINE = (
+    "<line>"
+    "<sku>SKU-{sku:06d}</sku>"
+    "<description>{description}</description>"
+    "<quantity>{quantity}</quantity>"
+    "<unit_price>{price:.2f}</unit_price>"
+    "</line>"
+)
+
+# Namespace prefix used for invoice elements when a namespace is requested.
+INVOICE_NAMESPACE = "urn:bamboorose:invoice"
+
+# Multi-byte text in several scripts, so UTF-8 lengths differ from character counts.
+UNICODE_WORDS = (
+    "Größe",
+    "façade",
+    "naïve",
+    "Ærø",
+    "żółć",
+    "Ελληνικά",
+    "кириллица",
+    "עברית",
+    "العربية",
+    "हिन्दी",
+    "日本語",
+    "中文",
+    "한국어",
+    "✓",
+    "€",
+    "😀",
+)
+
+
+def _text(rng: random.Random, sku: int, unicode: bool) -> str:
+    if not unicode:
+        return f"Synthetic item {sku} &amp; accessories"
+    return " ".join(rng.choice(UNICODE_WORDS) for _ in range(6)) + f" {sku} &amp; co"
+
+
+def build_document(
+    invoices: int,
+    lines_per_invoice: int = 5,
+    seed: int = 0,
+    namespace: bool = False,
+    unicode: bool = False,
+) -> str:
+    """
+    Returns an inner Bamboorose document with ``invoices`` synthetic invoices.
+
+    The same arguments always produce the same document.
+
+    Args:
+        invoices: The number of invoices.
+        lines_per_invoice: The number of line items in each invoice.
+        seed: Seeds the random ids, quantities and prices.
+        namespace: Whether invoice elements carry a namespace prefix declared on
+            the document element.
+        unicode: Whether names and descriptions are multi-byte text in several scripts.
+    """
+    rng = random.Random(seed)
+    if namespace:
+        tag = "inv:invoice"
+        parts = [
+            "<?xml version='1.0' encoding='UTF-8'?>"
+            f'<document xmlns:inv="{INVOICE_NAMESPACE}">'
+        ]
+    else:
+        tag = "invoice"
+        parts = ["<?xml version='1.0' encoding='UTF-8'?><document>"]
+    for index in range(invoices):
+        lines = []
+        for _ in range(lines_per_invoice):
+            sku = rng.randrange(1_000_000)
+            lines.append(
+                LINE.format(
+                    sku=sku,
+                    description=_text(rng, sku, unicode),
+                    quantity=rng.randrange(1, 100),
+                    price=rng.uniform(1, 500),
+                )
+            )
+        vendor = rng.randrange(500)
+        parts.append(
+            INVOICE.format(
+                tag=tag,
+                index=index,
+                vendor=vendor,
+                vendor_name=_text(rng, vendor, unicode),
+                lines="".join(lines),
+            )
+        )
+    parts.append("</document>")
+    return "".join(parts)
+
+
+def build_response(
+    invoices: int,
+    lines_per_invoice: int = 5,
+    seed: int = 0,
+    namespace: bool = False,
+    unicode: bool = False,
+    escaped: bool = False,
+) -> bytes:
+    """
+    Returns a UTF-8 encoded SOAP response carrying ``invoices`` synthetic invoices.
+
+    The inner document is wrapped in a CDATA section, as Bamboorose sends it, or
+    XML-escaped into the ``return`` element's text with ``escaped``.
+    """
+    document = build_document(invoices, lines_per_invoice, seed, namespace, unicode)
+    payload = escape(document) if escaped else f"<![CDATA[{document}]]>"
+    return ENVELOPE.format(payload=payload).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic Bamboorose response for benchmarks"
+    )
+    parser.add_argument("output", help="The file to write the response to")
+    parser.add_argument("--invoices", type=int, default=100_000)
+    parser.add_argument("--lines-per-invoice", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--namespace",
+        action="store_true",
+        help="Prefix invoice elements with a namespace",
+    )
+    parser.add_argument(
+        "--unicode",
+        action="store_true",
+        help="Use multi-byte text in names and descriptions",
+    )
+    parser.add_argument(
+        "--escaped",
+        action="store_true",
+        help="Escape the inner document instead of wrapping it in CDATA",
+    )
+    args = parser.parse_args()
+
+    body = build_response(
+        args.invoices,
+        args.lines_per_invoice,
+        args.seed,
+        namespace=args.namespace,
+        unicode=args.unicode,
+        escaped=args.escaped,
+    )
+    with open(args.output, "wb") as f:
+        f.write(body)
+    print(f"Wrote {args.invoices} invoices ({len(body) / 1e6:.1f} MB) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,105 +2,1062 @@
 """FastAPI application factory."""
 import asyncio
 import logging
+import math
+import os
+import sys
 import time
 import uuid
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, closing, nullcontext
+from functools import partial
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
 
 from fastapi import FastAPI, Request
-from lxml import etree
+from prometheus_client import multiprocess
 from x35_fastapi import FastAPIAppBuilder, CustomHeaderMiddleware
 from x35_json_logging import initialize_logging, trace_context, dynamic_context
 
 from src.clients.bamboorose import BambooroseClient, get_bamboorose_client
-from src.clients.kafka import KafkaProducerClient, get_kafka_producer_client
+from src.clients.blob_store import get_blob_store
+from src.clients.resilience import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    HedgePolicy,
+    RequestGuard,
+    RetryBudget,
+)
+from src.routes.ingest import ingest_router
 from src.routes.metrics import metrics_router
+from src.routes.status import status_router
+from src.routes.traces import traces_router
+from src.services.archive import ResponseArchive
+from src.services.backlog import BacklogTracker
+from src.services.change_detection import ChangeDetector, StagedChangeDetector, fingerprint
+from src.services.checkpoint import CheckpointStore
+from src.services.envelopes import EnvelopeBatcher
+from src.services.exposition import MetricsExposition, get_registry, multiprocess_enabled
+from src.services.lanes import (
+    BACKGROUND_LANE,
+    LANES,
+    LIVE_LANE,
+    finish_backfill,
+    hand_off_backfill,
+    lane_name,
+    split_lane_name,
+)
+from src.services.leader import LeaderLock
+from src.services.memory_budget import (
+    DEFAULT_FETCH_RESERVATION_BYTES,
+    PARSE_MEMORY_FACTOR,
+    ZERO_COPY_PARSE_MEMORY_FACTOR,
+    ByteBudget,
+    Reservation,
+)
 from src.services.metrics import (
     bamboorose_api_request_duration_seconds,
     bamboorose_api_requests_total,
+    bamboorose_responses_unchanged_total,
+    envelopes_published_total,
+    ingestion_backlog_bytes,
+    ingestion_backlog_invoices,
+    ingestion_lag_seconds,
+    ingestion_throughput_invoices_per_second,
     invoices_fetched_total,
     invoices_published_total,
+    invoices_replayed_total,
+    invoices_resumed_total,
+    invoices_unchanged_total,
     kafka_produce_failures_total,
+    memory_budget_bytes_in_flight,
+    memory_budget_limit_bytes,
+    memory_budget_waits_total,
+    response_archive_writes_total,
+    shutdown_invoices_abandoned_total,
+    shutdown_invoices_drained_total,
+)
+from src.services.parser import (
+    InvoiceSlices,
+    XMLParsingError,
+    invoice_metadata,
+    parse_invoice_slices,
+    parse_invoices,
 )
-from src.services.parser import parse_invoices
-from src.settings.config import get_settings
+from src.services.progress import (
+    BatchProgress,
+    StagedBatchProgress,
+    clear_batch_progress,
+    load_batch_progress,
+    save_batch_progress,
+)
+from src.services.run_logging import InvoiceLogSampler, RunSummary
+from src.services.runs import RunCoordinator, RunRejectedError
+from src.services.runtime_config import RuntimeConfig, RuntimeConfigWatcher
+from src.services.scheduling import FairScheduler
+from src.services.shutdown import GracefulShutdown
+from src.services.sources import IngestionSource, SourceRegistry
+from src.services.tracing import TraceBuffer, record_run, span
+from src.settings.config import AppSettings, get_settings, get_source_settings
+
+if TYPE_CHECKING:
+    import httpx
+
+    from src.clients.kafka import KafkaProducerClient
 
-initialize_logging()
 logger = logging.getLogger(f"x35.{__name__}")
 
 
-async def process_invoices(
-    bamboorose_client: BambooroseClient, kafka_producer_client: KafkaProducerClient
+@dataclass
+class PublishStats:
+    """Outcome counts for publishing a batch of invoices."""
+
+    published: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    failed: int = 0
+    resumed: int = 0
+
+    @property
+    def total(self) -> int:
+        """The number of invoices the batch accounted for, whatever their outcome."""
+        return self.published + self.unchanged + self.invalid + self.failed + self.resumed
+
+    @property
+    def complete(self) -> bool:
+        """True if every invoice in the batch was published or deliberately skipped."""
+        return self.failed == 0
+
+    def add(self, other: "PublishStats") -> None:
+        """Adds the counts of ``other`` to this instance."""
+        self.published += other.published
+        self.unchanged += other.unchanged
+        self.invalid += other.invalid
+        self.failed += other.failed
+        self.resumed += other.resumed
+
+
+async def publish_invoices(
+    invoices: Sequence[str] | InvoiceSlices,
+    trace_id: str,
+    kafka_producer_client: "KafkaProducerClient",
+    change_detector: ChangeDetector | None = None,
+    sampler: InvoiceLogSampler | None = None,
+    topic: str | None = None,
+    progress: BatchProgress | None = None,
+    stats: PublishStats | None = None,
+    envelopes: EnvelopeBatcher | None = None,
+) -> PublishStats:
+    """
+    Publishes parsed invoices to Kafka one by one, or grouped into envelopes.
+
+    Invoices that cannot be parsed or published are logged and skipped so that the
+    rest of the batch still goes out. When a change detector is given, invoices
+    whose content matches what was last published for their id are not re-emitted.
+    The sampler decides which successful publishes get a log line; failures are
+    always logged. ``InvoiceSlices`` are published without re-parsing each invoice,
+    since their ids were read when the response was parsed.
+
+    When batch progress is given, invoices already acknowledged with the same
+    content in an earlier attempt are skipped, and every invoice that is published
+    or deliberately skipped is acknowledged.
+
+    When ``stats`` is given, counts are added to it as each invoice is handled, so
+    the caller still sees the partial counts if the call is cancelled.
+
+    When an envelope batcher is given, invoices are grouped by their message key
+    into envelope messages instead, and each invoice is only counted and
+    acknowledged once its envelope has been published. An envelope that would
+    hold a single invoice, e.g. one too large to share, is published as a plain
+    invoice message. Every envelope is published before this returns, so
+    envelopes never span calls.
+
+    Returns:
+        The outcome counts for the batch.
+    """
+    stats = stats if stats is not None else PublishStats()
+    sampler = sampler or InvoiceLogSampler()
+    slices = invoices if isinstance(invoices, InvoiceSlices) else None
+    for index, invoice in enumerate(invoices):
+        digest = None
+        if change_detector is not None or progress is not None:
+            digest = fingerprint(invoice)
+        if progress is not None and progress.was_acknowledged(digest):
+            invoices_resumed_total.inc()
+            stats.resumed += 1
+            continue
+        invoice_id = vendor_id = "unknown"
+        try:
+            if slices is not None:
+                found_invoice_id, found_vendor_id = slices.metadata[index]
+            else:
+                found_invoice_id, found_vendor_id = invoice_metadata(invoice)
+            invoice_id = found_invoice_id or "unknown"
+            vendor_id = found_vendor_id or "unknown"
+
+            detect_changes = change_detector is not None and found_invoice_id is not None
+            if detect_changes and change_detector.invoice_unchanged(invoice_id, digest):
+                invoices_unchanged_total.inc()
+                stats.unchanged += 1
+                if progress is not None:
+                    progress.acknowledge(digest)
+                continue
+
+            if sampler.should_log():
+                with dynamic_context(invoice_id=invoice_id, vendor_id=vendor_id):
+                    logger.info("Publishing invoice.")
+            pending = _PendingInvoice(invoice, invoice_id, digest, detect_changes)
+            if envelopes is None:
+                await kafka_producer_client.publish_invoice(invoice, trace_id, topic)
+                _record_published(pending, stats, change_detector, progress)
+            else:
+                for key, envelope in envelopes.add(trace_id, pending, _invoice_size(invoice)):
+                    await _publish_envelope(
+                        envelope, key, kafka_producer_client, topic, stats, change_detector, progress
+                    )
+        except XMLParsingError:
+            logger.error("Failed to parse invoice XML, skipping.")
+            stats.invalid += 1
+            if progress is not None:
+                progress.acknowledge(digest)
+            continue
+        except Exception as e:
+            kafka_produce_failures_total.inc()
+            stats.failed += 1
+            with dynamic_context(invoice_id=invoice_id, vendor_id=vendor_id):
+                logger.error("Failed to publish invoice.", exc_info=e)
+    if envelopes is not None:
+        for key, envelope in envelopes.drain():
+            await _publish_envelope(
+                envelope, key, kafka_producer_client, topic, stats, change_detector, progress
+            )
+    return stats
+
+
+@dataclass
+class _PendingInvoice:
+    invoice: str | memoryview
+    invoice_id: str
+    digest: str | None
+    detect_changes: bool
+
+
+def _invoice_size(invoice: str | memoryview) -> int:
+    """Returns the UTF-8 size of an invoice, without encoding ASCII strings."""
+    if isinstance(invoice, memoryview) or invoice.isascii():
+        return len(invoice)
+    return len(invoice.encode("utf-8"))
+
+
+def _record_published(
+    pending: _PendingInvoice,
+    stats: PublishStats,
+    change_detector: ChangeDetector | None,
+    progress: BatchProgress | None,
 ) -> None:
+    invoices_published_total.inc()
+    stats.published += 1
+    if pending.detect_changes:
+        change_detector.commit_invoice(pending.invoice_id, pending.digest)
+    if progress is not None:
+        progress.acknowledge(pending.digest)
+
+
+async def _publish_envelope(
+    envelope: list[_PendingInvoice],
+    trace_id: str,
+    kafka_producer_client: "KafkaProducerClient",
+    topic: str | None,
+    stats: PublishStats,
+    change_detector: ChangeDetector | None,
+    progress: BatchProgress | None,
+) -> None:
+    """Publishes an envelope, counting each invoice in it as published or failed."""
+    invoice_ids = [pending.invoice_id for pending in envelope]
+    try:
+        if len(envelope) == 1:
+            await kafka_producer_client.publish_invoice(envelope[0].invoice, trace_id, topic)
+        else:
+            await kafka_producer_client.publish_envelope(
+                [pending.invoice for pending in envelope], invoice_ids, trace_id, topic
+            )
+    except Exception as e:
+        kafka_produce_failures_total.inc()
+        stats.failed += len(envelope)
+        with dynamic_context(invoice_ids=invoice_ids):
+            logger.error("Failed to publish invoice envelope.", exc_info=e)
+        return
+    if len(envelope) > 1:
+        envelopes_published_total.inc()
+    for pending in envelope:
+        _record_published(pending, stats, change_detector, progress)
+
+
+async def archive_response(
+    archive: ResponseArchive, available_timestamp: str, body: bytes
+) -> None:
+    """
+    Archives a raw response body without failing the run.
+
+    Archiving is best effort: the invoices are still published if the archive
+    cannot be written.
+    """
+    try:
+        await asyncio.to_thread(archive.archive, available_timestamp, body)
+        response_archive_writes_total.labels(outcome="success").inc()
+    except Exception as e:
+        response_archive_writes_total.labels(outcome="failure").inc()
+        logger.warning("Failed to archive Bamboorose response", exc_info=e)
+
+
+def _utc_timestamp() -> str:
+    """Returns the current time in the ``availableTimestamp`` format."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _scheduler_turn(scheduler: FairScheduler | None, source: str, lane: str = LIVE_LANE):
+    """Returns the scheduler turn for ``source`` in ``lane``, or a no-op without a scheduler."""
+    return scheduler.turn(source, lane) if scheduler is not None else nullcontext()
+
+
+async def _commit_checkpoint(
+    checkpoints: CheckpointStore, tracker: BacklogTracker, source: str, lane: str, fetched_at: str
+) -> None:
+    """
+    Advances the checkpoint of a source's lane to the time of its fetch.
+
+    A background lane's checkpoint is removed instead once the live lane polls
+    from no later than the fetch, see ``finish_backfill``.
+    """
+    name = lane_name(source, lane)
+    with span("checkpoint"):
+        if lane == BACKGROUND_LANE:
+            if await asyncio.to_thread(finish_backfill, checkpoints, source, fetched_at):
+                tracker.forget(name)
+            else:
+                tracker.committed(name, fetched_at)
+        else:
+            await asyncio.to_thread(checkpoints.set, name, fetched_at)
+            tracker.committed(name, fetched_at)
+
+
+async def process_invoices(
+    bamboorose_client: BambooroseClient,
+    kafka_producer_client: "KafkaProducerClient",
+    archive: ResponseArchive | None = None,
+    change_detector: ChangeDetector | None = None,
+    log_sample_rate: int = 1,
+    checkpoints: CheckpointStore | None = None,
+    scheduler: FairScheduler | None = None,
+    topic: str | None = None,
+    initial_timestamp: str = "2023-01-01T00:00:00Z",
+    publish_chunk_size: int = 100,
+    zero_copy_parsing: bool = False,
+    progress_flush_interval: int = 1000,
+    shutdown: GracefulShutdown | None = None,
+    memory_budget: ByteBudget | None = None,
+    envelope_max_invoices: int = 1,
+    envelope_max_bytes: int = 256_000,
+    traces: TraceBuffer | None = None,
+    backlog: BacklogTracker | None = None,
+    lane: str = LIVE_LANE,
+) -> RunSummary:
     """
     Orchestrates the fetching, parsing, and publishing of invoices.
     
-    This is the main entrypoint for the scheduled job.
+    This is the main entrypoint for the scheduled job. When an archive is given,
+    the raw response body is stored before it is parsed so the run can be replayed.
+    When a change detector is given, a response identical to the last completed one
+    is not parsed at all, and only changed invoices are published.
+
+    Per-invoice logs are emitted for one invoice in every ``log_sample_rate``; the
+    run summary log carries aggregated counts and stage timings either way.
+
+    The window is read from the source's checkpoint, falling back to
+    ``initial_timestamp``, and the checkpoint is advanced to the time of the fetch
+    once every invoice has been published. When a scheduler is given, the fetch
+    and each chunk of ``publish_chunk_size`` invoices wait for a turn so that
+    sources sharing the process are served fairly.
+
+    With ``zero_copy_parsing``, invoices are handed to the publisher as views into
+    the response's inner document instead of one re-serialized string each.
+
+    With checkpoints, the acknowledged invoices of the batch are persisted every
+    ``progress_flush_interval`` invoices and when the run fails, so a run that is
+    interrupted halfway resumes the window where it left off. Invoices are
+    recorded by content, so a response that changed in the meantime only
+    publishes its new or changed invoices. A ``progress_flush_interval`` of 0
+    disables resuming within a batch.
+
+    A run that is still waiting for memory or its fetch turn when a shutdown is
+    requested returns without fetching. When a shutdown is requested mid-batch
+    the remaining chunks are still published; invoices published after the
+    request count as drained, and those left when the run is cancelled at the
+    drain deadline count as abandoned.
+
+    When a memory budget is given, the run waits before fetching until the size of
+    the source's previous response fits in it, then holds bytes for the response,
+    the parse working set, the parsed invoices and the chunk being published as it
+    goes. The run releases them all when it ends.
+
+    With an ``envelope_max_invoices`` above 1, each chunk's invoices are published
+    in envelopes of up to that many invoices and ``envelope_max_bytes``.
+
+    When a trace buffer is given, the run records spans for the memory wait, each
+    fetch attempt, archiving, parsing, every publish chunk and every progress and
+    checkpoint write, and keeps them in the buffer under its trace ID.
+
+    When a backlog tracker is given, the run reports its committed checkpoint, the
+    invoices of the batch still pending after each chunk and the invoices it
+    published, from which lag, backlog and throughput are exported.
+
+    When the Kafka client is transactional, each chunk is published in a
+    transaction of its own, opened once the chunk has its scheduler turn, so a
+    transaction only stays open for as long as one chunk takes to publish,
+    whatever the size of the window. A chunk with a failed invoice, or one
+    interrupted, is aborted. Invoices only count as acknowledged for batch
+    progress and as published for change detection once their transaction
+    commits, and with checkpoints the progress is saved after every commit
+    whatever ``progress_flush_interval``, so a retried window skips the chunks
+    already committed and read-committed consumers see each invoice once. A
+    crash between a commit and the following progress or checkpoint write still
+    republishes that chunk. Each lane publishes its transactions through a
+    producer of its own, so runs of other sources and lanes are not held up by an
+    open transaction.
+
+    The run processes the source's ``lane``: its checkpoint, batch progress,
+    memory estimate and backlog are kept under the lane's name, and its fetch and
+    chunks queue in the lane's scheduler lane. A background run removes its
+    checkpoint once it has caught up with the live lane, see ``finish_backfill``.
+
+    Returns:
+        The counts and stage timings of the run.
     """
+    source = bamboorose_client.name
+    name = lane_name(source, lane)
+    summary = RunSummary()
     trace_id = str(uuid.uuid4())
-    with trace_context(trace_id):
+    with trace_context(trace_id), record_run(traces, trace_id, name):
         logger.info("Starting invoice processing run.")
 
-        # In a real application, you would want to get the last successful
-        # timestamp from a persistent store. For now, we will just use a
-        # hardcoded value.
-        available_timestamp = "2023-01-01T00:00:00Z"
+        tracker = backlog if backlog is not None else BacklogTracker()
+        available_timestamp = initial_timestamp
+        if checkpoints is not None:
+            available_timestamp = checkpoints.get(name, initial_timestamp)
+            tracker.committed(name, available_timestamp)
+        fetched_at = _utc_timestamp()
+
+        budget = memory_budget if memory_budget is not None else ByteBudget(sys.maxsize)
+        reservation = Reservation(budget)
+        with dynamic_context(source=source, lane=lane, available_timestamp=available_timestamp), closing(reservation):
+            # Reserve before taking a scheduler turn: a run waiting for memory must
+            # not hold a slot that the runs which would free that memory need.
+            with summary.timed("memory_wait"), span("memory_wait") as span_args:
+                if await reservation.acquire(budget.expected(name, DEFAULT_FETCH_RESERVATION_BYTES)):
+                    memory_budget_waits_total.inc()
+                    span_args["waited"] = True
+            if shutdown is not None and shutdown.stopping:
+                logger.info("Shutdown requested while waiting for memory, skipping the run.")
+                return summary
 
-        with dynamic_context(available_timestamp=available_timestamp):
-            logger.info(f"Fetching invoices for timestamp: {available_timestamp}")
+            logger.info("Fetching invoices for timestamp: %s", available_timestamp)
             start_time = time.time()
+            with summary.timed("fetch"), span("fetch", available_timestamp=available_timestamp):
+                async with _scheduler_turn(scheduler, source, lane):
+                    if shutdown is not None and shutdown.stopping:
+                        logger.info("Shutdown requested while waiting for a turn, skipping the run.")
+                        return summary
+                    try:
+                        response = await bamboorose_client.get_invoices(available_timestamp)
+                        bamboorose_api_requests_total.labels(outcome="success").inc()
+                    except Exception:
+                        bamboorose_api_requests_total.labels(outcome="failure").inc()
+                        raise
+                    finally:
+                        duration = time.time() - start_time
+                        bamboorose_api_request_duration_seconds.observe(duration)
+
+            response_size = len(response.content)
+            budget.record(name, response_size)
+            reservation.resize(response_size)
+
+            if archive is not None:
+                with span("archive"):
+                    await archive_response(archive, available_timestamp, response.content)
+
+            response_digest = None
+            if change_detector is not None:
+                response_digest = fingerprint(response.content)
+                if change_detector.response_unchanged(response_digest):
+                    bamboorose_responses_unchanged_total.inc()
+                    logger.info("Response unchanged since the last run, skipping.")
+                    if checkpoints is not None:
+                        await _commit_checkpoint(checkpoints, tracker, source, lane, fetched_at)
+                    summary.count("responses_unchanged")
+                    return summary
+
+            transactional = kafka_producer_client.transactional
+
+            with summary.timed("parse"), span("parse", bytes=response_size):
+                if zero_copy_parsing:
+                    reservation.resize(response_size * ZERO_COPY_PARSE_MEMORY_FACTOR)
+                    invoices = parse_invoice_slices(response.content)
+                    parsed_size = len(invoices.buffer)
+                else:
+                    reservation.resize(response_size * PARSE_MEMORY_FACTOR)
+                    invoices = parse_invoices(response.text)
+                    parsed_size = sum(len(invoice) for invoice in invoices)
+            # Only the parsed invoices are needed from here on.
+            del response
+            reservation.resize(parsed_size)
+            invoices_fetched_total.inc(len(invoices))
+
+            # Committed transactions must be skipped when the window is retried.
+            flush_interval = 1 if transactional else progress_flush_interval
+            progress = None
+            if checkpoints is not None and (progress_flush_interval > 0 or transactional):
+                progress = await asyncio.to_thread(
+                    load_batch_progress, checkpoints, name, available_timestamp
+                )
+                if progress.acknowledged:
+                    logger.info(
+                        "Resuming batch.",
+                        extra={"invoices_acknowledged": progress.acknowledged},
+                    )
+
+            tracker.batch_started(name, len(invoices), parsed_size)
+            stats = PublishStats()
+            sampler = InvoiceLogSampler(log_sample_rate)
+            envelopes = None
+            if envelope_max_invoices > 1:
+                envelopes = EnvelopeBatcher(envelope_max_invoices, envelope_max_bytes)
+            detector = change_detector
+            chunk_progress = progress
+            in_transaction = False
+            if transactional:
+                kafka_producer_client = await kafka_producer_client.for_transactions(name)
+            drain_start = None
             try:
-                response = await bamboorose_client.get_invoices(available_timestamp)
-                bamboorose_api_requests_total.labels(outcome="success").inc()
-            except Exception:
-                bamboorose_api_requests_total.labels(outcome="failure").inc()
+                with summary.timed("publish"):
+                    for offset in range(0, len(invoices), publish_chunk_size):
+                        if drain_start is None and shutdown is not None and shutdown.stopping:
+                            drain_start = stats.total
+                        chunk = invoices[offset : offset + publish_chunk_size]
+                        # Each message is copied once more on its way to the producer.
+                        reservation.resize(parsed_size + sum(len(invoice) for invoice in chunk))
+                        published = stats.published
+                        failed = stats.failed
+                        with span("publish_chunk", offset=offset, invoices=len(chunk)):
+                            async with _scheduler_turn(scheduler, source, lane):
+                                if transactional:
+                                    if change_detector is not None:
+                                        detector = StagedChangeDetector(change_detector)
+                                    if progress is not None:
+                                        chunk_progress = StagedBatchProgress(progress)
+                                    await kafka_producer_client.begin_transaction()
+                                    in_transaction = True
+                                await publish_invoices(
+                                    chunk,
+                                    trace_id,
+                                    kafka_producer_client,
+                                    detector,
+                                    sampler,
+                                    topic,
+                                    chunk_progress,
+                                    stats,
+                                    envelopes,
+                                )
+                                if transactional:
+                                    in_transaction = False
+                                    if stats.failed > failed:
+                                        # Committing the rest would duplicate it when the window is retried.
+                                        await kafka_producer_client.abort_transaction()
+                                    else:
+                                        with span("transaction_commit"):
+                                            await kafka_producer_client.commit_transaction()
+                                        if detector is not change_detector:
+                                            detector.apply()
+                                        if chunk_progress is not progress:
+                                            chunk_progress.apply()
+                        reservation.resize(parsed_size)
+                        # Failed invoices are retried by a later run, so they stay pending.
+                        tracker.batch_progress(name, len(invoices) - stats.total + stats.failed)
+                        tracker.record_published(stats.published - published)
+                        if progress is not None and progress.unsaved >= flush_interval:
+                            with span("progress_flush"):
+                                await asyncio.to_thread(save_batch_progress, checkpoints, name, progress)
+            except BaseException:
+                if shutdown is not None and shutdown.stopping:
+                    abandoned = len(invoices) - stats.total
+                    shutdown.abandoned += abandoned
+                    shutdown_invoices_abandoned_total.inc(abandoned)
+                if in_transaction:
+                    await kafka_producer_client.abort_transaction()
+                if progress is not None and progress.unsaved:
+                    await asyncio.to_thread(save_batch_progress, checkpoints, name, progress)
                 raise
             finally:
-                duration = time.time() - start_time
-                bamboorose_api_request_duration_seconds.observe(duration)
+                tracker.batch_finished(name)
+                if drain_start is not None:
+                    shutdown.drained += stats.total - drain_start
+                    shutdown_invoices_drained_total.inc(stats.total - drain_start)
 
-            invoices = parse_invoices(response.text)
-            invoices_fetched_total.inc(len(invoices))
+            if stats.complete:
+                if response_digest is not None:
+                    change_detector.commit_response(response_digest)
+                if checkpoints is not None:
+                    await _commit_checkpoint(checkpoints, tracker, source, lane, fetched_at)
+                if progress is not None:
+                    await asyncio.to_thread(clear_batch_progress, checkpoints, name)
+            elif progress is not None and progress.unsaved:
+                with span("progress_flush"):
+                    await asyncio.to_thread(save_batch_progress, checkpoints, name, progress)
 
-            for invoice in invoices:
-                try:
-                    # Assuming invoice is an XML string, we parse it to get more context
-                    invoice_xml = etree.fromstring(invoice.encode("utf-8"))
-                    invoice_id_element = invoice_xml.find("invoice_id")
-                    vendor_id_element = invoice_xml.find("vendor_id")
-                    
-                    invoice_id = invoice_id_element.text if invoice_id_element is not None else "unknown"
-                    vendor_id = vendor_id_element.text if vendor_id_element is not None else "unknown"
-
-                    with dynamic_context(invoice_id=invoice_id, vendor_id=vendor_id):
-                        logger.info("Publishing invoice.")
-                        await kafka_producer_client.publish_invoice(invoice, trace_id)
-                        invoices_published_total.inc()
-                except etree.XMLSyntaxError:
-                    logger.error("Failed to parse invoice XML, skipping.")
-                    continue
-                except Exception:
-                    kafka_produce_failures_total.inc()
+            summary.count("invoices_fetched", len(invoices))
+            summary.count("invoices_published", stats.published)
+            summary.count("invoices_unchanged", stats.unchanged)
+            summary.count("invoices_invalid", stats.invalid)
+            summary.count("invoices_failed", stats.failed)
+            summary.count("invoices_resumed", stats.resumed)
+            logger.info("Invoice processing run finished.", extra=summary.as_extra())
+            return summary
 
-            logger.info(
-                "Invoice processing run finished.",
-                extra={"invoices_published": len(invoices)},
+
+async def replay_invoices(
+    archive: ResponseArchive,
+    kafka_producer_client: "KafkaProducerClient",
+    start: str,
+    end: str,
+) -> int:
+    """
+    Republishes archived responses for the windows in ``[start, end]``.
+
+    Responses are read from the archive instead of Bamboorose, so a replay runs at
+    local speed and does not count against the upstream API. When the Kafka client
+    is transactional, each response is republished in a transaction of its own
+    that is aborted if any of its invoices failed. Replays publish through the
+    producer of the ``replay`` name, apart from the sources' runs.
+
+    Returns:
+        The number of invoices republished.
+    """
+    trace_id = str(uuid.uuid4())
+    with trace_context(trace_id):
+        entries = await asyncio.to_thread(archive.entries, start, end)
+        logger.info(
+            "Starting archive replay.",
+            extra={"replay_start": start, "replay_end": end, "responses": len(entries)},
+        )
+        replayed = 0
+        if kafka_producer_client.transactional:
+            kafka_producer_client = await kafka_producer_client.for_transactions("replay")
+        for entry in entries:
+            with dynamic_context(available_timestamp=entry.window):
+                body = await asyncio.to_thread(archive.read, entry)
+                invoices = parse_invoices(body.decode("utf-8"))
+                if not kafka_producer_client.transactional:
+                    stats = await publish_invoices(invoices, trace_id, kafka_producer_client)
+                else:
+                    await kafka_producer_client.begin_transaction()
+                    try:
+                        stats = await publish_invoices(invoices, trace_id, kafka_producer_client)
+                    except BaseException:
+                        await kafka_producer_client.abort_transaction()
+                        raise
+                    if not stats.complete:
+                        await kafka_producer_client.abort_transaction()
+                        continue
+                    await kafka_producer_client.commit_transaction()
+                invoices_replayed_total.inc(stats.published)
+                replayed += stats.published
+        logger.info("Archive replay finished.", extra={"invoices_replayed": replayed})
+        return replayed
+
+
+def get_kafka_producer_client() -> "KafkaProducerClient":
+    """
+    Returns the Kafka producer client.
+
+    The Kafka client library is only imported here, so it loads in the startup
+    thread that builds the producer rather than when this module is imported.
+    """
+    from src.clients import kafka
+
+    return kafka.get_kafka_producer_client()
+
+
+def get_http_client(settings: AppSettings) -> "httpx.AsyncClient":
+    """
+    Returns the HTTP client whose connection pool all sources share.
+
+    httpx is only imported here, so it loads during startup, while the Kafka
+    producer is built in its thread, rather than when this module is imported.
+    """
+    import httpx
+
+    return httpx.AsyncClient(limits=httpx.Limits(max_connections=settings.bamboorose.max_connections))
+
+
+def get_response_archive(settings: AppSettings) -> ResponseArchive | None:
+    """Returns the response archive, or None if archiving is disabled."""
+    if not settings.archive.enabled:
+        return None
+    return ResponseArchive(
+        get_blob_store(settings.archive.location),
+        max_age_seconds=settings.archive.max_age_seconds,
+        max_entries=settings.archive.max_entries,
+    )
+
+
+def get_memory_budget(settings: AppSettings) -> ByteBudget | None:
+    """Returns the memory budget shared by all sources, or None if unbounded."""
+    limit = settings.app.memory_budget_bytes
+    if limit is None:
+        return None
+    memory_budget_limit_bytes.set(limit)
+    return ByteBudget(limit, on_change=memory_budget_bytes_in_flight.set)
+
+
+def get_trace_buffer(settings: AppSettings) -> TraceBuffer | None:
+    """Returns the buffer of recent run traces, or None if run tracing is disabled."""
+    if settings.app.run_trace_buffer_size == 0:
+        return None
+    return TraceBuffer(
+        settings.app.run_trace_buffer_size, settings.app.run_trace_directory
+    )
+
+
+def get_backlog_tracker(
+    settings: AppSettings, sources: SourceRegistry, exposition: MetricsExposition
+) -> BacklogTracker:
+    """
+    Returns the backlog tracker, with its gauges refreshed for every source on scrape.
+
+    Gauges are labelled with the lane, and the background lane is only exported
+    when lanes are enabled. A live lane's lag is only exported once its checkpoint
+    is known; a background lane without a checkpoint has no backfill to drain, so
+    its lag is 0.
+    """
+    backlog = BacklogTracker(settings.app.throughput_window_seconds)
+    lanes = LANES if settings.app.live_lane_lookback_seconds is not None else (LIVE_LANE,)
+
+    def export() -> None:
+        for source in sources:
+            for lane in lanes:
+                name = lane_name(source.name, lane)
+                labels = {"source": source.name, "lane": lane}
+                lag = backlog.lag_seconds(name)
+                if math.isnan(lag) and lane == BACKGROUND_LANE:
+                    lag = 0.0
+                if not math.isnan(lag):
+                    ingestion_lag_seconds.labels(**labels).set(lag)
+                ingestion_backlog_invoices.labels(**labels).set(backlog.pending_invoices(name))
+                ingestion_backlog_bytes.labels(**labels).set(backlog.pending_bytes(name))
+        ingestion_throughput_invoices_per_second.set(backlog.throughput())
+
+    exposition.add_refresh_hook(export)
+    return backlog
+
+
+def get_metrics_exposition(settings: AppSettings) -> MetricsExposition:
+    """Returns the cached metrics exposition, covering every worker in multiprocess mode."""
+    return MetricsExposition(get_registry(), settings.app.metrics_max_age_seconds)
+
+
+def get_leader_lock(settings: AppSettings) -> LeaderLock | None:
+    """Returns the ingest leader lock, or None if every process runs ingestion."""
+    path = settings.app.leader_lock_path
+    return LeaderLock(path) if path is not None else None
+
+
+def get_checkpoint_store(settings: AppSettings) -> CheckpointStore:
+    """Returns the checkpoint store, in memory unless a location is configured."""
+    location = settings.app.checkpoint_location
+    return CheckpointStore(get_blob_store(location) if location else None)
+
+
+def get_request_guard(name: str, settings: AppSettings) -> RequestGuard:
+    """Returns the adaptive limiter and circuit breaker for a source."""
+    bamboorose = settings.bamboorose
+    return RequestGuard(
+        name,
+        AdaptiveConcurrencyLimiter(
+            initial_limit=bamboorose.concurrency_initial_limit,
+            min_limit=bamboorose.concurrency_min_limit,
+            max_limit=bamboorose.concurrency_max_limit,
+            latency_target_seconds=bamboorose.latency_target_seconds,
+        ),
+        CircuitBreaker(
+            failure_rate_threshold=bamboorose.circuit_failure_rate_threshold,
+            window_size=bamboorose.circuit_window_size,
+            minimum_calls=bamboorose.circuit_minimum_calls,
+            open_seconds=bamboorose.circuit_open_seconds,
+        ),
+    )
+
+
+def get_retry_budget(settings: AppSettings) -> RetryBudget:
+    """Returns the retry budget shared by all sources."""
+    bamboorose = settings.bamboorose
+    return RetryBudget(
+        ratio=bamboorose.retry_budget_ratio,
+        min_retries=bamboorose.retry_budget_min_retries,
+        window_seconds=bamboorose.retry_budget_window_seconds,
+    )
+
+
+def get_hedge_policy(settings: AppSettings) -> HedgePolicy | None:
+    """Returns the hedging policy for a source, or None if hedging is disabled."""
+    bamboorose = settings.bamboorose
+    if not bamboorose.hedge_enabled:
+        return None
+    return HedgePolicy(
+        percentile=bamboorose.hedge_percentile,
+        min_delay_seconds=bamboorose.hedge_min_delay_seconds,
+        min_samples=bamboorose.hedge_min_samples,
+    )
+
+
+def get_runtime_config(
+    settings: AppSettings, sources: SourceRegistry, scheduler: FairScheduler
+) -> RuntimeConfig:
+    """
+    Returns the runtime config, pushing changes to the components built from settings.
+
+    Settings read by each run need no listener. A changed poll interval applies to
+    the sources without an interval of their own from their next sleep, and the
+    API timeout only to the source built from the ``BAMBOOROSE_API_*`` settings.
+    """
+    runtime_config = RuntimeConfig(settings)
+    runtime_config.on_change("app.scheduler_slots", scheduler.resize)
+
+    explicit_intervals = {
+        source.name
+        for source in settings.bamboorose.sources
+        if source.poll_interval_seconds
+    }
+
+    def set_poll_interval(seconds: int) -> None:
+        for source in sources:
+            if source.name not in explicit_intervals:
+                source.poll_interval_seconds = seconds
+
+    def set_api_timeout(seconds: int) -> None:
+        if not settings.bamboorose.sources:
+            for source in sources:
+                source.bamboorose_client.timeout = seconds
+
+    def set_max_tries(tries: int) -> None:
+        for source in sources:
+            source.bamboorose_client.max_tries = tries
+
+    runtime_config.on_change("app.poll_interval_seconds", set_poll_interval)
+    runtime_config.on_change("bamboorose.api_timeout", set_api_timeout)
+    runtime_config.on_change("bamboorose.retry_max_tries", set_max_tries)
+    return runtime_config
+
+
+def get_source_registry(settings: AppSettings, http_client: "httpx.AsyncClient") -> SourceRegistry:
+    """
+    Returns a registry of the configured sources.
+
+    Sources share one pooled HTTP client and one retry budget; each gets its own
+    request guard and hedging policy so a degraded endpoint only throttles itself
+    and hedges against its own latency.
+    """
+    registry = SourceRegistry()
+    retry_budget = get_retry_budget(settings)
+    for source in get_source_settings(settings):
+        registry.register(
+            IngestionSource(
+                name=source.name,
+                bamboorose_client=get_bamboorose_client(
+                    source,
+                    http_client,
+                    get_request_guard(source.name, settings),
+                    retry_budget,
+                    get_hedge_policy(settings),
+                    settings.bamboorose.retry_max_tries,
+                ),
+                topic=source.producer_topic,
+                poll_interval_seconds=source.poll_interval_seconds,
+                initial_timestamp=source.initial_timestamp,
+                change_detector=(
+                    ChangeDetector(settings.app.change_detection_max_invoices)
+                    if settings.app.skip_unchanged
+                    else None
+                ),
             )
+        )
+    return registry
 
 
-async def invoice_processing_loop(app: FastAPI):
-    """Continuously processes invoices on a schedule."""
+async def run_source(app: FastAPI, name: str) -> dict[str, int | float]:
+    """
+    Runs ``process_invoices`` once for the registered source ``name``.
+
+    ``name`` may also name a lane of the source, as returned by ``lane_name``.
+    With lanes enabled, a live run first hands a window too far behind to the
+    background lane and starts a background run to drain it, alongside the live
+    run: in transactional mode each lane publishes through a producer of its own.
+    A background run without a checkpoint has nothing to do.
+
+    Returns:
+        The run summary fields.
+    """
     settings = get_settings()
-    bamboorose_client = app.state.bamboorose_client
-    kafka_producer_client = app.state.kafka_producer_client
+    source_name, lane = split_lane_name(name)
+    source = app.state.sources.get(source_name)
+    lookback = settings.app.live_lane_lookback_seconds
+    if lane == LIVE_LANE and lookback is not None:
+        handed_off = await asyncio.to_thread(
+            hand_off_backfill, app.state.checkpoints, source.name, source.initial_timestamp, lookback
+        )
+        if handed_off is not None:
+            logger.info(
+                "Handing the window from %s to the background lane.",
+                handed_off,
+                extra={"source": source.name},
+            )
+            background = lane_name(source.name, BACKGROUND_LANE)
+            app.state.backlog.committed(background, app.state.checkpoints.get(background))
+            try:
+                app.state.runs.start(background, trigger="handoff")
+            except RunRejectedError:
+                pass
+    elif lane == BACKGROUND_LANE and app.state.checkpoints.get(name) is None:
+        return {}
+    summary = await process_invoices(
+        source.bamboorose_client,
+        app.state.kafka_producer_client,
+        app.state.response_archive,
+        source.change_detector,
+        settings.app.invoice_log_sample_rate,
+        checkpoints=app.state.checkpoints,
+        scheduler=app.state.scheduler,
+        topic=source.topic,
+        initial_timestamp=source.initial_timestamp,
+        publish_chunk_size=settings.app.publish_chunk_size,
+        zero_copy_parsing=settings.app.zero_copy_parsing,
+        progress_flush_interval=settings.app.progress_flush_interval,
+        shutdown=app.state.shutdown,
+        memory_budget=app.state.memory_budget,
+        traces=app.state.traces,
+        backlog=app.state.backlog,
+        envelope_max_invoices=settings.app.envelope_max_invoices,
+        envelope_max_bytes=settings.app.envelope_max_bytes,
+        lane=lane,
+    )
+    return summary.as_extra()
+
+
+async def source_processing_loop(app: FastAPI, source: IngestionSource):
+    """
+    Processes invoices for a single source on its own schedule until shutdown.
+
+    Scheduled runs go through the run coordinator like triggered ones, so a run
+    triggered over HTTP is joined rather than overlapped.
+    """
+    runs = app.state.runs
+    shutdown = app.state.shutdown
 
-    while True:
+    while not shutdown.stopping:
         try:
-            await process_invoices(bamboorose_client, kafka_producer_client)
-        except Exception as e:
-            logger.error("Error processing invoices", exc_info=e)
-        
-        logger.info(f"Sleeping for {settings.app.poll_interval_seconds} seconds.")
-        await asyncio.sleep(settings.app.poll_interval_seconds)
+            run, _ = runs.start(source.name, trigger="schedule")
+        except RunRejectedError:
+            break
+        await runs.wait(run)
+
+        if shutdown.stopping:
+            break
+        logger.info("Sleeping for %s seconds.", source.poll_interval_seconds)
+        await shutdown.sleep(source.poll_interval_seconds)
+
+
+async def background_processing_loop(app: FastAPI, source: IngestionSource):
+    """
+    Drains the background lane of a single source until shutdown.
+
+    A run is started whenever the live lane has handed a window to the lane, and
+    the lane checks again every poll interval, also to retry a failed run.
+    """
+    runs = app.state.runs
+    shutdown = app.state.shutdown
+    name = lane_name(source.name, BACKGROUND_LANE)
+
+    while not shutdown.stopping:
+        if app.state.checkpoints.get(name) is not None:
+            try:
+                run, _ = runs.start(name, trigger="schedule")
+            except RunRejectedError:
+                break
+            await runs.wait(run)
+            if shutdown.stopping:
+                break
+        await shutdown.sleep(source.poll_interval_seconds)
+
+
+async def invoice_processing_loop(app: FastAPI):
+    """Processes invoices from every registered source until shutdown."""
+    loops = [source_processing_loop(app, source) for source in app.state.sources]
+    if get_settings().app.live_lane_lookback_seconds is not None:
+        loops += [background_processing_loop(app, source) for source in app.state.sources]
+    await asyncio.gather(*loops)
+
+
+async def leader_processing_loop(app: FastAPI, settings: AppSettings):
+    """
+    Processes invoices once this process is elected ingest leader.
+
+    Without a leader lock every process runs ingestion. With one, a process that
+    does not hold the lock serves HTTP, rejects triggered runs and retries the
+    lock every ``leader_retry_seconds`` until the leader exits or shutdown starts.
+    """
+    leader = app.state.leader
+    shutdown = app.state.shutdown
+    if leader is not None and not leader.try_acquire():
+        app.state.runs.stop_accepting("this worker is not the ingest leader")
+        logger.info("Another worker is the ingest leader; standing by.")
+        while not leader.try_acquire():
+            await shutdown.sleep(settings.app.leader_retry_seconds)
+            if shutdown.stopping:
+                return
+        app.state.runs.start_accepting()
+    await invoice_processing_loop(app)
+
+
+async def drain(app: FastAPI, settings: AppSettings) -> None:
+    """
+    Stops the processing loops, giving in-flight batches until the deadline to finish.
+
+    No new batch is fetched and no new run is accepted once the drain starts,
+    whether scheduled or triggered. Batches still publishing when the
+    ``shutdown_drain_seconds`` deadline passes are cancelled; their progress is saved
+    so the next run resumes them rather than refetching everything.
+    """
+    task = getattr(app.state, "invoice_processor_task", None)
+    shutdown = getattr(app.state, "shutdown", None)
+    runs = getattr(app.state, "runs", None)
+    if task is None:
+        return
+    if shutdown is not None:
+        shutdown.request_stop()
+    tasks = {task}
+    if runs is not None:
+        runs.stop_accepting()
+        tasks.update(run.task for run in runs.in_flight())
+
+    start = time.monotonic()
+    _, pending = await asyncio.wait(tasks, timeout=settings.app.shutdown_drain_seconds)
+    if pending:
+        for pending_task in pending:
+            pending_task.cancel()
+        await asyncio.wait(pending)
+
+    extra = {"drain_seconds": round(time.monotonic() - start, 3)}
+    if shutdown is not None:
+        extra.update(invoices_drained=shutdown.drained, invoices_abandoned=shutdown.abandoned)
+    logger.info("Drain finished.", extra=extra)
 
 
 @asynccontextmanager
@@ -111,29 +1068,94 @@ async def lifespan(app: FastAPI):
     This is where clients and other resources will be initialized.
     """
     logger.info("Application startup: initializing clients.")
-    
-    # Run blocking constructors in a thread
-    kafka_producer_client = await asyncio.to_thread(get_kafka_producer_client)
-    app.state.kafka_producer_client = kafka_producer_client
-    
-    # Non-blocking client can be initialized directly
-    app.state.bamboorose_client = get_bamboorose_client()
+    settings = get_settings()
+
+    # Blocking constructors run in threads, submitted right away so the Kafka
+    # producer connects while the HTTP client and sources are set up here.
+    loop = asyncio.get_running_loop()
+    kafka_producer_client = loop.run_in_executor(None, get_kafka_producer_client)
+    checkpoints = loop.run_in_executor(None, get_checkpoint_store, settings)
+
+    # Non-blocking clients can be initialized directly. All sources share one
+    # connection pool and one scheduler.
+    app.state.http_client = get_http_client(settings)
+    app.state.sources = get_source_registry(settings, app.state.http_client)
+    app.state.scheduler = FairScheduler(
+        settings.app.scheduler_slots,
+        lane_shares={BACKGROUND_LANE: settings.app.background_lane_share},
+    )
+    app.state.response_archive = get_response_archive(settings)
+    app.state.memory_budget = get_memory_budget(settings)
+    app.state.traces = get_trace_buffer(settings)
+    if not hasattr(app.state, "metrics_exposition"):
+        # Normally created with the app, so /metrics is served even before startup.
+        app.state.metrics_exposition = get_metrics_exposition(settings)
+    app.state.backlog = get_backlog_tracker(
+        settings, app.state.sources, app.state.metrics_exposition
+    )
+    app.state.leader = get_leader_lock(settings)
+    app.state.runtime_config = get_runtime_config(
+        settings, app.state.sources, app.state.scheduler
+    )
+
+    app.state.kafka_producer_client, app.state.checkpoints = await asyncio.gather(
+        kafka_producer_client, checkpoints
+    )
+    app.state.shutdown = GracefulShutdown()
+    app.state.runs = RunCoordinator(partial(run_source, app))
 
     logger.info("Clients initialized. Starting background processing task.")
     
-    loop = asyncio.get_running_loop()
-    app.state.invoice_processor_task = loop.create_task(invoice_processing_loop(app))
+    app.state.invoice_processor_task = loop.create_task(
+        leader_processing_loop(app, settings)
+    )
+    if settings.app.runtime_config_path is not None:
+        watcher = RuntimeConfigWatcher(
+            app.state.runtime_config,
+            settings.app.runtime_config_path,
+            settings.app.runtime_config_poll_seconds,
+        )
+        app.state.runtime_config_task = loop.create_task(watcher.run(app.state.shutdown))
+    if multiprocess_enabled():
+        app.state.metrics_refresh_task = loop.create_task(
+            app.state.metrics_exposition.keep_fresh(
+                app.state.shutdown, max(settings.app.metrics_max_age_seconds, 1.0)
+            )
+        )
     
     yield
     
+    logger.info("Application shutdown: draining in-flight work.")
+    await drain(app, settings)
     logger.info("Application shutdown: cleaning up resources.")
-    if hasattr(app.state, "invoice_processor_task"):
-        app.state.invoice_processor_task.cancel()
+
+    if hasattr(app.state, "runtime_config_task"):
+        await app.state.runtime_config_task
+    if hasattr(app.state, "metrics_refresh_task"):
+        await app.state.metrics_refresh_task
+
+    if hasattr(app.state, "http_client"):
+        await app.state.http_client.aclose()
 
     if hasattr(app.state, "kafka_producer_client"):
         logger.info("Flushing Kafka producer.")
-        await asyncio.to_thread(app.state.kafka_producer_client.producer.flush)
-        logger.info("Kafka producer flushed.")
+        try:
+            await asyncio.wait_for(
+                asyncio.to_thread(app.state.kafka_producer_client.flush),
+                timeout=settings.app.shutdown_flush_seconds,
+            )
+            logger.info("Kafka producer flushed.")
+        except asyncio.TimeoutError:
+            # The flush thread cannot be interrupted. Messages still queued in the
+            # producer when the process exits are lost.
+            logger.warning(
+                "Kafka producer flush timed out after %s seconds.",
+                settings.app.shutdown_flush_seconds,
+            )
+    if getattr(app.state, "leader", None) is not None:
+        app.state.leader.release()
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
     logger.info("Shutdown complete.")
 
 
@@ -141,15 +1163,18 @@ def create_app() -> FastAPI:
     """
     Creates the FastAPI application.
 
-    This is a minimal application, as the service does not expose any APIs.
-    The lifespan context manager is used to initialize clients.
+    Besides metrics, the service exposes endpoints to trigger ingestion runs and
+    look up their status. The lifespan context manager is used to initialize clients.
     """
+    initialize_logging()
     settings = get_settings()
     
     builder = FastAPIAppBuilder(
         settings=settings.fastapi,
-        routers=[metrics_router],
+        routers=[metrics_router, ingest_router, status_router, traces_router],
         lifespan=lifespan,
         middleware=[CustomHeaderMiddleware],
     )
-    return builder.create_app()
\ No newline at end of file
+    app = builder.create_app()
+    app.state.metrics_exposition = get_metrics_exposition(settings)
+    return app
\ No newline at end of file
@@ -1,73 +1,255 @@
 # -*- coding: utf-8 -*-
 """Client for interacting with the Bamboorose SOAP API."""
-import backoff
-import httpx
-from src.settings.config import get_settings
+import asyncio
+import time
+from contextlib import nullcontext
+from typing import TYPE_CHECKING
+from xml.sax.saxutils import escape
 
+from src.clients.resilience import HedgePolicy, RequestGuard, RetryBudget
+from src.services.metrics import (
+    bamboorose_hedge_wins_total,
+    bamboorose_hedged_requests_total,
+    bamboorose_retries_denied_total,
+    bamboorose_retries_total,
+    bamboorose_time_to_headers_seconds,
+)
+from src.services.tracing import span
+from src.settings.config import DEFAULT_SOURCE_NAME, SourceSettings, get_settings
 
-def _should_give_up(e: httpx.HTTPStatusError) -> bool:
-    """Return True if the exception is not a 5xx error."""
-    return e.response.status_code < 500
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_REQUEST_TEMPLATE = """
+        <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ser="http://services.bamboorose.com">
+           <soapenv:Header/>
+           <soapenv:Body>
+              <ser:{operation}>
+                 <ser:userName>{username}</ser:userName>
+                 <ser:password>{password}</ser:password>
+                 <ser:availableTimestamp>{available_timestamp}</ser:availableTimestamp>
+              </ser:{operation}>
+           </soapenv:Body>
+        </soapenv:Envelope>
+        """
+
+
+def _should_give_up(e: "httpx.HTTPError") -> bool:
+    """Return True if the exception is an HTTP error response other than a 5xx."""
+    import httpx
+
+    return isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500
 
 
 class BambooroseClient:
     """A client for interacting with the Bamboorose SOAP API."""
 
-    def __init__(self) -> None:
-        """Initializes the Bamboorose client."""
-        settings = get_settings()
-        self.base_url = settings.bamboorose.api_url
-        self.timeout = settings.bamboorose.api_timeout
-        self.username = settings.bamboorose.api_username
-        self.password = settings.bamboorose.api_password.get_secret_value()
-
-    @backoff.on_exception(
-        backoff.expo,
-        httpx.HTTPStatusError,
-        max_tries=5,
-        giveup=_should_give_up,
-    )
-    async def get_invoices(self, available_timestamp: str) -> httpx.Response:
+    def __init__(
+        self,
+        source: SourceSettings | None = None,
+        http_client: "httpx.AsyncClient | None" = None,
+        guard: RequestGuard | None = None,
+        retry_budget: RetryBudget | None = None,
+        hedge: HedgePolicy | None = None,
+        max_tries: int = 5,
+    ) -> None:
+        """
+        Initializes the Bamboorose client.
+
+        Args:
+            source: The source to fetch from. Defaults to the ``BAMBOOROSE_API_*`` settings.
+            http_client: A shared, pooled HTTP client. When omitted, a client is
+                created for each request.
+            guard: An adaptive limiter and circuit breaker applied to every attempt.
+            retry_budget: A budget, usually shared by all sources, that retries and
+                hedged requests are taken from. None retries without limit.
+            hedge: When to send a second request for a slow one. None never hedges.
+            max_tries: The number of tries per fetch, including the first.
+        """
+        if source is None:
+            settings = get_settings()
+            self.name = DEFAULT_SOURCE_NAME
+            self.base_url = settings.bamboorose.api_url
+            self.timeout = settings.bamboorose.api_timeout
+            self.username = settings.bamboorose.api_username
+            self.password = settings.bamboorose.api_password.get_secret_value()
+            self.operation = settings.bamboorose.soap_operation
+            self.request_template = DEFAULT_REQUEST_TEMPLATE
+        else:
+            self.name = source.name
+            self.base_url = source.api_url
+            self.timeout = source.api_timeout
+            self.username = source.api_username
+            self.password = source.api_password.get_secret_value()
+            self.operation = source.soap_operation
+            self.request_template = source.request_template or DEFAULT_REQUEST_TEMPLATE
+        self.http_client = http_client
+        self.guard = guard
+        self.retry_budget = retry_budget
+        self.hedge = hedge
+        self.max_tries = max_tries
+
+    def _give_up(self, e: "httpx.HTTPError") -> bool:
+        """Return True if the exception should not be retried, now or ever."""
+        if _should_give_up(e):
+            return True
+        if self.retry_budget is not None and not self.retry_budget.can_retry():
+            bamboorose_retries_denied_total.labels(source=self.name).inc()
+            return True
+        return False
+
+    def _on_retry(self, details: dict) -> None:
+        bamboorose_retries_total.labels(source=self.name).inc()
+        if self.retry_budget is not None:
+            self.retry_budget.record_retry()
+
+    async def get_invoices(self, available_timestamp: str) -> "httpx.Response":
         """
         Fetches invoices from the Bamboorose API.
 
+        5xx responses, timeouts and connection errors are retried with exponential
+        backoff, as long as the retry budget allows. When the client has a hedge
+        policy, an attempt that has not received response headers in time is sent
+        a second time and the first response to complete is used. When the client
+        has a guard, each request also waits for the adaptive limiter and is
+        rejected with ``CircuitOpenError`` while the circuit breaker is open.
+
         Args:
             available_timestamp: The timestamp to use for the request.
 
         Returns:
             The response from the API.
         """
-        soap_request = f"""
-        <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ser="http://services.bamboorose.com">
-           <soapenv:Header/>
-           <soapenv:Body>
-              <ser:getCommercialInvoicesByAvailableTimestamp>
-                 <ser:userName>{self.username}</ser:userName>
-                 <ser:password>{self.password}</ser:password>
-                 <ser:availableTimestamp>{available_timestamp}</ser:availableTimestamp>
-              </ser:getCommercialInvoicesByAvailableTimestamp>
-           </soapenv:Body>
-        </soapenv:Envelope>
-        """
+        # Imported here rather than with the module, to keep them off the
+        # service's import path; they load on the first fetch instead.
+        import backoff
+        import httpx
+
+        soap_request = self.request_template.format(
+            operation=self.operation,
+            username=escape(self.username),
+            password=escape(self.password),
+            available_timestamp=escape(available_timestamp),
+        )
         headers = {
             "Content-Type": "text/xml; charset=utf-8",
-            "SOAPAction": "getCommercialInvoicesByAvailableTimestamp",
+            "SOAPAction": self.operation,
         }
+        if self.retry_budget is not None:
+            self.retry_budget.record_request()
+        post = backoff.on_exception(
+            backoff.expo,
+            (httpx.HTTPStatusError, httpx.TransportError),
+            max_tries=self.max_tries,
+            giveup=self._give_up,
+            on_backoff=self._on_retry,
+        )(self._post)
+        if self.http_client is not None:
+            return await post(self.http_client, soap_request, headers)
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                self.base_url,
-                content=soap_request,
-                headers=headers,
-                timeout=self.timeout,
+            return await post(client, soap_request, headers)
+
+    async def _post(
+        self, client: "httpx.AsyncClient", soap_request: str, headers: dict[str, str]
+    ) -> "httpx.Response":
+        """Sends the SOAP request, hedging it when slow, and raises for error statuses."""
+        delay = self.hedge.delay() if self.hedge is not None else None
+        primary_headers = asyncio.Event()
+        if delay is None:
+            return await self._send(client, soap_request, headers, primary_headers)
+
+        primary = asyncio.ensure_future(
+            self._send(client, soap_request, headers, primary_headers)
+        )
+        attempts = [primary]
+        try:
+            headers_received = asyncio.ensure_future(primary_headers.wait())
+            done, _ = await asyncio.wait(
+                [primary, headers_received],
+                timeout=delay,
+                return_when=asyncio.FIRST_COMPLETED,
             )
-            response.raise_for_status()
+            headers_received.cancel()
+            if not done and (
+                self.retry_budget is None or self.retry_budget.can_retry()
+            ):
+                if self.retry_budget is not None:
+                    self.retry_budget.record_retry()
+                bamboorose_hedged_requests_total.labels(source=self.name).inc()
+                attempts.append(
+                    asyncio.ensure_future(
+                        self._send(
+                            client, soap_request, headers, asyncio.Event(), hedged=True
+                        )
+                    )
+                )
+
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in attempts:
+                    if attempt in done and attempt.exception() is None:
+                        if attempt is not primary:
+                            bamboorose_hedge_wins_total.labels(source=self.name).inc()
+                        return attempt.result()
+            # Every attempt failed: report the original request's error.
+            return primary.result()
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+            await asyncio.gather(*attempts, return_exceptions=True)
+
+    async def _send(
+        self,
+        client: "httpx.AsyncClient",
+        soap_request: str,
+        headers: dict[str, str],
+        headers_received: asyncio.Event,
+        hedged: bool = False,
+    ) -> "httpx.Response":
+        """Sends the request once, setting ``headers_received`` when headers arrive."""
+        with span("fetch_attempt", hedged=hedged) as span_args:
+            async with (
+                self.guard.attempt() if self.guard is not None else nullcontext()
+            ):
+                request = client.build_request(
+                    "POST",
+                    self.base_url,
+                    content=soap_request,
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+                started_at = time.monotonic()
+                response = await client.send(request, stream=True)
+                time_to_headers = time.monotonic() - started_at
+                headers_received.set()
+                bamboorose_time_to_headers_seconds.labels(source=self.name).observe(
+                    time_to_headers
+                )
+                if self.hedge is not None:
+                    self.hedge.observe(time_to_headers)
+                try:
+                    await response.aread()
+                finally:
+                    await response.aclose()
+                span_args["status_code"] = response.status_code
+                response.raise_for_status()
         return response
 
 
-def get_bamboorose_client() -> BambooroseClient:
+def get_bamboorose_client(
+    source: SourceSettings | None = None,
+    http_client: "httpx.AsyncClient | None" = None,
+    guard: RequestGuard | None = None,
+    retry_budget: RetryBudget | None = None,
+    hedge: HedgePolicy | None = None,
+    max_tries: int = 5,
+) -> BambooroseClient:
     """
     Returns an instance of the Bamboorose client.
 
     This function is used to inject the client into the application.
     """
-    return BambooroseClient()
+    return BambooroseClient(source, http_client, guard, retry_budget, hedge, max_tries)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Pluggable blob storage used for archiving raw payloads."""
+
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+
+class BlobStore(ABC):
+    """
+    A minimal key/value interface over an object store.
+
+    Keys are ``/``-separated relative paths. Implementations only need to support
+    whole-object reads and writes, which keeps the interface small enough to back
+    with a local directory or a GCS bucket.
+    """
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Stores ``data`` under ``key``, replacing any existing object."""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """
+        Returns the object stored under ``key``.
+
+        Raises:
+            KeyError: If no object exists for ``key``.
+        """
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Returns True if an object exists for ``key``."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Deletes the object stored under ``key``. Missing keys are ignored."""
+
+    @abstractmethod
+    def uri(self, key: str) -> str:
+        """Returns a URI that identifies ``key`` outside of this process."""
+
+
+class LocalBlobStore(BlobStore):
+    """A blob store backed by a directory on the local filesystem."""
+
+    def __init__(self, root: str | os.PathLike) -> None:
+        """
+        Initializes the local blob store.
+
+        Args:
+            root: The directory objects are written under. Created if missing.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"Blob key escapes the store root: {key!r}")
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a sibling temp file and rename so readers never see a partial object.
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError as e:
+            raise KeyError(key) from e
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def uri(self, key: str) -> str:
+        return self._path(key).as_uri()
+
+
+def get_blob_store(location: str) -> BlobStore:
+    """
+    Returns a blob store for the given location.
+
+    Only local directories are supported today; a ``gs://`` implementation can be
+    added here without changing any callers.
+
+    Args:
+        location: A local directory path or ``file://`` URI.
+    """
+    if location.startswith("file://"):
+        location = location.removeprefix("file://")
+    elif "://" in location:
+        raise ValueError(f"Unsupported blob store location: {location}")
+    return LocalBlobStore(location)
@@ -1,44 +1,306 @@
 # -*- coding: utf-8 -*-
 """Client for interacting with Kafka."""
 import asyncio
+import copy
+import hashlib
+import json
 import logging
+from collections.abc import Callable, Sequence
+from typing import Any
 
 from urbn_confluent_methods import ProducerService, KafkaProducerError
 from x35_json_logging import dynamic_context
 
+from src.clients.blob_store import BlobStore, get_blob_store
+from src.services.metrics import invoices_claim_checked_total, kafka_transactions_total
 from src.settings.config import get_settings
 
 logger = logging.getLogger(f"x35.{__name__}")
 
 
 class KafkaProducerClient:
-    """A client for producing messages to Kafka."""
+    """
+    A client for producing messages to Kafka.
+
+    Invoices larger than the claim-check threshold would exceed the broker's
+    maximum message size, so when a claim-check store is configured they are
+    written to it instead and only a reference to the stored payload is published.
 
-    def __init__(self) -> None:
-        """Initializes the Kafka producer client."""
+    In transactional mode, messages are published through the client returned by
+    ``for_transactions`` inside a transaction opened with ``begin_transaction``.
+    Messages are only confirmed as a whole when ``commit_transaction`` returns,
+    and consumers reading with ``isolation.level=read_committed`` never see those
+    of an aborted transaction.
+    """
+
+    def __init__(
+        self,
+        claim_check_store: BlobStore | None = None,
+        claim_check_threshold_bytes: int = 900_000,
+        transactional_producer_factory: Callable[[str], Any] | None = None,
+        transaction_timeout_seconds: float = 60.0,
+    ) -> None:
+        """
+        Initializes the Kafka producer client.
+
+        Args:
+            claim_check_store: Where oversized invoices are stored. None publishes
+                every invoice inline.
+            claim_check_threshold_bytes: The UTF-8 size above which an invoice is
+                stored rather than published inline.
+            transactional_producer_factory: Returns a producer with the
+                transactional API of ``confluent_kafka.Producer`` for a name passed
+                to ``for_transactions``, with a ``transactional.id`` unique to that
+                name. None publishes through ``ProducerService``.
+            transaction_timeout_seconds: How long committing or aborting a
+                transaction may block.
+        """
         settings = get_settings()
-        self.producer = ProducerService(topic=settings.kafka.producer_topic)
+        self.topic = settings.kafka.producer_topic
+        self.producer = ProducerService(topic=self.topic)
+        self.producers = {self.topic: self.producer}
+        self.claim_check_store = claim_check_store
+        self.claim_check_threshold_bytes = claim_check_threshold_bytes
+        self.transactional_producer_factory = transactional_producer_factory
+        self.transaction_timeout_seconds = transaction_timeout_seconds
+        self.transactional_producer: Any | None = None
+        self._transaction_clients: dict[str, KafkaProducerClient] = {}
+        self._transaction_clients_lock = asyncio.Lock()
+        self._transaction_lock = asyncio.Lock()
+
+    @property
+    def transactional(self) -> bool:
+        """True if messages are published in transactions."""
+        return self.transactional_producer_factory is not None
+
+    async def for_transactions(self, name: str) -> "KafkaProducerClient":
+        """
+        Returns the client that publishes the transactions of ``name``.
+
+        A producer can only have one transaction open at a time, so every source
+        lane, or other caller running its own transactions, gets a producer of its
+        own, created and initialized on first use. Initializing it fences off an
+        earlier instance with the same transactional ID. The returned client
+        shares this one's topic producers and claim-check store, and holds its
+        transaction open from ``begin_transaction`` until it is committed or
+        aborted, so callers sharing a name take turns rather than fail.
+        """
+        async with self._transaction_clients_lock:
+            client = self._transaction_clients.get(name)
+            if client is None:
+                producer = await asyncio.to_thread(self._init_transactional_producer, name)
+                client = copy.copy(self)
+                client.transactional_producer = producer
+                client._transaction_lock = asyncio.Lock()
+                self._transaction_clients[name] = client
+        return client
+
+    def _init_transactional_producer(self, name: str) -> Any:
+        producer = self.transactional_producer_factory(name)
+        producer.init_transactions(self.transaction_timeout_seconds)
+        return producer
+
+    def producer_for(self, topic: str | None = None) -> ProducerService:
+        """
+        Returns the producer for ``topic``, creating it on first use.
+
+        ``ProducerService`` is bound to a single topic, so sources that publish to
+        other topics get their own producer alongside the default one.
+        """
+        topic = topic or self.topic
+        if topic not in self.producers:
+            self.producers[topic] = ProducerService(topic=topic)
+        return self.producers[topic]
 
-    async def publish_invoice(self, invoice: str, trace_id: str) -> None:
+    async def publish_invoice(
+        self, invoice: str | memoryview, trace_id: str, topic: str | None = None
+    ) -> None:
         """
         Publishes an invoice to Kafka asynchronously.
 
         Args:
-            invoice: The invoice to publish.
+            invoice: The invoice to publish, as a string or a view of its UTF-8 bytes.
+                Views are only decoded here, at the boundary with the producer.
             trace_id: The trace ID for the request.
+            topic: The topic to publish to. Defaults to the configured producer topic.
         """
+        try:
+            await asyncio.to_thread(self._produce, topic, invoice, trace_id)
+        except KafkaProducerError as e:
+            with dynamic_context(trace_id=trace_id):
+                logger.error("Failed to publish message to Kafka", exc_info=e)
+            raise
+
+    async def publish_envelope(
+        self,
+        invoices: Sequence[str | memoryview],
+        invoice_ids: Sequence[str],
+        trace_id: str,
+        topic: str | None = None,
+    ) -> None:
+        """
+        Publishes several invoices to Kafka as a single envelope message.
+
+        The ``invoice_ids`` header lists the ids of the contained invoices, in order,
+        so consumers can route or deduplicate an envelope without decoding it.
+
+        Args:
+            invoices: The invoices to publish, as strings or views of their UTF-8 bytes.
+            invoice_ids: The ids of ``invoices``, in the same order.
+            trace_id: The trace ID for the request.
+            topic: The topic to publish to. Defaults to the configured producer topic.
+        """
+        message = {
+            "invoices": [
+                invoice if isinstance(invoice, str) else str(invoice, "utf-8")
+                for invoice in invoices
+            ]
+        }
         try:
             await asyncio.to_thread(
-                self.producer.create_message,
-                key=trace_id,
-                message={"invoice": invoice},
-                headers={"trace_id": trace_id},
+                self._send,
+                topic,
+                trace_id,
+                message,
+                {
+                    "trace_id": trace_id,
+                    "invoice_ids": ",".join(invoice_ids),
+                    "invoice_count": str(len(invoices)),
+                },
             )
         except KafkaProducerError as e:
             with dynamic_context(trace_id=trace_id):
-                logger.error("Failed to publish message to Kafka", exc_info=e)
+                logger.error("Failed to publish envelope to Kafka", exc_info=e)
             raise
 
+    async def begin_transaction(self) -> None:
+        """
+        Opens the transaction that the following messages are published in.
+
+        Waits while another caller has a transaction of this client open.
+        """
+        await self._transaction_lock.acquire()
+        try:
+            await asyncio.to_thread(self.transactional_producer.begin_transaction)
+        except BaseException:
+            self._transaction_lock.release()
+            raise
+
+    async def commit_transaction(self) -> None:
+        """
+        Delivers the open transaction's messages and commits them atomically.
+
+        Raises:
+            Exception: The producer's error if the transaction could not be
+                committed. It is aborted then, so none of its messages are visible
+                to read-committed consumers.
+        """
+        try:
+            await asyncio.to_thread(
+                self.transactional_producer.commit_transaction,
+                self.transaction_timeout_seconds,
+            )
+        except Exception as e:
+            logger.error("Failed to commit Kafka transaction", exc_info=e)
+            await self._abort()
+            raise
+        finally:
+            self._transaction_lock.release()
+        kafka_transactions_total.labels(outcome="committed").inc()
+
+    async def abort_transaction(self) -> None:
+        """
+        Aborts the open transaction, discarding its messages for read-committed consumers.
+
+        Failing to abort is logged rather than raised: the broker aborts the
+        transaction itself once it times out, and the caller is typically already
+        handling the error that made it abort.
+        """
+        try:
+            await self._abort()
+        finally:
+            self._transaction_lock.release()
+
+    async def _abort(self) -> None:
+        try:
+            await asyncio.to_thread(
+                self.transactional_producer.abort_transaction,
+                self.transaction_timeout_seconds,
+            )
+        except Exception as e:
+            logger.error("Failed to abort Kafka transaction", exc_info=e)
+            return
+        kafka_transactions_total.labels(outcome="aborted").inc()
+
+    def _produce(
+        self, topic: str | None, invoice: str | memoryview, trace_id: str
+    ) -> None:
+        message = self._claim_check(invoice)
+        if message is None:
+            if not isinstance(invoice, str):
+                invoice = str(invoice, "utf-8")
+            message = {"invoice": invoice}
+        self._send(topic, trace_id, message, {"trace_id": trace_id})
+
+    def _send(
+        self, topic: str | None, key: str, message: dict, headers: dict[str, str]
+    ) -> None:
+        if self.transactional_producer is None:
+            if self.transactional:
+                raise RuntimeError("Transactional messages are published through for_transactions")
+            self.producer_for(topic).create_message(
+                key=key, message=message, headers=headers
+            )
+            return
+        # Serialized as ProducerService does without a schema, so consumers see
+        # the same payloads in either mode.
+        value = json.dumps(message).encode("utf-8")
+        while True:
+            try:
+                self.transactional_producer.produce(
+                    topic or self.topic, value=value, key=key, headers=headers
+                )
+                return
+            except BufferError:
+                # The local queue is full; wait for deliveries to make room.
+                self.transactional_producer.poll(1)
+
+    def _claim_check(self, invoice: str | memoryview) -> dict | None:
+        """
+        Stores an oversized invoice and returns the reference message to publish in its place.
+
+        Returns:
+            None if the invoice is small enough to publish inline.
+        """
+        if self.claim_check_store is None:
+            return None
+        # A str never takes more than four UTF-8 bytes per character, so most
+        # invoices are ruled out without encoding them.
+        if isinstance(invoice, str) and len(invoice) * 4 <= self.claim_check_threshold_bytes:
+            return None
+        payload = invoice.encode("utf-8") if isinstance(invoice, str) else invoice
+        if len(payload) <= self.claim_check_threshold_bytes:
+            return None
+
+        digest = hashlib.sha256(payload).hexdigest()
+        # Content addressing makes a retried or replayed invoice reuse the same object.
+        key = f"invoices/{digest[:2]}/{digest}.xml"
+        if not self.claim_check_store.exists(key):
+            self.claim_check_store.put(key, bytes(payload))
+        invoices_claim_checked_total.inc()
+        return {
+            "claim_check": {
+                "uri": self.claim_check_store.uri(key),
+                "sha256": digest,
+                "size": len(payload),
+            }
+        }
+
+    def flush(self) -> None:
+        """Blocks until every producer has delivered its queued messages."""
+        for producer in self.producers.values():
+            producer.flush()
+
 
 def get_kafka_producer_client() -> KafkaProducerClient:
     """
@@ -46,4 +308,42 @@ def get_kafka_producer_client() -> KafkaProducerClient:
 
     This function is used to inject the client into the application.
     """
-    return KafkaProducerClient()
+    settings = get_settings()
+    claim_check = settings.claim_check
+    return KafkaProducerClient(
+        claim_check_store=(
+            get_blob_store(claim_check.location) if claim_check.enabled else None
+        ),
+        claim_check_threshold_bytes=claim_check.threshold_bytes,
+        transactional_producer_factory=(
+            get_transactional_producer if settings.kafka.transactional_id else None
+        ),
+        transaction_timeout_seconds=settings.kafka.transaction_timeout_seconds,
+    )
+
+
+def get_transactional_producer(name: str) -> Any:
+    """
+    Returns a transactional producer for the transactions of ``name``.
+
+    ``ProducerService`` does not expose Kafka transactions, so transactional mode
+    produces through an idempotent ``confluent_kafka.Producer`` directly, with the
+    same broker credentials. Its transactional ID is the configured one suffixed
+    with ``name``, so it stays the same across restarts.
+    """
+    kafka = get_settings().kafka
+    from confluent_kafka import Producer
+
+    return Producer(
+        {
+            "bootstrap.servers": kafka.bootstrap_servers,
+            "security.protocol": "SASL_SSL",
+            "sasl.mechanisms": "PLAIN",
+            "sasl.username": kafka.api_key,
+            "sasl.password": kafka.api_secret,
+            "enable.idempotence": True,
+            "acks": "all",
+            "transactional.id": f"{kafka.transactional_id}-{name}",
+            "transaction.timeout.ms": int(kafka.transaction_timeout_seconds * 1000),
+        }
+    )
@@ -0,0 +1,467 @@
+# -*- coding: utf-8 -*-
+"""Adaptive load control for calls to upstream APIs."""
+
+import asyncio
+import bisect
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+
+from src.services.metrics import (
+    bamboorose_circuit_state,
+    bamboorose_circuit_trips_total,
+    bamboorose_concurrency_limit,
+    bamboorose_requests_in_flight,
+    bamboorose_requests_rejected_total,
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open."""
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    An AIMD limit on the number of concurrent calls to an upstream.
+
+    Every call that succeeds within the latency target raises the limit by
+    ``1 / limit``, so the limit grows by roughly one per round of calls. A failure
+    or a slow call multiplies the limit by ``decrease_ratio``. Only calls that
+    started after the last decrease can trigger another one, so a burst of
+    failures from a single round only backs off once.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_target_seconds: float = 10.0,
+        decrease_ratio: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initializes the limiter.
+
+        Args:
+            initial_limit: The concurrency limit to start from.
+            min_limit: The limit never drops below this.
+            max_limit: The limit never grows above this.
+            latency_target_seconds: Calls slower than this count as congestion.
+            decrease_ratio: The factor the limit is multiplied by on congestion.
+            clock: The monotonic clock used to order calls and decreases.
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Expected 1 <= min_limit <= initial_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target_seconds = latency_target_seconds
+        self.decrease_ratio = decrease_ratio
+        self._clock = clock
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def limit(self) -> int:
+        """The current concurrency limit."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """The number of calls currently holding a slot."""
+        return self._in_flight
+
+    async def acquire(self) -> float:
+        """
+        Waits for a slot.
+
+        Returns:
+            The start time of the call, to be passed back to ``release``.
+        """
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return self._clock()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._in_flight -= 1
+                self._wake()
+            raise
+        return self._clock()
+
+    def release(self, started_at: float, succeeded: bool | None) -> None:
+        """
+        Returns a slot and adapts the limit to the call's outcome.
+
+        Args:
+            started_at: The value returned by ``acquire``.
+            succeeded: Whether the call succeeded. None releases the slot without
+                adapting the limit, e.g. when the call was cancelled.
+        """
+        self._in_flight -= 1
+        if succeeded is not None:
+            latency = self._clock() - started_at
+            if succeeded and latency <= self.latency_target_seconds:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            elif started_at > self._last_decrease:
+                self._limit = max(self.min_limit, self._limit * self.decrease_ratio)
+                self._last_decrease = self._clock()
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self._in_flight += 1
+                future.set_result(None)
+
+
+class CircuitBreaker:
+    """
+    A failure-rate circuit breaker.
+
+    The breaker trips open when the failure rate over the last ``window_size`` calls
+    reaches ``failure_rate_threshold``. While open, calls are rejected immediately.
+    After ``open_seconds`` a single probe call is let through: if it succeeds the
+    breaker closes, otherwise it opens again.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        minimum_calls: int = 5,
+        open_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initializes the circuit breaker.
+
+        Args:
+            failure_rate_threshold: The failure rate that trips the breaker.
+            window_size: The number of most recent calls the rate is computed over.
+            minimum_calls: The breaker does not trip before this many calls are recorded.
+            open_seconds: How long the breaker stays open before letting a probe through.
+            clock: The monotonic clock used to time the open state.
+        """
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._outcomes: deque[bool] = deque(maxlen=window_size)
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        """The current state, moving from open to half-open once the open period ends."""
+        if (
+            self._state == self.OPEN
+            and self._clock() - self._opened_at >= self.open_seconds
+        ):
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def before_call(self) -> None:
+        """
+        Checks whether a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with a probe in flight.
+        """
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight):
+            raise CircuitOpenError("Circuit breaker is open")
+        if state == self.HALF_OPEN:
+            self._probe_in_flight = True
+
+    def record(self, succeeded: bool | None) -> None:
+        """
+        Records the outcome of a call allowed by ``before_call``.
+
+        Args:
+            succeeded: Whether the call succeeded. None records nothing but frees the
+                probe slot, e.g. when the call was cancelled.
+        """
+        if self._state == self.HALF_OPEN:
+            self._probe_in_flight = False
+            if succeeded is True:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            elif succeeded is False:
+                self._trip()
+            return
+        if succeeded is None:
+            return
+
+        self._outcomes.append(succeeded)
+        if len(self._outcomes) >= self.minimum_calls:
+            failure_rate = self._outcomes.count(False) / len(self._outcomes)
+            if failure_rate >= self.failure_rate_threshold:
+                self._trip()
+
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.trips += 1
+
+
+_CIRCUIT_STATE_VALUES = {
+    CircuitBreaker.CLOSED: 0,
+    CircuitBreaker.HALF_OPEN: 1,
+    CircuitBreaker.OPEN: 2,
+}
+
+
+def is_upstream_failure(e: BaseException) -> bool:
+    """Returns True if ``e`` indicates the upstream is unhealthy rather than the request bad."""
+    import httpx
+
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+class RequestGuard:
+    """
+    Combines an adaptive limiter and a circuit breaker around each upstream attempt.
+
+    Timeouts, connection errors and 5xx responses count as failures; 4xx responses
+    mean the upstream is healthy and count as successes.
+
+    A source fetches one window per run, so its attempts only overlap when its
+    live and background lanes fetch at the same time or a slow request is hedged.
+    The limiter caps that overlap and backs it off under congestion; it never
+    makes a source send more requests than its runs ask for.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limiter: AdaptiveConcurrencyLimiter,
+        breaker: CircuitBreaker,
+    ) -> None:
+        """
+        Initializes the guard.
+
+        Args:
+            name: The source name used to label the guard's metrics.
+            limiter: The concurrency limiter to acquire before each attempt.
+            breaker: The circuit breaker consulted before each attempt.
+        """
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        bamboorose_concurrency_limit.labels(source=self.name).set(self.limiter.limit)
+        bamboorose_requests_in_flight.labels(source=self.name).set(
+            self.limiter.in_flight
+        )
+        bamboorose_circuit_state.labels(source=self.name).set(
+            _CIRCUIT_STATE_VALUES[self.breaker.state]
+        )
+
+    @asynccontextmanager
+    async def attempt(self) -> AsyncIterator[None]:
+        """
+        Guards a single request attempt.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker rejects the attempt.
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            bamboorose_requests_rejected_total.labels(source=self.name).inc()
+            self._update_gauges()
+            raise
+        try:
+            started_at = await self.limiter.acquire()
+        except BaseException:
+            self.breaker.record(None)
+            raise
+        self._update_gauges()
+
+        succeeded = None
+        try:
+            yield
+            succeeded = True
+        except Exception as e:
+            succeeded = not is_upstream_failure(e)
+            raise
+        finally:
+            trips = self.breaker.trips
+            self.limiter.release(started_at, succeeded)
+            self.breaker.record(succeeded)
+            if self.breaker.trips > trips:
+                bamboorose_circuit_trips_total.labels(source=self.name).inc()
+            self._update_gauges()
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of the requests made over a sliding window.
+
+    Retries on their own multiply load on an upstream that is already struggling:
+    with five tries, a failing upstream sees five times its usual traffic. A budget
+    shared by all sources bounds that amplification to ``ratio``, while
+    ``min_retries`` keeps occasional errors retryable when traffic is low.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_retries: int = 5,
+        window_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initializes the budget.
+
+        Args:
+            ratio: The retries allowed per request made within the window.
+            min_retries: The retries always allowed within the window.
+            window_seconds: The sliding window requests and retries are counted over.
+            clock: The monotonic clock used to expire the window.
+        """
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+
+    def _expire(self) -> float:
+        now = self._clock()
+        cutoff = now - self.window_seconds
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+        return now
+
+    def record_request(self) -> None:
+        """Records a request, which adds ``ratio`` retries to the budget."""
+        self._requests.append(self._expire())
+
+    def can_retry(self) -> bool:
+        """Returns True if the budget allows another retry."""
+        self._expire()
+        allowed = max(self.min_retries, self.ratio * len(self._requests))
+        return len(self._retries) < allowed
+
+    def record_retry(self) -> None:
+        """Records a retry or hedged request taken from the budget."""
+        self._retries.append(self._expire())
+
+
+class LatencyHistogram:
+    """
+    A histogram of latencies in exponentially sized buckets, decaying over time.
+
+    Once ``decay_after`` observations have been counted every bucket is halved, so
+    quantiles follow the upstream's recent latency rather than its whole history.
+    """
+
+    def __init__(
+        self,
+        min_seconds: float = 0.01,
+        max_seconds: float = 600.0,
+        growth: float = 1.25,
+        decay_after: int = 200,
+    ) -> None:
+        """
+        Initializes an empty histogram.
+
+        Args:
+            min_seconds: The upper bound of the first bucket.
+            max_seconds: Latencies above this are counted in the last bucket.
+            growth: The ratio between the bounds of consecutive buckets.
+            decay_after: The number of observations that triggers halving the counts.
+        """
+        self.bounds = [min_seconds]
+        while self.bounds[-1] < max_seconds:
+            self.bounds.append(self.bounds[-1] * growth)
+        self.decay_after = decay_after
+        self._counts = [0.0] * len(self.bounds)
+        self._total = 0.0
+
+    @property
+    def count(self) -> float:
+        """The decayed number of observations."""
+        return self._total
+
+    def observe(self, seconds: float) -> None:
+        """Counts a latency."""
+        index = min(bisect.bisect_left(self.bounds, seconds), len(self.bounds) - 1)
+        self._counts[index] += 1
+        self._total += 1
+        if self._total >= self.decay_after:
+            self._counts = [count / 2 for count in self._counts]
+            self._total /= 2
+
+    def quantile(self, q: float) -> float:
+        """Returns the upper bound of the bucket holding the ``q`` quantile."""
+        rank = q * self._total
+        cumulative = 0.0
+        for bound, count in zip(self.bounds, self._counts):
+            cumulative += count
+            if cumulative >= rank and cumulative > 0:
+                return bound
+        return self.bounds[-1]
+
+
+class HedgePolicy:
+    """
+    Decides when a slow request is duplicated.
+
+    A request that has not received response headers after the ``percentile``
+    latency of recent requests is likely stuck behind a slow connection or a busy
+    upstream worker; sending the same request again and taking whichever response
+    completes first cuts that tail at the cost of a few percent more requests.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay_seconds: float = 1.0,
+        min_samples: int = 20,
+        histogram: LatencyHistogram | None = None,
+    ) -> None:
+        """
+        Initializes the policy.
+
+        Args:
+            percentile: The time-to-headers percentile after which a request is hedged.
+            min_delay_seconds: Requests are never hedged sooner than this.
+            min_samples: No request is hedged before this many latencies are observed.
+            histogram: The histogram of time-to-headers latencies.
+        """
+        self.percentile = percentile
+        self.min_delay_seconds = min_delay_seconds
+        self.min_samples = min_samples
+        self.histogram = histogram if histogram is not None else LatencyHistogram()
+
+    def observe(self, seconds: float) -> None:
+        """Records the time a request took to receive response headers."""
+        self.histogram.observe(seconds)
+
+    def delay(self) -> float | None:
+        """Returns how long to wait for headers before hedging, or None to not hedge."""
+        if self.histogram.count < self.min_samples:
+            return None
+        return max(self.min_delay_seconds, self.histogram.quantile(self.percentile))
@@ -1,17 +1,33 @@
 # -*- coding: utf-8 -*-
 """Application entrypoint."""
-import uvicorn
+from fastapi import FastAPI
 
-from src.app import create_app
-from src.settings.config import get_settings
 
-app = create_app()
-settings = get_settings()
+def __getattr__(name: str) -> FastAPI:
+    """
+    Creates the application on first access to ``app``, e.g. by ``uvicorn src.main:app``.
+
+    Importing this module does no work, so running it as a script does not build an
+    application that uvicorn would then build again.
+    """
+    if name == "app":
+        from src.app import create_app
+
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
+    import uvicorn
+
+    from src.settings.config import get_settings
+
+    settings = get_settings()
     uvicorn.run(
-        "src.main:app",
+        "src.app:create_app",
+        factory=True,
         host=settings.fastapi.host,
         port=settings.fastapi.port,
         reload=settings.fastapi.reload,
-    )
\ No newline at end of file
+    )
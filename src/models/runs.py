@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""API models for invoice processing runs."""
+
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class RunStatus(BaseModel):
+    """The status of a processing run of one source."""
+
+    run_id: str = Field(description="The id of the run, used to look up its status.")
+    source: str = Field(description="The name of the source the run processes.")
+    trigger: str = Field(description="What started the run: schedule or api.")
+    status: str = Field(description="One of running, succeeded, failed or cancelled.")
+    coalesced: bool = Field(
+        False,
+        description="True if the request joined a run that was already in flight.",
+    )
+    started_at: datetime
+    finished_at: datetime | None = None
+    result: dict[str, int | float] | None = Field(
+        None, description="The run summary counts and stage timings once it succeeded."
+    )
+    error: str | None = Field(None, description="Why the run failed.")
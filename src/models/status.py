@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""API models for the ingestion status used by autoscalers."""
+
+from pydantic import BaseModel, Field
+
+
+class SourceStatus(BaseModel):
+    """How far behind a single lane of a source is."""
+
+    source: str = Field(description="The name of the source.")
+    lane: str = Field("live", description="The lane of the source, live or background.")
+    checkpoint: str | None = Field(
+        None, description="The committed checkpoint, once the source has run."
+    )
+    lag_seconds: float | None = Field(
+        None, description="The wall clock minus the committed checkpoint."
+    )
+    backlog_invoices: int = Field(
+        description="Invoices of the current batch not yet published, including failed ones."
+    )
+    backlog_bytes: int = Field(description="The estimated bytes of those invoices.")
+    running: bool = Field(description="True while a run of the source is publishing.")
+
+
+class IngestionStatus(BaseModel):
+    """The lag, backlog and throughput of the service as a whole."""
+
+    max_lag_seconds: float | None = Field(
+        None, description="The largest lag of any source with a known checkpoint."
+    )
+    backlog_invoices: int = Field(description="The backlog of every source combined.")
+    backlog_bytes: int = Field(
+        description="The estimated bytes of the combined backlog."
+    )
+    throughput_invoices_per_second: float = Field(
+        description="Invoices published per second over the recent throughput window."
+    )
+    runs_in_flight: int = Field(description="The number of runs currently in flight.")
+    runs_waiting_for_memory: int = Field(
+        description="The number of runs waiting for the memory budget before fetching."
+    )
+    sources: list[SourceStatus]
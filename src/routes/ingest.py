@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Endpoints to trigger invoice processing runs and look up their status."""
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+
+from src.models.runs import RunStatus
+from src.services.runs import Run, RunRejectedError
+
+ingest_router = APIRouter(prefix="/runs")
+
+
+def _run_status(run: Run, coalesced: bool = False) -> RunStatus:
+    return RunStatus(
+        run_id=run.id,
+        source=run.source,
+        trigger=run.trigger,
+        status=run.status,
+        coalesced=coalesced,
+        started_at=run.started_at,
+        finished_at=run.finished_at,
+        result=run.result,
+        error=run.error,
+    )
+
+
+@ingest_router.post("", response_model=list[RunStatus])
+async def trigger_runs(
+    request: Request,
+    response: Response,
+    source: str | None = None,
+    wait: bool = False,
+) -> list[RunStatus]:
+    """
+    Starts a processing run of one source, or of every source.
+
+    A source that already has a run in flight is not run again: the request joins
+    that run instead. Without ``wait`` the runs are returned as soon as they are
+    started, with a 202 status; with it, the response is sent once they finish.
+    """
+    sources = request.app.state.sources
+    if source is not None:
+        try:
+            sources.get(source)
+        except KeyError:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, f"Unknown source {source!r}")
+    names = [source] if source is not None else [s.name for s in sources]
+
+    runs = request.app.state.runs
+
+    try:
+        started = [runs.start(name, trigger="api") for name in names]
+    except RunRejectedError as e:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, str(e))
+
+    if wait:
+        await asyncio.gather(*(runs.wait(run) for run, _ in started))
+    else:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return [_run_status(run, coalesced=not created) for run, created in started]
+
+
+@ingest_router.get("", response_model=list[RunStatus])
+async def list_runs(request: Request) -> list[RunStatus]:
+    """Lists the runs in flight and the most recent finished ones, newest first."""
+    return [_run_status(run) for run in request.app.state.runs.recent()]
+
+
+@ingest_router.get("/{run_id}", response_model=RunStatus)
+async def get_run(request: Request, run_id: str) -> RunStatus:
+    """Returns the status of a run."""
+    run = request.app.state.runs.get(run_id)
+    if run is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Unknown run {run_id!r}")
+    return _run_status(run)
@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 """Metrics endpoint."""
-from fastapi import APIRouter
-from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from fastapi import APIRouter, Request
+from prometheus_client import CONTENT_TYPE_LATEST
 from starlette.responses import Response
 
 metrics_router = APIRouter()
 
 
 @metrics_router.get("/metrics")
-async def metrics() -> Response:
+async def metrics(request: Request) -> Response:
     """
     Exposes Prometheus metrics.
+
+    The exposition is rendered off the event loop and cached for
+    ``APP_METRICS_MAX_AGE_SECONDS``, so frequent scrapes do not slow ingestion.
     """
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    exposition = request.app.state.metrics_exposition
+    return Response(await exposition.render(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Endpoint exposing ingestion lag and backlog to autoscalers."""
+
+import math
+
+from fastapi import APIRouter, Request
+
+from src.models.status import IngestionStatus, SourceStatus
+from src.services.lanes import BACKGROUND_LANE, LIVE_LANE, lane_name
+
+status_router = APIRouter()
+
+
+@status_router.get("/status", response_model=IngestionStatus)
+async def ingestion_status(request: Request) -> IngestionStatus:
+    """
+    Returns how far behind ingestion is.
+
+    This is cheap to call and meant to be polled by an external scaler: capacity
+    can be added while lag or backlog grow, e.g. during a backfill, and removed
+    once every source has caught up. A source's background lane is listed while
+    it has a backfill to drain.
+    """
+    state = request.app.state
+    backlog = state.backlog
+    tracked = backlog.sources()
+    sources = []
+    for source in state.sources:
+        for lane in (LIVE_LANE, BACKGROUND_LANE):
+            name = lane_name(source.name, lane)
+            if lane != LIVE_LANE and name not in tracked:
+                continue
+            source_backlog = backlog.source(name)
+            lag = backlog.lag_seconds(name)
+            sources.append(
+                SourceStatus(
+                    source=source.name,
+                    lane=lane,
+                    checkpoint=source_backlog.checkpoint,
+                    lag_seconds=None if math.isnan(lag) else lag,
+                    backlog_invoices=source_backlog.pending_invoices,
+                    backlog_bytes=source_backlog.pending_bytes,
+                    running=source_backlog.running,
+                )
+            )
+    lags = [source.lag_seconds for source in sources if source.lag_seconds is not None]
+    return IngestionStatus(
+        max_lag_seconds=max(lags, default=None),
+        backlog_invoices=sum(source.backlog_invoices for source in sources),
+        backlog_bytes=sum(source.backlog_bytes for source in sources),
+        throughput_invoices_per_second=backlog.throughput(),
+        runs_in_flight=len(state.runs.in_flight()),
+        runs_waiting_for_memory=(
+            state.memory_budget.waiting if state.memory_budget is not None else 0
+        ),
+        sources=sources,
+    )
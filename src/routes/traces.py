@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Endpoints to fetch the span traces of recent invoice processing runs."""
+
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from src.services.tracing import TraceBuffer, chrome_trace
+
+traces_router = APIRouter(prefix="/traces")
+
+
+def _trace_buffer(request: Request) -> TraceBuffer:
+    traces = request.app.state.traces
+    if traces is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Run tracing is disabled")
+    return traces
+
+
+@traces_router.get("")
+async def get_recent_traces(request: Request) -> dict[str, Any]:
+    """
+    Returns the traces of the recent runs as one Chrome trace document.
+
+    Each run is drawn on its own row, so overlapping runs of different sources
+    can be compared in Perfetto or chrome://tracing.
+    """
+    return chrome_trace(_trace_buffer(request).recent())
+
+
+@traces_router.get("/{trace_id}")
+async def get_trace(request: Request, trace_id: str) -> dict[str, Any]:
+    """Returns the trace of a single run, identified by its trace ID."""
+    trace = _trace_buffer(request).get(trace_id)
+    if trace is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Unknown trace {trace_id!r}")
+    return chrome_trace([trace])
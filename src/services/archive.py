@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed archive of raw Bamboorose responses."""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from src.clients.blob_store import BlobStore
+
+INDEX_KEY = "index.json"
+
+
+class ArchiveError(Exception):
+    """Custom exception for archive read errors."""
+
+
+@dataclass(frozen=True)
+class ArchiveEntry:
+    """A single archived response, as recorded in the archive index."""
+
+    window: str
+    archived_at: float
+    digest: str
+    size: int
+
+    @property
+    def blob_key(self) -> str:
+        """The key of the compressed response body in the blob store."""
+        return f"responses/{self.digest[:2]}/{self.digest}.xml.gz"
+
+
+class ResponseArchive:
+    """
+    Stores raw response bodies compressed and addressed by their SHA-256 digest.
+
+    An index maps each ``available_timestamp`` window to the blob fetched for it,
+    so a time range can be replayed later without calling Bamboorose again.
+    Identical bodies are stored once, however many windows reference them.
+    """
+
+    def __init__(
+        self,
+        store: BlobStore,
+        max_age_seconds: int | None = None,
+        max_entries: int | None = None,
+    ) -> None:
+        """
+        Initializes the response archive.
+
+        Args:
+            store: The blob store to write responses and the index to.
+            max_age_seconds: Entries older than this are pruned. None keeps them forever.
+            max_entries: Only the newest entries up to this count are kept. None is unbounded.
+        """
+        self.store = store
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _load_index(self) -> list[ArchiveEntry]:
+        try:
+            raw = self.store.get(INDEX_KEY)
+        except KeyError:
+            return []
+        return [ArchiveEntry(**entry) for entry in json.loads(raw)]
+
+    def _save_index(self, entries: list[ArchiveEntry]) -> None:
+        data = json.dumps([asdict(entry) for entry in entries]).encode("utf-8")
+        self.store.put(INDEX_KEY, data)
+
+    def _prune(self, entries: list[ArchiveEntry], now: float) -> list[ArchiveEntry]:
+        kept = entries
+        if self.max_age_seconds is not None:
+            cutoff = now - self.max_age_seconds
+            kept = [entry for entry in kept if entry.archived_at >= cutoff]
+        if self.max_entries is not None and len(kept) > self.max_entries:
+            kept = sorted(kept, key=lambda entry: entry.archived_at)[
+                -self.max_entries :
+            ]
+
+        live_digests = {entry.digest for entry in kept}
+        for entry in entries:
+            if entry.digest not in live_digests:
+                self.store.delete(entry.blob_key)
+        return kept
+
+    def archive(
+        self, window: str, body: bytes, now: float | None = None
+    ) -> ArchiveEntry:
+        """
+        Archives a raw response body for a timestamp window.
+
+        This performs blocking I/O and should be run in a thread from async code.
+
+        Args:
+            window: The ``available_timestamp`` the response was fetched for.
+            body: The raw response body.
+            now: The archive time as a UNIX timestamp. Defaults to the current time.
+
+        Returns:
+            The index entry recorded for the response.
+        """
+        now = time.time() if now is None else now
+        entry = ArchiveEntry(
+            window=window,
+            archived_at=now,
+            digest=hashlib.sha256(body).hexdigest(),
+            size=len(body),
+        )
+        with self._lock:
+            if not self.store.exists(entry.blob_key):
+                self.store.put(entry.blob_key, gzip.compress(body, compresslevel=6))
+            entries = self._load_index()
+            entries.append(entry)
+            self._save_index(self._prune(entries, now))
+        return entry
+
+    def entries(self, start: str, end: str) -> list[ArchiveEntry]:
+        """
+        Returns the archived entries whose window falls within ``[start, end]``.
+
+        Windows are compared as ISO-8601 strings, so both bounds must use the same
+        format as the ``available_timestamp`` values. Entries are ordered by window
+        and then by archive time.
+        """
+        with self._lock:
+            entries = self._load_index()
+        selected = [entry for entry in entries if start <= entry.window <= end]
+        return sorted(selected, key=lambda entry: (entry.window, entry.archived_at))
+
+    def read(self, entry: ArchiveEntry) -> bytes:
+        """
+        Returns the raw response body for an archived entry.
+
+        Raises:
+            ArchiveError: If the blob is missing or does not match its digest.
+        """
+        try:
+            body = gzip.decompress(self.store.get(entry.blob_key))
+        except KeyError as e:
+            raise ArchiveError(f"Archived response {entry.digest} is missing") from e
+        except (OSError, EOFError) as e:
+            raise ArchiveError(f"Archived response {entry.digest} is corrupt") from e
+        if hashlib.sha256(body).hexdigest() != entry.digest:
+            raise ArchiveError(f"Archived response {entry.digest} is corrupt")
+        return body
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Ingestion lag, backlog and throughput signals for autoscaling."""
+
+import math
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+
+def parse_timestamp(value: str) -> float:
+    """Returns the epoch seconds of an ``availableTimestamp`` such as ``2023-01-01T00:00:00Z``."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+@dataclass
+class SourceBacklog:
+    """What is known about how far behind a single source is."""
+
+    checkpoint: str | None = None
+    batch_invoices: int = 0
+    batch_bytes: int = 0
+    pending_invoices: int = 0
+    running: bool = False
+
+    @property
+    def pending_bytes(self) -> int:
+        """The bytes of the pending invoices, estimated from the batch's average invoice size."""
+        if not self.batch_invoices:
+            return 0
+        return round(self.batch_bytes * self.pending_invoices / self.batch_invoices)
+
+
+class BacklogTracker:
+    """
+    Tracks how far behind ingestion is, for autoscaling.
+
+    - Lag is the wall clock minus a source's committed checkpoint, i.e. the age of
+      the oldest data that has not been fully published yet.
+    - Backlog is the invoices of the current batch that are not yet accounted for,
+      plus those that failed and will be retried, with their estimated bytes.
+    - Throughput is the invoices published per second over a sliding window.
+
+    Processing runs report their progress here; gauges and the status endpoint
+    read from it when they are scraped.
+    """
+
+    def __init__(
+        self,
+        throughput_window_seconds: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        Initializes the tracker.
+
+        Args:
+            throughput_window_seconds: The window throughput is averaged over.
+            clock: Returns the current epoch time. Replaceable for tests.
+        """
+        self.throughput_window_seconds = throughput_window_seconds
+        self._clock = clock
+        self._sources: dict[str, SourceBacklog] = {}
+        self._published: deque[tuple[float, int]] = deque()
+
+    def source(self, name: str) -> SourceBacklog:
+        """Returns the backlog of source ``name``."""
+        return self._sources.setdefault(name, SourceBacklog())
+
+    def sources(self) -> dict[str, SourceBacklog]:
+        """Returns the backlog of every source that has reported, by name."""
+        return dict(self._sources)
+
+    def committed(self, name: str, checkpoint: str) -> None:
+        """Records the checkpoint a source has published everything up to."""
+        self.source(name).checkpoint = checkpoint
+
+    def forget(self, name: str) -> None:
+        """Drops what is known about ``name``, e.g. a background lane that has caught up."""
+        self._sources.pop(name, None)
+
+    def batch_started(self, name: str, invoices: int, size: int) -> None:
+        """Records that a source started publishing a batch of ``invoices`` taking ``size`` bytes."""
+        backlog = self.source(name)
+        backlog.running = True
+        backlog.batch_invoices = invoices
+        backlog.batch_bytes = size
+        backlog.pending_invoices = invoices
+
+    def batch_progress(self, name: str, pending: int) -> None:
+        """Records how many invoices of the current batch are still pending."""
+        self.source(name).pending_invoices = pending
+
+    def batch_finished(self, name: str) -> None:
+        """Records that a source's run ended. Pending invoices stay in the backlog."""
+        self.source(name).running = False
+
+    def record_published(self, count: int) -> None:
+        """Adds ``count`` published invoices to the throughput window."""
+        if count:
+            now = self._clock()
+            self._published.append((now, count))
+            self._expire(now)
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.throughput_window_seconds
+        while self._published and self._published[0][0] < cutoff:
+            self._published.popleft()
+
+    def lag_seconds(self, name: str) -> float:
+        """Returns the lag of source ``name``, or NaN until its checkpoint is known."""
+        checkpoint = self.source(name).checkpoint
+        if checkpoint is None:
+            return math.nan
+        return max(0.0, self._clock() - parse_timestamp(checkpoint))
+
+    def pending_invoices(self, name: str) -> int:
+        """Returns the invoices of source ``name`` not yet published."""
+        return self.source(name).pending_invoices
+
+    def pending_bytes(self, name: str) -> int:
+        """Returns the estimated bytes of the invoices of source ``name`` not yet published."""
+        return self.source(name).pending_bytes
+
+    def throughput(self) -> float:
+        """Returns the invoices published per second over the throughput window."""
+        self._expire(self._clock())
+        return (
+            sum(count for _, count in self._published) / self.throughput_window_seconds
+        )
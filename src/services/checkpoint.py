@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Persistent checkpoints for ingestion progress."""
+
+import json
+import threading
+from typing import Any
+
+from src.clients.blob_store import BlobStore
+
+CHECKPOINTS_KEY = "checkpoints.json"
+
+
+class CheckpointStore:
+    """
+    A small key/value store for the state that must survive restarts.
+
+    Values are JSON-serializable and held in memory; when a blob store is given,
+    every update is written through to a single JSON object so the last successful
+    ``available_timestamp`` of each source is picked up again after a restart.
+
+    Larger state that changes often is kept in blobs of its own next to it, so
+    writing it does not rewrite every checkpoint.
+    """
+
+    def __init__(
+        self, store: BlobStore | None = None, key: str = CHECKPOINTS_KEY
+    ) -> None:
+        """
+        Initializes the checkpoint store.
+
+        Args:
+            store: The blob store to persist checkpoints to. None keeps them in memory.
+            key: The key of the checkpoint object in the blob store.
+        """
+        self.store = store
+        self.key = key
+        self._lock = threading.Lock()
+        self._values: dict[str, Any] = {}
+        self._blobs: dict[str, bytes] = {}
+        if store is not None:
+            try:
+                self._values = json.loads(store.get(key))
+            except KeyError:
+                pass
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Returns the checkpoint stored under ``name``, or ``default``."""
+        return self._values.get(name, default)
+
+    def set(self, name: str, value: Any) -> None:
+        """
+        Stores a checkpoint and persists it.
+
+        This performs blocking I/O when backed by a blob store and should be run in
+        a thread from async code.
+        """
+        with self._lock:
+            self._values[name] = value
+            self._persist()
+
+    def delete(self, name: str) -> None:
+        """Removes a checkpoint. Missing names are ignored."""
+        with self._lock:
+            if self._values.pop(name, None) is not None:
+                self._persist()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Returns a copy of all checkpoints."""
+        return dict(self._values)
+
+    def get_blob(self, key: str) -> bytes | None:
+        """
+        Returns the blob stored under ``key`` with ``put_blob``, or None.
+
+        This performs blocking I/O when backed by a blob store and should be run in
+        a thread from async code.
+        """
+        if self.store is None:
+            return self._blobs.get(key)
+        try:
+            return self.store.get(f"{self.key}.d/{key}")
+        except KeyError:
+            return None
+
+    def put_blob(self, key: str, data: bytes) -> None:
+        """Stores ``data`` under ``key``, apart from the checkpoints. See ``get_blob``."""
+        if self.store is None:
+            self._blobs[key] = data
+        else:
+            self.store.put(f"{self.key}.d/{key}", data)
+
+    def delete_blob(self, key: str) -> None:
+        """Removes the blob stored under ``key``. Missing keys are ignored. See ``get_blob``."""
+        if self.store is None:
+            self._blobs.pop(key, None)
+        else:
+            self.store.delete(f"{self.key}.d/{key}")
+
+    def _persist(self) -> None:
+        if self.store is not None:
+            self.store.put(self.key, json.dumps(self._values).encode("utf-8"))
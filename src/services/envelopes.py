@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Grouping of small invoices into multi-invoice envelope messages."""
+
+from collections.abc import Iterator
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class EnvelopeBatcher(Generic[T]):
+    """
+    Groups items by partition key into envelopes bounded by a count and a size.
+
+    Items only share an envelope with items of the same key, and each key's
+    envelopes are handed out in the order their items were added, so publishing
+    the envelopes in that order keeps the per-key ordering Kafka guarantees for
+    single messages.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int) -> None:
+        """
+        Initializes the batcher.
+
+        Args:
+            max_items: The maximum number of items in an envelope.
+            max_bytes: The maximum combined size of the items in an envelope. An
+                item larger than this gets an envelope of its own.
+        """
+        if max_items < 1 or max_bytes < 1:
+            raise ValueError("max_items and max_bytes must be at least 1")
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._open: dict[str, tuple[list[T], int]] = {}
+
+    def add(self, key: str, item: T, size: int) -> list[tuple[str, list[T]]]:
+        """
+        Adds an item to the open envelope of ``key``.
+
+        Returns:
+            The envelopes closed by adding the item, oldest first, as (key, items).
+        """
+        closed = []
+        items, total = self._open.pop(key, ([], 0))
+        if items and total + size > self.max_bytes:
+            closed.append((key, items))
+            items, total = [], 0
+        items.append(item)
+        total += size
+        if len(items) >= self.max_items or total >= self.max_bytes:
+            closed.append((key, items))
+        else:
+            self._open[key] = (items, total)
+        return closed
+
+    def drain(self) -> Iterator[tuple[str, list[T]]]:
+        """Closes and yields every open envelope."""
+        while self._open:
+            key = next(iter(self._open))
+            items, _ = self._open.pop(key)
+            yield key, items
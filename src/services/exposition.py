@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Cached Prometheus exposition, aggregated across worker processes when configured."""
+
+import asyncio
+import os
+import time
+from collections.abc import Callable
+
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+from src.services.shutdown import GracefulShutdown
+
+
+def multiprocess_enabled() -> bool:
+    """
+    Returns True if metrics are shared between worker processes.
+
+    prometheus_client switches to multiprocess mode when ``PROMETHEUS_MULTIPROC_DIR``
+    is set before it is imported, writing every process's metrics to files there.
+    """
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def get_registry() -> CollectorRegistry:
+    """Returns the registry to expose: the metrics of every worker in multiprocess mode."""
+    if not multiprocess_enabled():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+class MetricsExposition:
+    """
+    Renders the Prometheus exposition at most once per ``max_age_seconds``.
+
+    Rendering walks every metric, and in multiprocess mode reads every worker's
+    files, so it runs in a thread rather than on the event loop. Concurrent
+    scrapes within the max age share one rendering.
+    """
+
+    def __init__(
+        self,
+        registry: CollectorRegistry = REGISTRY,
+        max_age_seconds: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initializes the exposition.
+
+        Args:
+            registry: The registry to render.
+            max_age_seconds: How long a rendering is served before it is refreshed.
+                0 renders on every scrape.
+            clock: The monotonic clock the max age is measured with.
+        """
+        self.registry = registry
+        self.max_age_seconds = max_age_seconds
+        self._clock = clock
+        self._refresh_hooks: list[Callable[[], None]] = []
+        self._latest: bytes | None = None
+        self._rendered_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def add_refresh_hook(self, hook: Callable[[], None]) -> None:
+        """
+        Calls ``hook`` on the event loop before each rendering.
+
+        Hooks set gauges derived from state owned by the event loop, which must not
+        be read from the rendering thread.
+        """
+        self._refresh_hooks.append(hook)
+
+    def refresh(self) -> None:
+        """Runs the refresh hooks."""
+        for hook in self._refresh_hooks:
+            hook()
+
+    async def keep_fresh(self, shutdown: GracefulShutdown, interval: float) -> None:
+        """
+        Runs the refresh hooks every ``interval`` seconds until shutdown.
+
+        In multiprocess mode a scrape only runs the hooks of the process serving
+        it, so every process refreshes its own gauges this way instead.
+        """
+        while not shutdown.stopping:
+            self.refresh()
+            await shutdown.sleep(interval)
+
+    def _fresh(self) -> bool:
+        return (
+            self._latest is not None
+            and self._clock() - self._rendered_at < self.max_age_seconds
+        )
+
+    async def render(self) -> bytes:
+        """Returns the exposition, rendering it again if the last one is too old."""
+        if self._fresh():
+            return self._latest
+        async with self._lock:
+            if not self._fresh():
+                self.refresh()
+                self._latest = await asyncio.to_thread(generate_latest, self.registry)
+                self._rendered_at = self._clock()
+        return self._latest
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Live and background processing lanes for sources that fall behind."""
+
+import time
+from datetime import datetime, timezone
+
+from src.services.backlog import parse_timestamp
+from src.services.checkpoint import CheckpointStore
+
+LIVE_LANE = "live"
+BACKGROUND_LANE = "background"
+
+# In scheduling priority order: the live lane is served first.
+LANES = (LIVE_LANE, BACKGROUND_LANE)
+
+
+def lane_name(source: str, lane: str) -> str:
+    """
+    Returns the name a source's lane is checkpointed, run and tracked under.
+
+    The live lane goes by the source's own name, so single-lane deployments keep
+    their checkpoints, runs and metrics as they were.
+    """
+    return source if lane == LIVE_LANE else f"{source}:{lane}"
+
+
+def split_lane_name(name: str) -> tuple[str, str]:
+    """Returns the source and lane of a name returned by ``lane_name``."""
+    source, _, lane = name.rpartition(":")
+    if lane in LANES and source:
+        return source, lane
+    return name, LIVE_LANE
+
+
+def hand_off_backfill(
+    checkpoints: CheckpointStore,
+    source: str,
+    initial_timestamp: str,
+    lookback_seconds: float,
+    now: float | None = None,
+) -> str | None:
+    """
+    Moves a source's live checkpoint up to the recent past, leaving the rest to the background lane.
+
+    When the live checkpoint is more than ``lookback_seconds`` old, the background
+    lane takes over from it and the live lane continues from ``lookback_seconds``
+    ago, so fresh invoices are not queued behind the backfill. A background lane
+    still draining an earlier hand-off already covers everything since its own,
+    older checkpoint, and keeps it; its run then carries on up to the new live
+    checkpoint, see ``finish_backfill``.
+
+    This performs blocking I/O when checkpoints are backed by a blob store and
+    should be run in a thread from async code.
+
+    Returns:
+        The checkpoint handed to the background lane, or None if the live lane
+        is recent enough to carry on by itself.
+    """
+    now = time.time() if now is None else now
+    checkpoint = checkpoints.get(source, initial_timestamp)
+    live_start = now - lookback_seconds
+    if parse_timestamp(checkpoint) >= live_start:
+        return None
+    background = lane_name(source, BACKGROUND_LANE)
+    if checkpoints.get(background) is None:
+        checkpoints.set(background, checkpoint)
+    checkpoints.set(
+        source,
+        datetime.fromtimestamp(live_start, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    )
+    return checkpoint
+
+
+def finish_backfill(checkpoints: CheckpointStore, source: str, fetched_at: str) -> bool:
+    """
+    Advances a source's background lane after a completed run fetched at ``fetched_at``.
+
+    The run covered everything up to its fetch. If the live lane polls from no
+    later than that, the backfill is done and the lane's checkpoint is removed.
+    A hand-off made while the run was in flight may have moved the live lane
+    further ahead, so otherwise the lane continues from the fetch.
+
+    This performs blocking I/O when checkpoints are backed by a blob store and
+    should be run in a thread from async code.
+
+    Returns:
+        True if the backfill is done.
+    """
+    background = lane_name(source, BACKGROUND_LANE)
+    live = checkpoints.get(source)
+    if live is None or parse_timestamp(fetched_at) >= parse_timestamp(live):
+        checkpoints.delete(background)
+        return True
+    checkpoints.set(background, fetched_at)
+    return False
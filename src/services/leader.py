@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Election of the one worker process that runs ingestion."""
+
+import fcntl
+import logging
+import os
+from pathlib import Path
+from typing import IO
+
+logger = logging.getLogger(f"x35.{__name__}")
+
+
+class LeaderLock:
+    """
+    An exclusive lock on a file, held by the worker process that runs ingestion.
+
+    When the service runs as several worker processes, e.g. ``uvicorn --workers``,
+    every worker serves HTTP but only the holder of this lock polls and publishes,
+    so invoices are not fetched and published once per worker. The operating
+    system releases the lock when the holder exits, however it exits, and another
+    worker can then take over.
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        """
+        Initializes the lock without acquiring it.
+
+        Args:
+            path: The lock file, on a filesystem shared by the workers.
+        """
+        self.path = Path(path)
+        self._file: IO[str] | None = None
+
+    @property
+    def held(self) -> bool:
+        """True while this process holds the lock."""
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """
+        Takes the lock if no other process holds it, without waiting.
+
+        Returns:
+            True if this process holds the lock.
+        """
+        if self._file is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        file = self.path.open("a+")
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            return False
+        file.seek(0)
+        file.truncate()
+        file.write(str(os.getpid()))
+        file.flush()
+        self._file = file
+        logger.info("Acquired the ingest leader lock.", extra={"path": str(self.path)})
+        return True
+
+    def release(self) -> None:
+        """Releases the lock if this process holds it."""
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""A byte-counted budget for the invoice data held in memory."""
+
+import asyncio
+from collections import deque
+from collections.abc import Callable
+
+# What a run reserves before its first fetch of a source, when no earlier
+# response size is known.
+DEFAULT_FETCH_RESERVATION_BYTES = 8 * 1024 * 1024
+
+# Peak parse memory relative to the response size, from
+# scripts/parser_memory_benchmark.py: re-serializing each invoice builds lxml trees
+# and a string per invoice on top of the decoded response, while zero-copy slicing
+# keeps a single buffer next to the response.
+PARSE_MEMORY_FACTOR = 10
+ZERO_COPY_PARSE_MEMORY_FACTOR = 2
+
+
+class ByteBudget:
+    """
+    A semaphore counted in bytes.
+
+    Stages account for the invoice data they keep alive against a shared limit.
+    Only ``acquire`` waits, and it is meant for the entry point of a run, before it
+    holds anything: a run that already holds bytes grows its share with ``charge``,
+    which never waits, so two runs can never wait on each other. Charges may take
+    the budget past its limit; new runs then wait until enough has been released.
+
+    A request larger than the whole limit is let through once nothing else is held,
+    so an oversized response is processed alone rather than never.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        on_change: Callable[[int], None] | None = None,
+    ) -> None:
+        """
+        Initializes the budget.
+
+        Args:
+            limit: The number of bytes that may be held before new runs wait.
+            on_change: Called with the bytes in use whenever it changes, e.g. to
+                update a gauge.
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self._on_change = on_change
+        self._in_use = 0
+        self._waiters: deque[tuple[int, asyncio.Future]] = deque()
+        self._expected: dict[str, int] = {}
+
+    @property
+    def in_use(self) -> int:
+        """The number of bytes currently held."""
+        return self._in_use
+
+    @property
+    def waiting(self) -> int:
+        """The number of acquirers waiting for bytes."""
+        return len(self._waiters)
+
+    def _fits(self, size: int) -> bool:
+        return self._in_use == 0 or self._in_use + size <= self.limit
+
+    def _set_in_use(self, value: int) -> None:
+        self._in_use = value
+        if self._on_change is not None:
+            self._on_change(value)
+
+    async def acquire(self, size: int) -> bool:
+        """
+        Waits until ``size`` bytes fit in the budget and takes them.
+
+        Returns:
+            True if the call had to wait.
+        """
+        if not self._waiters and self._fits(size):
+            self._set_in_use(self._in_use + size)
+            return False
+        future = asyncio.get_running_loop().create_future()
+        entry = (size, future)
+        self._waiters.append(entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(size)
+            else:
+                self._waiters.remove(entry)
+                self._wake()
+            raise
+        return True
+
+    def charge(self, size: int) -> None:
+        """Takes ``size`` bytes without waiting, even past the limit."""
+        self._set_in_use(self._in_use + size)
+
+    def release(self, size: int) -> None:
+        """Returns ``size`` bytes and lets waiting acquirers in, oldest first."""
+        self._set_in_use(max(0, self._in_use - size))
+        self._wake()
+
+    def _wake(self) -> None:
+        # Waiters are served in order so a large request is not starved by small ones.
+        while self._waiters:
+            size, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(size):
+                break
+            self._waiters.popleft()
+            self._set_in_use(self._in_use + size)
+            future.set_result(None)
+
+    def expected(self, key: str, default: int) -> int:
+        """Returns the last size recorded for ``key``, e.g. a source's response size."""
+        return self._expected.get(key, default)
+
+    def record(self, key: str, size: int) -> None:
+        """Records the size of the latest unit of work for ``key``."""
+        self._expected[key] = size
+
+
+class Reservation:
+    """
+    The bytes held by one run, resized as it moves through its stages.
+
+    Closing the reservation releases everything it holds, so it can be used with
+    ``contextlib.closing`` to return the bytes however the run ends.
+    """
+
+    def __init__(self, budget: ByteBudget) -> None:
+        """
+        Initializes an empty reservation.
+
+        Args:
+            budget: The budget the bytes are taken from.
+        """
+        self.budget = budget
+        self.size = 0
+
+    async def acquire(self, size: int) -> bool:
+        """
+        Waits for ``size`` more bytes. Only call this while holding nothing else.
+
+        Returns:
+            True if the call had to wait.
+        """
+        waited = await self.budget.acquire(size)
+        self.size += size
+        return waited
+
+    def resize(self, size: int) -> None:
+        """Grows or shrinks the reservation to ``size`` bytes without waiting."""
+        if size > self.size:
+            self.budget.charge(size - self.size)
+        elif size < self.size:
+            self.budget.release(self.size - size)
+        self.size = size
+
+    def close(self) -> None:
+        """Releases every byte held."""
+        self.resize(0)
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
-"""Prometheus metrics."""
-from prometheus_client import Counter, Histogram
+"""
+Prometheus metrics.
+
+Gauges declare how they combine across worker processes in multiprocess mode:
+values that add up are summed, and values describing shared state take the
+most recent or largest value. Only live processes are counted.
+"""
+from prometheus_client import Counter, Gauge, Histogram
 
 invoices_fetched_total = Counter(
     "invoices_fetched_total",
@@ -27,3 +33,170 @@ kafka_produce_failures_total = Counter(
     "kafka_produce_failures_total",
     "A counter that increments each time a message fails to be produced to Kafka after all internal retries.",
 )
+
+kafka_transactions_total = Counter(
+    "kafka_transactions_total",
+    "The total number of Kafka transactions ended, by whether they were committed or aborted.",
+    ["outcome"],
+)
+
+envelopes_published_total = Counter(
+    "envelopes_published_total",
+    "The total number of multi-invoice envelope messages published to Kafka.",
+)
+
+invoices_claim_checked_total = Counter(
+    "invoices_claim_checked_total",
+    "The total number of oversized invoices stored in the claim-check store and published by reference.",
+)
+
+response_archive_writes_total = Counter(
+    "response_archive_writes_total",
+    "The total number of raw Bamboorose responses written to the archive.",
+    ["outcome"],
+)
+
+invoices_replayed_total = Counter(
+    "invoices_replayed_total",
+    "The total number of invoices republished to Kafka from the response archive.",
+)
+
+invoices_resumed_total = Counter(
+    "invoices_resumed_total",
+    "The total number of invoices skipped because an earlier attempt at the same batch acknowledged them.",
+)
+
+bamboorose_responses_unchanged_total = Counter(
+    "bamboorose_responses_unchanged_total",
+    "The total number of Bamboorose responses skipped because they matched the last processed response.",
+)
+
+invoices_unchanged_total = Counter(
+    "invoices_unchanged_total",
+    "The total number of invoices not republished because their content was unchanged.",
+)
+
+bamboorose_concurrency_limit = Gauge(
+    "bamboorose_concurrency_limit",
+    "The current adaptive limit on concurrent requests to the Bamboorose API.",
+    ["source"],
+    multiprocess_mode="livemostrecent",
+)
+
+bamboorose_requests_in_flight = Gauge(
+    "bamboorose_requests_in_flight",
+    "The number of requests to the Bamboorose API currently in flight.",
+    ["source"],
+    multiprocess_mode="livesum",
+)
+
+bamboorose_circuit_state = Gauge(
+    "bamboorose_circuit_state",
+    "The state of the Bamboorose circuit breaker: 0 closed, 1 half-open, 2 open.",
+    ["source"],
+    multiprocess_mode="livemostrecent",
+)
+
+bamboorose_circuit_trips_total = Counter(
+    "bamboorose_circuit_trips_total",
+    "The total number of times the Bamboorose circuit breaker has tripped open.",
+    ["source"],
+)
+
+bamboorose_requests_rejected_total = Counter(
+    "bamboorose_requests_rejected_total",
+    "The total number of Bamboorose requests rejected because the circuit breaker was open.",
+    ["source"],
+)
+
+shutdown_invoices_drained_total = Counter(
+    "shutdown_invoices_drained_total",
+    "The total number of invoices published after shutdown started, before the drain deadline.",
+)
+
+shutdown_invoices_abandoned_total = Counter(
+    "shutdown_invoices_abandoned_total",
+    "The total number of invoices left unpublished when the drain deadline cancelled a batch.",
+)
+
+memory_budget_bytes_in_flight = Gauge(
+    "memory_budget_bytes_in_flight",
+    "The bytes of invoice data currently held against the memory budget.",
+    multiprocess_mode="livesum",
+)
+
+memory_budget_limit_bytes = Gauge(
+    "memory_budget_limit_bytes",
+    "The configured memory budget for invoice data.",
+    multiprocess_mode="livemax",
+)
+
+memory_budget_waits_total = Counter(
+    "memory_budget_waits_total",
+    "The total number of runs that waited for the memory budget before fetching.",
+)
+
+ingestion_lag_seconds = Gauge(
+    "ingestion_lag_seconds",
+    "The wall clock minus the committed checkpoint of a source's lane.",
+    ["source", "lane"],
+    multiprocess_mode="livemax",
+)
+
+ingestion_backlog_invoices = Gauge(
+    "ingestion_backlog_invoices",
+    "The invoices of the current batch of a source's lane not yet published, including failed ones awaiting retry.",
+    ["source", "lane"],
+    multiprocess_mode="livesum",
+)
+
+ingestion_backlog_bytes = Gauge(
+    "ingestion_backlog_bytes",
+    "The estimated bytes of the invoices counted in ingestion_backlog_invoices.",
+    ["source", "lane"],
+    multiprocess_mode="livesum",
+)
+
+ingestion_throughput_invoices_per_second = Gauge(
+    "ingestion_throughput_invoices_per_second",
+    "The invoices published per second over the recent throughput window.",
+    multiprocess_mode="livesum",
+)
+
+bamboorose_time_to_headers_seconds = Histogram(
+    "bamboorose_time_to_headers_seconds",
+    "The time until the Bamboorose API returned response headers, per attempt.",
+    ["source"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, float("inf")),
+)
+
+bamboorose_retries_total = Counter(
+    "bamboorose_retries_total",
+    "The total number of Bamboorose requests retried after an error.",
+    ["source"],
+)
+
+bamboorose_retries_denied_total = Counter(
+    "bamboorose_retries_denied_total",
+    "The total number of Bamboorose errors not retried because the retry budget was exhausted.",
+    ["source"],
+)
+
+bamboorose_hedged_requests_total = Counter(
+    "bamboorose_hedged_requests_total",
+    "The total number of hedged Bamboorose requests sent because the first was slow.",
+    ["source"],
+)
+
+bamboorose_hedge_wins_total = Counter(
+    "bamboorose_hedge_wins_total",
+    "The total number of hedged Bamboorose requests that completed before the original.",
+    ["source"],
+)
+
+runtime_setting_value = Gauge(
+    "runtime_setting_value",
+    "The current value of a setting that can be tuned at runtime.",
+    ["setting"],
+    multiprocess_mode="livemostrecent",
+)
@@ -1,12 +1,32 @@
 # -*- coding: utf-8 -*-
 """XML parsing service."""
-from lxml import etree
+import re
+from array import array
+from collections.abc import Sequence
+from io import BytesIO
+from typing import TYPE_CHECKING, overload
+
+if TYPE_CHECKING:
+    from lxml import etree
 
 
 class XMLParsingError(Exception):
     """Custom exception for XML parsing errors."""
 
 
+def _xml_parser() -> "etree.XMLParser":
+    """
+    Returns a parser that accepts very large documents.
+
+    The whole inner document is a single CDATA node of the SOAP envelope, and
+    libxml2 rejects text nodes over 10 MB unless ``huge_tree`` is set. Parsers are
+    not thread-safe, so a new one is created per parse.
+    """
+    from lxml import etree
+
+    return etree.XMLParser(huge_tree=True)
+
+
 def parse_invoices(xml: str) -> list[str]:
     """
     Parses the XML response from the Bamboorose API and returns a list of individual invoice XML strings.
@@ -20,14 +40,198 @@ def parse_invoices(xml: str) -> list[str]:
     Raises:
         XMLParsingError: If the XML is malformed.
     """
+    from lxml import etree
+
     try:
-        root = etree.fromstring(xml.encode("utf-8"))
+        root = etree.fromstring(xml.encode("utf-8"), _xml_parser())
         cdata = root.xpath("//*[local-name()='return']/text()")
         if not cdata:
             return []
         
-        inner_xml = etree.fromstring(cdata[0].encode("utf-8"))
+        inner_xml = etree.fromstring(cdata[0].encode("utf-8"), _xml_parser())
         invoices = inner_xml.xpath("//*[local-name()='invoice']")
         return [etree.tostring(invoice).decode("utf-8") for invoice in invoices]
     except etree.XMLSyntaxError as e:
         raise XMLParsingError(f"Failed to parse XML: {e}") from e
+
+
+# Invoice start, end and empty-element tags, with or without a namespace prefix.
+# Comments, CDATA sections and processing instructions are matched as a whole so
+# that invoice tags inside them are skipped. Attribute values may contain ">" so
+# quoted values are matched whole.
+_INVOICE_MARKUP = re.compile(
+    rb"<!--.*?-->"
+    rb"|<!\[CDATA\[.*?\]\]>"
+    rb"|<\?.*?\?>"
+    rb"|<(/?)(?:[^\s/>:]+:)?invoice(?=[\s/>])(?:[^>\"']|\"[^\"]*\"|'[^']*')*?(/?)>",
+    re.S,
+)
+
+
+class InvoiceSlices(Sequence[memoryview]):
+    """
+    The invoices of a response as zero-copy views into the inner document.
+
+    The inner document is held once as UTF-8 bytes together with the start and end
+    byte offset of each invoice element. Indexing returns a ``memoryview`` over that
+    buffer, so invoice bodies are only copied when a consumer such as the Kafka
+    client materializes them. Slicing returns another ``InvoiceSlices`` over the
+    same buffer.
+
+    The invoice id and vendor id of each invoice are read while the document is
+    validated, so callers do not need to parse the invoices again.
+    """
+
+    def __init__(
+        self,
+        buffer: bytes,
+        starts: array,
+        ends: array,
+        metadata: list[tuple[str | None, str | None]],
+    ) -> None:
+        """
+        Initializes the slices.
+
+        Args:
+            buffer: The UTF-8 encoded inner document.
+            starts: The byte offset of the start tag of each invoice.
+            ends: The byte offset just past the end tag of each invoice.
+            metadata: The invoice id and vendor id of each invoice.
+        """
+        self.buffer = buffer
+        self.starts = starts
+        self.ends = ends
+        self.metadata = metadata
+        self._view = memoryview(buffer)
+
+    @overload
+    def __getitem__(self, index: int) -> memoryview: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "InvoiceSlices": ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return InvoiceSlices(
+                self.buffer, self.starts[index], self.ends[index], self.metadata[index]
+            )
+        return self._view[self.starts[index] : self.ends[index]]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+def _return_payload(xml: str | bytes) -> bytes:
+    """Returns the UTF-8 encoded inner document carried in the SOAP ``return`` element."""
+    from lxml import etree
+
+    if isinstance(xml, str):
+        xml = xml.encode("utf-8")
+    root = etree.fromstring(xml, _xml_parser())
+    returns = root.xpath("//*[local-name()='return']")
+    if not returns:
+        return b""
+    # Serializing the text content straight to bytes skips the intermediate str.
+    return etree.tostring(returns[0], method="text", encoding="utf-8", with_tail=False)
+
+
+def _invoice_offsets(buffer: bytes) -> tuple[array, array]:
+    """Returns the byte offsets of the outermost invoice elements in ``buffer``."""
+    starts, ends = array("q"), array("q")
+    depth = 0
+    for match in _INVOICE_MARKUP.finditer(buffer):
+        closing, empty = match.group(1, 2)
+        if closing is None:
+            continue
+        if closing:
+            depth -= 1
+            if depth == 0:
+                ends.append(match.end())
+        elif empty:
+            if depth == 0:
+                starts.append(match.start())
+                ends.append(match.end())
+        else:
+            if depth == 0:
+                starts.append(match.start())
+            depth += 1
+    return starts, ends
+
+
+def _slice_metadata(buffer: bytes) -> list[tuple[str | None, str | None]]:
+    """
+    Validates ``buffer`` and returns the ids of its outermost invoice elements.
+
+    The document is parsed incrementally and each invoice is discarded once read,
+    so the full tree is never held in memory.
+
+    Raises:
+        etree.XMLSyntaxError: If the document is malformed.
+    """
+    from lxml import etree
+
+    metadata = []
+    depth = 0
+    events = etree.iterparse(
+        BytesIO(buffer), events=("start", "end"), tag="{*}invoice", huge_tree=True
+    )
+    for event, element in events:
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            metadata.append((element.findtext("invoice_id"), element.findtext("vendor_id")))
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    return metadata
+
+
+def parse_invoice_slices(xml: str | bytes) -> InvoiceSlices:
+    """
+    Parses the XML response from the Bamboorose API into zero-copy invoice slices.
+
+    Unlike ``parse_invoices``, the invoices are not re-serialized: each one is the
+    exact byte range of its ``<invoice>`` element in the inner document, so namespace
+    declarations inherited from ancestor elements are not repeated on the invoice.
+
+    Args:
+        xml: The XML response from the Bamboorose API, as text or raw bytes.
+
+    Returns:
+        The invoices as views into a single buffer.
+
+    Raises:
+        XMLParsingError: If the XML is malformed.
+    """
+    from lxml import etree
+
+    try:
+        buffer = _return_payload(xml)
+        if not buffer.strip():
+            return InvoiceSlices(b"", array("q"), array("q"), [])
+        metadata = _slice_metadata(buffer)
+    except etree.XMLSyntaxError as e:
+        raise XMLParsingError(f"Failed to parse XML: {e}") from e
+
+    starts, ends = _invoice_offsets(buffer)
+    if len(starts) != len(metadata) or len(ends) != len(metadata):
+        raise XMLParsingError("Failed to locate every invoice in the response")
+    return InvoiceSlices(buffer, starts, ends, metadata)
+
+
+def invoice_metadata(invoice: str) -> tuple[str | None, str | None]:
+    """
+    Returns the invoice id and vendor id of a single serialized invoice.
+
+    Raises:
+        XMLParsingError: If the invoice is not well-formed XML.
+    """
+    from lxml import etree
+
+    try:
+        invoice_xml = etree.fromstring(invoice.encode("utf-8"))
+    except etree.XMLSyntaxError as e:
+        raise XMLParsingError(f"Failed to parse invoice XML: {e}") from e
+    return invoice_xml.findtext("invoice_id"), invoice_xml.findtext("vendor_id")
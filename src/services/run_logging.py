@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Low-overhead logging helpers for the per-invoice hot loop."""
+
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class InvoiceLogSampler:
+    """
+    Decides which invoices in a run get a per-invoice log line.
+
+    A sample rate of 1 logs every invoice, N logs the first invoice and every Nth
+    one after it, and 0 disables per-invoice logs entirely. Errors are not subject
+    to sampling and should always be logged by the caller.
+    """
+
+    def __init__(self, sample_rate: int = 1) -> None:
+        """
+        Initializes the sampler.
+
+        Args:
+            sample_rate: Log one invoice in every ``sample_rate``. 0 disables logging.
+        """
+        if sample_rate < 0:
+            raise ValueError("sample_rate must be greater than or equal to 0")
+        self.sample_rate = sample_rate
+        self._seen = 0
+
+    def should_log(self) -> bool:
+        """Returns True if the current invoice should be logged."""
+        if self.sample_rate == 0:
+            return False
+        sampled = self._seen % self.sample_rate == 0
+        self._seen += 1
+        return sampled
+
+
+class RunSummary:
+    """Aggregates counts and stage timings for a single processing run."""
+
+    def __init__(self) -> None:
+        """Initializes an empty run summary."""
+        self.counts: dict[str, int] = defaultdict(int)
+        self.timings: dict[str, float] = defaultdict(float)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Adds ``value`` to the counter ``name``."""
+        self.counts[name] += value
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """Adds the wall time spent inside the block to the timing for ``stage``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.perf_counter() - start
+
+    def as_extra(self) -> dict[str, int | float]:
+        """Returns the summary as ``extra`` fields for a structured log record."""
+        extra: dict[str, int | float] = dict(self.counts)
+        for stage, seconds in self.timings.items():
+            extra[f"{stage}_seconds"] = round(seconds, 6)
+        return extra
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Single-flight coordination of invoice processing runs."""
+
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from x35_json_logging import dynamic_context
+
+logger = logging.getLogger(f"x35.{__name__}")
+
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class RunRejectedError(Exception):
+    """Raised when a run cannot be started, e.g. because the service is shutting down."""
+
+
+@dataclass
+class Run:
+    """A single processing run of one source."""
+
+    id: str
+    source: str
+    trigger: str
+    started_at: datetime
+    status: str = RUNNING
+    finished_at: datetime | None = None
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    task: asyncio.Task | None = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        """True once the run has finished, whatever its outcome."""
+        return self.status != RUNNING
+
+
+class RunCoordinator:
+    """
+    Starts processing runs so that a source never has two runs in flight.
+
+    Every run, whether from the internal schedule or an API trigger, goes through
+    ``start``. While a run of a source is in flight, further requests for that source
+    are coalesced into it: they get the same ``Run`` back and can await its outcome
+    instead of launching an overlapping run. The most recent finished runs are kept
+    so their status can still be looked up by id.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str], Awaitable[dict[str, Any]]],
+        history_size: int = 100,
+    ) -> None:
+        """
+        Initializes the coordinator.
+
+        Args:
+            run: Processes one source by name and returns the run's result fields.
+            history_size: The number of finished runs to remember.
+        """
+        self._run = run
+        self.history_size = history_size
+        self._in_flight: dict[str, Run] = {}
+        self._runs: OrderedDict[str, Run] = OrderedDict()
+        self._rejection: str | None = None
+
+    def start(self, source: str, trigger: str) -> tuple[Run, bool]:
+        """
+        Starts a run of ``source``, or joins the one already in flight.
+
+        Args:
+            source: The name of the source to process.
+            trigger: What asked for the run, e.g. ``schedule`` or ``api``.
+
+        Returns:
+            The run, and whether it was started by this call rather than joined.
+
+        Raises:
+            RunRejectedError: If the coordinator no longer accepts new runs.
+        """
+        current = self._in_flight.get(source)
+        if current is not None:
+            return current, False
+        if self._rejection is not None:
+            raise RunRejectedError(f"Not accepting new runs: {self._rejection}")
+
+        run = Run(
+            id=str(uuid.uuid4()),
+            source=source,
+            trigger=trigger,
+            started_at=datetime.now(timezone.utc),
+        )
+        run.task = asyncio.get_running_loop().create_task(self._execute(run))
+        self._in_flight[source] = run
+        self._runs[run.id] = run
+        while len(self._runs) > self.history_size:
+            oldest_id, oldest = next(iter(self._runs.items()))
+            if not oldest.done:
+                break
+            del self._runs[oldest_id]
+        return run, True
+
+    async def _execute(self, run: Run) -> None:
+        try:
+            run.result = await self._run(run.source)
+            run.status = SUCCEEDED
+        except asyncio.CancelledError:
+            run.status = CANCELLED
+            raise
+        except Exception as e:
+            run.status = FAILED
+            run.error = str(e) or type(e).__name__
+            with dynamic_context(source=run.source, run_id=run.id):
+                logger.error("Error processing invoices", exc_info=e)
+        finally:
+            run.finished_at = datetime.now(timezone.utc)
+            self._in_flight.pop(run.source, None)
+
+    @staticmethod
+    async def wait(run: Run) -> Run:
+        """
+        Waits for ``run`` to finish and returns it.
+
+        The run itself is shielded, so a waiter that gives up or is cancelled does
+        not cancel the run for the other callers sharing it.
+        """
+        if run.task is not None and not run.task.done():
+            try:
+                await asyncio.shield(run.task)
+            except asyncio.CancelledError:
+                if not run.task.cancelled():
+                    raise
+        return run
+
+    def get(self, run_id: str) -> Run | None:
+        """Returns the run with ``run_id``, if it is in flight or recent enough to be remembered."""
+        return self._runs.get(run_id)
+
+    def recent(self) -> list[Run]:
+        """Returns the remembered runs, most recent first."""
+        return list(reversed(self._runs.values()))
+
+    def in_flight(self) -> list[Run]:
+        """Returns the runs currently in flight."""
+        return list(self._in_flight.values())
+
+    def stop_accepting(self, reason: str = "the service is shutting down") -> None:
+        """Rejects new runs from now on, giving ``reason``; runs in flight carry on."""
+        self._rejection = reason
+
+    def start_accepting(self) -> None:
+        """Accepts new runs again."""
+        self._rejection = None
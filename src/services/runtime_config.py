@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Live tuning of throughput settings from a watched config file."""
+
+import asyncio
+import json
+import logging
+import os
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Any
+
+from src.services.metrics import runtime_setting_value
+from src.services.shutdown import GracefulShutdown
+from src.settings.config import AppSettings
+
+logger = logging.getLogger(f"x35.{__name__}")
+
+# The settings that can change while the service runs, by settings group. Every
+# other setting is only read at startup.
+TUNABLE_SETTINGS: dict[str, tuple[str, ...]] = {
+    "app": (
+        "poll_interval_seconds",
+        "scheduler_slots",
+        "publish_chunk_size",
+        "envelope_max_invoices",
+        "envelope_max_bytes",
+        "progress_flush_interval",
+        "invoice_log_sample_rate",
+        "shutdown_drain_seconds",
+        "shutdown_flush_seconds",
+    ),
+    "bamboorose": (
+        "api_timeout",
+        "retry_max_tries",
+    ),
+}
+
+
+class RuntimeConfig:
+    """
+    Applies overrides of the tunable settings to the running service.
+
+    Overrides are validated by the settings models themselves, and a set of
+    overrides is applied entirely or not at all. Settings read at the start of
+    each run take effect from the next run; settings already built into running
+    components are pushed to them by listeners registered with ``on_change``.
+    """
+
+    def __init__(
+        self,
+        settings: AppSettings,
+        tunable: Mapping[str, tuple[str, ...]] = TUNABLE_SETTINGS,
+    ) -> None:
+        """
+        Initializes the runtime config, taking the current values as the baseline.
+
+        Args:
+            settings: The application settings, which are updated in place.
+            tunable: The names of the settings that may change, by settings group.
+        """
+        self._settings = settings
+        self._tunable = tunable
+        self._baseline = {
+            group: {name: getattr(getattr(settings, group), name) for name in names}
+            for group, names in tunable.items()
+        }
+        self._listeners: dict[str, list[Callable[[Any], None]]] = {}
+        self._export()
+
+    def on_change(self, setting: str, listener: Callable[[Any], None]) -> None:
+        """
+        Calls ``listener`` with the new value whenever ``setting`` changes.
+
+        Args:
+            setting: The dotted setting name, e.g. ``app.scheduler_slots``.
+            listener: Called on the event loop after the setting is updated.
+        """
+        self._listeners.setdefault(setting, []).append(listener)
+
+    def values(self) -> dict[str, Any]:
+        """Returns the current value of every tunable setting by dotted name."""
+        return {
+            f"{group}.{name}": getattr(getattr(self._settings, group), name)
+            for group, names in self._tunable.items()
+            for name in names
+        }
+
+    def apply(
+        self, overrides: Mapping[str, Mapping[str, Any]]
+    ) -> dict[str, tuple[Any, Any]]:
+        """
+        Sets the tunable settings to their startup values updated with ``overrides``.
+
+        A setting missing from ``overrides`` returns to its startup value, so the
+        overrides always describe the complete runtime state.
+
+        Args:
+            overrides: New values by settings group and setting name.
+
+        Returns:
+            The (old, new) values of the settings that changed, by dotted name.
+
+        Raises:
+            ValueError: If a setting is not tunable or a value fails validation.
+                Nothing is changed in that case.
+        """
+        unknown = [
+            f"{group}.{name}"
+            for group, values in overrides.items()
+            for name in values
+            if name not in self._tunable.get(group, ())
+        ]
+        if unknown:
+            raise ValueError(f"Settings cannot be changed at runtime: {unknown}")
+
+        candidates = {}
+        for group, names in self._tunable.items():
+            # Assigning to a copy runs the model's validation without touching
+            # the live settings.
+            candidate = getattr(self._settings, group).model_copy()
+            for name in names:
+                setattr(
+                    candidate,
+                    name,
+                    overrides.get(group, {}).get(name, self._baseline[group][name]),
+                )
+            candidates[group] = candidate
+
+        changes = {}
+        for group, candidate in candidates.items():
+            current = getattr(self._settings, group)
+            for name in self._tunable[group]:
+                old, new = getattr(current, name), getattr(candidate, name)
+                if old != new:
+                    setattr(current, name, new)
+                    changes[f"{group}.{name}"] = (old, new)
+
+        for setting, (old, new) in changes.items():
+            logger.info(
+                "Runtime setting changed.",
+                extra={"setting": setting, "old_value": old, "new_value": new},
+            )
+            for listener in self._listeners.get(setting, []):
+                listener(new)
+        self._export()
+        return changes
+
+    def _export(self) -> None:
+        for setting, value in self.values().items():
+            if isinstance(value, (int, float)):
+                runtime_setting_value.labels(setting=setting).set(value)
+
+
+def load_overrides(path: str | os.PathLike) -> dict[str, dict[str, Any]]:
+    """
+    Reads overrides from a JSON file such as ``{"app": {"publish_chunk_size": 500}}``.
+
+    A missing file means no overrides.
+
+    Raises:
+        ValueError: If the file is not valid JSON or not an object of objects.
+    """
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return {}
+    overrides = json.loads(text)
+    if not isinstance(overrides, dict) or not all(
+        isinstance(values, dict) for values in overrides.values()
+    ):
+        raise ValueError(
+            "Runtime config must map settings groups to objects of settings"
+        )
+    return overrides
+
+
+class RuntimeConfigWatcher:
+    """Reapplies a runtime config file whenever it changes."""
+
+    def __init__(
+        self,
+        runtime_config: RuntimeConfig,
+        path: str | os.PathLike,
+        poll_seconds: float = 5.0,
+    ) -> None:
+        """
+        Initializes the watcher.
+
+        Args:
+            runtime_config: The runtime config the file's overrides are applied to.
+            path: The JSON file to watch. Deleting it reverts to the startup values.
+            poll_seconds: How often the file is checked for changes.
+        """
+        self.runtime_config = runtime_config
+        self.path = Path(path)
+        self.poll_seconds = poll_seconds
+        self._last_seen: tuple[int, int] | None = None
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def check(self) -> bool:
+        """
+        Applies the file if it changed since the last check.
+
+        An invalid file is logged and leaves the current settings in place.
+
+        Returns:
+            True if the file changed.
+        """
+        seen = await asyncio.to_thread(self._stat)
+        if seen == self._last_seen:
+            return False
+        self._last_seen = seen
+        try:
+            overrides = await asyncio.to_thread(load_overrides, self.path)
+            self.runtime_config.apply(overrides)
+        except ValueError as e:
+            logger.warning(
+                "Ignoring invalid runtime config.",
+                extra={"path": str(self.path)},
+                exc_info=e,
+            )
+        return True
+
+    async def run(self, shutdown: GracefulShutdown) -> None:
+        """Checks the file every ``poll_seconds`` until shutdown."""
+        while not shutdown.stopping:
+            await self.check()
+            await shutdown.sleep(self.poll_seconds)
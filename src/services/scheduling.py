@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Fair scheduling of work across ingestion sources."""
+
+import asyncio
+from collections import Counter, OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from src.services.lanes import LANES, LIVE_LANE
+
+
+class FairScheduler:
+    """
+    Grants a fixed number of work slots round-robin across named sources.
+
+    Each source queues for a slot before fetching or publishing a chunk of
+    invoices. When a slot frees up it goes to the next source in rotation that is
+    waiting, rather than to whichever task asked first, so a source with a large
+    backlog cannot starve the others.
+
+    Work is queued in a lane. Waiters in the live lane are served before any in
+    the background lane, and a lane may be limited to a share of the slots, so a
+    backfill only uses the capacity live work leaves over and never all of it.
+    """
+
+    def __init__(
+        self, slots: int = 1, lane_shares: dict[str, float] | None = None
+    ) -> None:
+        """
+        Initializes the scheduler.
+
+        Args:
+            slots: The number of units of work that may run at the same time.
+            lane_shares: The fraction of the slots each lane may hold at once,
+                rounded down but at least one slot. Lanes not listed may use all.
+
+        Raises:
+            ValueError: If ``slots`` is below 1, or a lane is unknown or has a share
+                outside (0, 1].
+        """
+        if slots < 1:
+            raise ValueError("slots must be at least 1")
+        lane_shares = lane_shares or {}
+        for lane, share in lane_shares.items():
+            if lane not in LANES or not 0 < share <= 1:
+                raise ValueError(f"Invalid share {share!r} for lane {lane!r}")
+        self.slots = slots
+        self.lane_shares = lane_shares
+        self._in_use = 0
+        self._lanes_in_use: Counter[str] = Counter()
+        self._waiters: dict[str, OrderedDict[str, deque[asyncio.Future]]] = {
+            lane: OrderedDict() for lane in LANES
+        }
+
+    @property
+    def in_use(self) -> int:
+        """The number of slots currently held."""
+        return self._in_use
+
+    def lane_slots(self, lane: str) -> int:
+        """Returns the number of slots ``lane`` may hold at once."""
+        share = self.lane_shares.get(lane, 1.0)
+        return max(1, int(self.slots * share))
+
+    def _grant(self, lane: str) -> None:
+        self._in_use += 1
+        self._lanes_in_use[lane] += 1
+
+    def _grant_next(self) -> None:
+        while self._in_use < self.slots:
+            for lane in LANES:
+                waiting = self._waiters[lane]
+                if waiting and self._lanes_in_use[lane] < self.lane_slots(lane):
+                    break
+            else:
+                return
+            source, waiters = next(iter(waiting.items()))
+            future = waiters.popleft()
+            if waiters:
+                # Rotate the source to the back so the others get the next slots.
+                waiting.move_to_end(source)
+            else:
+                del waiting[source]
+            if future.done():
+                continue
+            future.set_result(None)
+            self._grant(lane)
+
+    async def acquire(self, source: str, lane: str = LIVE_LANE) -> None:
+        """Waits for a slot on behalf of ``source``, in ``lane``."""
+        if (
+            self._in_use < self.slots
+            and self._lanes_in_use[lane] < self.lane_slots(lane)
+            and not any(self._waiters.values())
+        ):
+            self._grant(lane)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[lane].setdefault(source, deque()).append(future)
+        # A slot may be free while the waiters ahead are held back by their lane's share.
+        self._grant_next()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted as we were cancelled, so hand it on.
+                self.release(lane)
+            raise
+
+    def release(self, lane: str = LIVE_LANE) -> None:
+        """Returns a slot held in ``lane`` and grants it to the next waiting source."""
+        self._in_use -= 1
+        self._lanes_in_use[lane] -= 1
+        self._grant_next()
+
+    def resize(self, slots: int) -> None:
+        """
+        Changes the number of slots.
+
+        Extra slots are granted to waiting sources right away. When shrinking,
+        slots already held are kept until released.
+        """
+        if slots < 1:
+            raise ValueError("slots must be at least 1")
+        self.slots = slots
+        self._grant_next()
+
+    @asynccontextmanager
+    async def turn(self, source: str, lane: str = LIVE_LANE) -> AsyncIterator[None]:
+        """Holds a slot for ``source`` in ``lane`` for the duration of the block."""
+        await self.acquire(source, lane)
+        try:
+            yield
+        finally:
+            self.release(lane)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Coordination of a bounded graceful drain on shutdown."""
+
+import asyncio
+
+
+class GracefulShutdown:
+    """
+    Signals the processing loops to stop and tracks what the drain achieved.
+
+    Once a stop is requested no new batch is fetched, but the batch being published
+    keeps going so its queued invoices can still go out before the deadline. The
+    counts of invoices published during the drain and of invoices left unpublished
+    when the deadline cut the drain short are accumulated here for the shutdown log.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the coordinator in the running state."""
+        self._stop = asyncio.Event()
+        self.drained = 0
+        self.abandoned = 0
+
+    @property
+    def stopping(self) -> bool:
+        """True once a stop has been requested."""
+        return self._stop.is_set()
+
+    def request_stop(self) -> None:
+        """Asks the processing loops to finish their current batch and stop."""
+        self._stop.set()
+
+    async def sleep(self, seconds: float) -> None:
+        """Sleeps for ``seconds``, returning early if a stop is requested."""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
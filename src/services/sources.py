@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Registry of the Bamboorose sources ingested by this process."""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from src.clients.bamboorose import BambooroseClient
+from src.services.change_detection import ChangeDetector
+
+
+@dataclass
+class IngestionSource:
+    """A Bamboorose source together with its per-source processing state."""
+
+    name: str
+    bamboorose_client: BambooroseClient
+    topic: str
+    poll_interval_seconds: int
+    initial_timestamp: str
+    change_detector: ChangeDetector | None = None
+
+
+class SourceRegistry:
+    """The set of sources sharing this process's event loop and clients."""
+
+    def __init__(self) -> None:
+        """Initializes an empty registry."""
+        self._sources: dict[str, IngestionSource] = {}
+
+    def register(self, source: IngestionSource) -> None:
+        """
+        Adds a source to the registry.
+
+        Raises:
+            ValueError: If a source with the same name is already registered.
+        """
+        if source.name in self._sources:
+            raise ValueError(f"Source {source.name!r} is already registered")
+        self._sources[source.name] = source
+
+    def get(self, name: str) -> IngestionSource:
+        """
+        Returns the source registered under ``name``.
+
+        Raises:
+            KeyError: If no such source is registered.
+        """
+        return self._sources[name]
+
+    def __iter__(self) -> Iterator[IngestionSource]:
+        return iter(self._sources.values())
+
+    def __len__(self) -> int:
+        return len(self._sources)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Per-run span recording exported in the Chrome trace event format."""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(f"x35.{__name__}")
+
+# Maps the monotonic clock onto wall-clock time once, so span timestamps are
+# comparable across runs without being affected by clock adjustments.
+_EPOCH_OFFSET = time.time() - time.perf_counter()
+_PID = os.getpid()
+
+_current: ContextVar["RunTrace | None"] = ContextVar("run_trace", default=None)
+
+
+def _now_us() -> float:
+    return (_EPOCH_OFFSET + time.perf_counter()) * 1_000_000
+
+
+class RunTrace:
+    """
+    The spans recorded during a single processing run.
+
+    Spans are stored as Chrome trace "complete" events on a lane of their own, so
+    several runs loaded together show side by side, one row per run.
+    """
+
+    def __init__(self, trace_id: str, source: str, lane: int) -> None:
+        """
+        Initializes an empty run trace.
+
+        Args:
+            trace_id: The trace ID of the run, as set with ``trace_context``.
+            source: The source the run processes.
+            lane: The Chrome trace thread id the run's spans are drawn on.
+        """
+        self.trace_id = trace_id
+        self.source = source
+        self.lane = lane
+        self.started_at = time.time()
+        self.events: list[dict[str, Any]] = []
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[dict[str, Any]]:
+        """
+        Records the time spent inside the block as a span.
+
+        Yields:
+            The span's arguments, which the block may add to. An exception leaving
+            the block is recorded under ``error``.
+        """
+        start = _now_us()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": "run",
+                    "ph": "X",
+                    "ts": start,
+                    "dur": _now_us() - start,
+                    "pid": _PID,
+                    "tid": self.lane,
+                    "args": args,
+                }
+            )
+
+    def chrome_events(self) -> list[dict[str, Any]]:
+        """Returns the run's spans preceded by the metadata naming its lane."""
+        return [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": _PID,
+                "tid": self.lane,
+                "args": {"name": f"{self.source} {self.trace_id}"},
+            },
+            *self.events,
+        ]
+
+
+@contextmanager
+def span(name: str, **args: Any) -> Iterator[dict[str, Any]]:
+    """
+    Records a span on the run trace of the current context, if there is one.
+
+    Code that may run outside a traced run can use this unconditionally; without
+    an active trace it only yields the arguments.
+    """
+    trace = _current.get()
+    if trace is None:
+        yield args
+        return
+    with trace.span(name, **args) as span_args:
+        yield span_args
+
+
+def chrome_trace(traces: list[RunTrace]) -> dict[str, Any]:
+    """Returns ``traces`` as a Chrome trace document, as loaded by Perfetto or chrome://tracing."""
+    return {
+        "traceEvents": [event for trace in traces for event in trace.chrome_events()],
+        "displayTimeUnit": "ms",
+        "otherData": {"trace_ids": [trace.trace_id for trace in traces]},
+    }
+
+
+class TraceBuffer:
+    """
+    Keeps the traces of the most recent runs, and optionally writes each to a file.
+
+    Files are named after the run's trace ID and hold a complete Chrome trace
+    document, so a single run can be opened in Perfetto directly.
+    """
+
+    def __init__(
+        self, capacity: int, directory: str | os.PathLike | None = None
+    ) -> None:
+        """
+        Initializes the buffer.
+
+        Args:
+            capacity: The number of run traces kept in memory.
+            directory: Where to write each finished run's trace. None keeps them in
+                memory only.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.directory = Path(directory) if directory is not None else None
+        self._traces: OrderedDict[str, RunTrace] = OrderedDict()
+        self._lanes = itertools.count(1)
+
+    def start(self, trace_id: str, source: str) -> RunTrace:
+        """Returns a new run trace on a lane of its own."""
+        return RunTrace(trace_id, source, next(self._lanes))
+
+    def add(self, trace: RunTrace) -> None:
+        """Keeps a finished run trace, dropping the oldest beyond the capacity."""
+        self._traces[trace.trace_id] = trace
+        while len(self._traces) > self.capacity:
+            self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> RunTrace | None:
+        """Returns the trace of the run with ``trace_id``, if it is still kept."""
+        return self._traces.get(trace_id)
+
+    def recent(self) -> list[RunTrace]:
+        """Returns the kept run traces, oldest first."""
+        return list(self._traces.values())
+
+    def write(self, trace: RunTrace) -> Path:
+        """
+        Writes a run trace to the trace directory.
+
+        This performs blocking I/O and should be run in a thread from async code.
+
+        Returns:
+            The path of the written file.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{trace.trace_id}.json"
+        path.write_text(json.dumps(chrome_trace([trace])), encoding="utf-8")
+        return path
+
+
+@contextmanager
+def record_run(
+    buffer: TraceBuffer | None, trace_id: str, source: str
+) -> Iterator[RunTrace | None]:
+    """
+    Traces the run executed inside the block.
+
+    Spans recorded with ``span`` anywhere in the block, including in threads
+    started with ``asyncio.to_thread``, are added to the run's trace. The trace is
+    kept in the buffer when the block exits, however it exits, and written to the
+    buffer's directory in the background. Without a buffer, nothing is recorded.
+    """
+    if buffer is None:
+        yield None
+        return
+    trace = buffer.start(trace_id, source)
+    token = _current.set(trace)
+    try:
+        with trace.span("run", source=source, trace_id=trace_id):
+            yield trace
+    finally:
+        _current.reset(token)
+        buffer.add(trace)
+        if buffer.directory is not None:
+            # Writing is best effort and must not hold up or fail the run.
+            asyncio.get_running_loop().run_in_executor(
+                None, _write_trace, buffer, trace
+            )
+
+
+def _write_trace(buffer: TraceBuffer, trace: RunTrace) -> None:
+    try:
+        buffer.write(trace)
+    except OSError as e:
+        logger.warning("Failed to write run trace.", exc_info=e)
@@ -1,5 +1,4 @@
-from x35_settings.fastapi import FastAPISettings
-from x35_settings.uvicorn import UvicornSettings
+from functools import lru_cache
 
 
 class Settings:
@@ -10,8 +9,22 @@ class Settings:
     """
 
     def __init__(self):
-        self.fastapi = FastAPISettings()
+        from x35_settings.uvicorn import UvicornSettings
+
+        from src.settings.config import get_settings
+
+        # Share the FastAPI settings with the application instead of reading them twice.
+        self.fastapi = get_settings().fastapi
         self.uvicorn = UvicornSettings()
 
 
-settings = Settings()
+@lru_cache()
+def _get_unified_settings() -> Settings:
+    return Settings()
+
+
+def __getattr__(name: str):
+    # ``settings`` is built on first access rather than when any settings module is imported.
+    if name == "settings":
+        return _get_unified_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,12 +3,48 @@
 from functools import lru_cache
 from typing import ClassVar
 
-from pydantic import Field, SecretStr
+from pydantic import BaseModel, ConfigDict, Field, SecretStr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from x35_settings.fastapi import FastAPISettings
 from x35_settings.kafka import KafkaProducerSettings as X35KafkaProducerSettings
 
 
+DEFAULT_SOURCE_NAME = "default"
+DEFAULT_SOAP_OPERATION = "getCommercialInvoicesByAvailableTimestamp"
+
+
+class SourceSettings(BaseModel):
+    """Settings for a single Bamboorose endpoint and operation to ingest from."""
+
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid")
+
+    name: str = Field(..., description="A unique name for the source, used for checkpoints and metrics.")
+    api_url: str = Field(..., description="The URL of the Bamboorose API.")
+    api_username: str = Field(..., description="The username for the Bamboorose API.")
+    api_password: SecretStr = Field(..., description="The password for the Bamboorose API.")
+    api_timeout: int = Field(60, description="The timeout in seconds for the Bamboorose API.")
+    soap_operation: str = Field(
+        DEFAULT_SOAP_OPERATION, description="The SOAP operation to call."
+    )
+    request_template: str | None = Field(
+        None,
+        description=(
+            "A SOAP envelope template with {operation}, {username}, {password} and "
+            "{available_timestamp} placeholders. Defaults to the standard envelope."
+        ),
+    )
+    producer_topic: str | None = Field(
+        None, description="The Kafka topic for this source. Defaults to the producer topic."
+    )
+    poll_interval_seconds: int | None = Field(
+        None, description="The poll interval for this source. Defaults to the app poll interval."
+    )
+    initial_timestamp: str = Field(
+        "2023-01-01T00:00:00Z",
+        description="The availableTimestamp to start from when no checkpoint exists.",
+    )
+
+
 class BambooroseSettings(BaseSettings):
     """Bamboorose API settings."""
 
@@ -18,10 +54,259 @@ class BambooroseSettings(BaseSettings):
         extra="forbid",
     )
 
-    api_url: str = Field(..., description="The URL of the Bamboorose API.")
-    api_username: str = Field(..., description="The username for the Bamboorose API.")
-    api_password: SecretStr = Field(..., description="The password for the Bamboorose API.")
+    api_url: str | None = Field(
+        None, description="The URL of the Bamboorose API. Required unless sources are set."
+    )
+    api_username: str | None = Field(
+        None, description="The username for the Bamboorose API. Required unless sources are set."
+    )
+    api_password: SecretStr | None = Field(
+        None, description="The password for the Bamboorose API. Required unless sources are set."
+    )
     api_timeout: int = Field(60, description="The timeout in seconds for the Bamboorose API.")
+    soap_operation: str = Field(
+        DEFAULT_SOAP_OPERATION, description="The SOAP operation to call."
+    )
+    sources: list[SourceSettings] = Field(
+        default_factory=list,
+        description=(
+            "Additional sources as a JSON list. When set, these replace the single "
+            "source described by the api_* fields."
+        ),
+    )
+    max_connections: int = Field(
+        20, description="The maximum number of pooled connections shared by all sources."
+    )
+    concurrency_initial_limit: int = Field(
+        4,
+        ge=1,
+        description=(
+            "The starting adaptive cap on a source's overlapping requests, i.e. its lanes' "
+            "fetches and hedges. It bounds concurrency and does not add any."
+        ),
+    )
+    concurrency_min_limit: int = Field(
+        1, ge=1, description="The lowest the adaptive concurrency limit can fall to."
+    )
+    concurrency_max_limit: int = Field(
+        16, ge=1, description="The highest the adaptive concurrency limit can grow to."
+    )
+    latency_target_seconds: float = Field(
+        10.0, gt=0, description="Requests slower than this reduce the concurrency limit."
+    )
+    circuit_failure_rate_threshold: float = Field(
+        0.5, gt=0, le=1, description="The failure rate that trips the circuit breaker."
+    )
+    circuit_window_size: int = Field(
+        20, ge=1, description="The number of recent requests the failure rate is computed over."
+    )
+    circuit_minimum_calls: int = Field(
+        5, ge=1, description="The number of requests recorded before the breaker can trip."
+    )
+    circuit_open_seconds: float = Field(
+        30.0, gt=0, description="How long the circuit breaker stays open before probing."
+    )
+    retry_max_tries: int = Field(
+        5, ge=1, description="The number of tries per fetch, including the first."
+    )
+    retry_budget_ratio: float = Field(
+        0.2, ge=0, description="The retries allowed per request, across all sources."
+    )
+    retry_budget_min_retries: int = Field(
+        5, ge=0, description="The retries always allowed within the retry budget window."
+    )
+    retry_budget_window_seconds: float = Field(
+        60.0, gt=0, description="The window the retry budget counts requests and retries over."
+    )
+    hedge_enabled: bool = Field(
+        False, description="Whether a request slow to return headers is sent a second time."
+    )
+    hedge_percentile: float = Field(
+        0.95, gt=0, lt=1, description="The time-to-headers percentile after which requests are hedged."
+    )
+    hedge_min_delay_seconds: float = Field(
+        1.0, gt=0, description="Requests are never hedged sooner than this."
+    )
+    hedge_min_samples: int = Field(
+        20, ge=1, description="The number of requests observed before hedging starts."
+    )
+
+    @model_validator(mode="after")
+    def _require_single_source_settings(self) -> "BambooroseSettings":
+        """Requires the api_* settings when they describe the only source."""
+        if not self.sources:
+            missing = [
+                f"BAMBOOROSE_{name.upper()}"
+                for name in ("api_url", "api_username", "api_password")
+                if getattr(self, name) is None
+            ]
+            if missing:
+                raise ValueError(f"{', '.join(missing)} must be set when BAMBOOROSE_SOURCES is not")
+        return self
+
+
+class ServiceSettings(BaseSettings):
+    """Invoice processing loop settings."""
+
+    model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
+        env_prefix="APP_",
+        validate_assignment=True,
+        extra="forbid",
+    )
+
+    poll_interval_seconds: int = Field(
+        300, description="The number of seconds to sleep between invoice processing runs."
+    )
+    skip_unchanged: bool = Field(
+        False, description="Whether to skip responses and invoices unchanged since the last run."
+    )
+    change_detection_max_invoices: int = Field(
+        100_000, description="The number of invoice fingerprints remembered for change detection."
+    )
+    invoice_log_sample_rate: int = Field(
+        1,
+        ge=0,
+        description="Log one in every N published invoices. 0 disables per-invoice logs.",
+    )
+    checkpoint_location: str | None = Field(
+        None,
+        description="The directory or object store location for checkpoints. None keeps them in memory.",
+    )
+    scheduler_slots: int = Field(
+        1, ge=1, description="The number of fetch or publish chunks that may run at once across sources."
+    )
+    live_lane_lookback_seconds: int | None = Field(
+        None,
+        ge=1,
+        description=(
+            "When a source's checkpoint falls further behind than this, the older window is "
+            "handed to a background lane and the live lane polls from this far back. None "
+            "processes each source in a single lane."
+        ),
+    )
+    background_lane_share: float = Field(
+        0.5,
+        gt=0,
+        le=1,
+        description="The fraction of scheduler slots the background lane may hold at once, at least one.",
+    )
+    publish_chunk_size: int = Field(
+        100, ge=1, description="The number of invoices published per scheduler turn."
+    )
+    envelope_max_invoices: int = Field(
+        1,
+        ge=1,
+        description="Publish up to N invoices per envelope message. 1 publishes each invoice as its own message.",
+    )
+    envelope_max_bytes: int = Field(
+        256_000,
+        ge=1,
+        description="The maximum size of the invoices in one envelope. Larger invoices are published on their own.",
+    )
+    progress_flush_interval: int = Field(
+        1000,
+        ge=0,
+        description="Persist mid-batch progress every N acknowledged invoices. 0 disables resuming within a batch.",
+    )
+    shutdown_drain_seconds: float = Field(
+        6.0,
+        ge=0,
+        description="How long in-flight batches may keep publishing after shutdown starts before they are cancelled.",
+    )
+    shutdown_flush_seconds: float = Field(
+        3.0,
+        ge=0,
+        description="How long to wait for the Kafka producer to flush on shutdown.",
+    )
+    memory_budget_bytes: int | None = Field(
+        None,
+        ge=1,
+        description="The bytes of invoice data all runs may hold before new fetches wait. None is unbounded.",
+    )
+    run_trace_buffer_size: int = Field(
+        0,
+        ge=0,
+        description="The number of recent runs whose span traces are kept for /traces. 0 disables run tracing.",
+    )
+    run_trace_directory: str | None = Field(
+        None,
+        description="A directory to also write each run's Chrome trace file to. None keeps traces in memory only.",
+    )
+    throughput_window_seconds: float = Field(
+        300.0,
+        gt=0,
+        description="The window the exported invoice throughput is averaged over.",
+    )
+    zero_copy_parsing: bool = Field(
+        False,
+        description="Whether to publish invoices as byte slices of the response instead of re-serializing each one.",
+    )
+    runtime_config_path: str | None = Field(
+        None,
+        description="A JSON file of setting overrides applied while running, e.g. {\"app\": {\"publish_chunk_size\": 500}}. None disables runtime tuning.",
+    )
+    runtime_config_poll_seconds: float = Field(
+        5.0,
+        gt=0,
+        description="How often the runtime config file is checked for changes.",
+    )
+    metrics_max_age_seconds: float = Field(
+        1.0,
+        ge=0,
+        description="How long a rendering of /metrics is served before it is rendered again. 0 renders on every scrape.",
+    )
+    leader_lock_path: str | None = Field(
+        None,
+        description="A lock file electing the one worker process that runs ingestion. None runs ingestion in every process.",
+    )
+    leader_retry_seconds: float = Field(
+        10.0,
+        gt=0,
+        description="How often a worker that is not the ingest leader tries to take over.",
+    )
+
+
+class ArchiveSettings(BaseSettings):
+    """Raw response archive settings."""
+
+    model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
+        env_prefix="ARCHIVE_",
+        validate_assignment=True,
+        extra="forbid",
+    )
+
+    enabled: bool = Field(False, description="Whether to archive raw Bamboorose responses.")
+    location: str = Field(
+        "data/archive", description="The directory or object store location of the archive."
+    )
+    max_age_seconds: int | None = Field(
+        7 * 24 * 60 * 60, description="Archived responses older than this are pruned."
+    )
+    max_entries: int | None = Field(
+        None, description="The maximum number of archived responses to keep."
+    )
+
+
+class ClaimCheckSettings(BaseSettings):
+    """Settings for storing oversized invoices outside of Kafka."""
+
+    model_config: ClassVar[SettingsConfigDict] = SettingsConfigDict(
+        env_prefix="CLAIM_CHECK_",
+        validate_assignment=True,
+        extra="forbid",
+    )
+
+    enabled: bool = Field(
+        False, description="Whether to store oversized invoices and publish a reference to them."
+    )
+    location: str = Field(
+        "data/claim-check", description="The directory or object store location for oversized invoices."
+    )
+    threshold_bytes: int = Field(
+        900_000,
+        ge=1,
+        description="Invoices larger than this are stored. Keep it below the broker's message.max.bytes.",
+    )
 
 
 class KafkaProducerSettings(X35KafkaProducerSettings):
@@ -30,6 +315,22 @@ class KafkaProducerSettings(X35KafkaProducerSettings):
     producer_topic: str = Field(
         "x35-invoice-events", description="The Kafka topic to produce messages to."
     )
+    transactional_id: str | None = Field(
+        None,
+        description=(
+            "Publishes each window's invoices in one Kafka transaction and advances the checkpoint "
+            "only after it commits. Each source lane, and the archive replay, produces under this ID "
+            "suffixed with its name. Keep it stable across restarts and unique between running instances."
+        ),
+    )
+    transaction_timeout_seconds: float = Field(
+        60.0,
+        gt=0,
+        description=(
+            "How long a transaction may stay open before the broker aborts it. Each publish chunk, "
+            "or replayed response, is one transaction, so it must cover publishing that many invoices."
+        ),
+    )
 
 
 class AppSettings:
@@ -39,9 +340,44 @@ class AppSettings:
         """Initialize the application settings."""
         self.bamboorose = BambooroseSettings()
         self.kafka = KafkaProducerSettings()
+        self.archive = ArchiveSettings()
+        self.claim_check = ClaimCheckSettings()
+        self.app = ServiceSettings()
         self.fastapi = FastAPISettings()
 
 
+def get_source_settings(settings: AppSettings) -> list[SourceSettings]:
+    """
+    Returns the configured Bamboorose sources with defaults filled in.
+
+    Without ``BAMBOOROSE_SOURCES`` this is a single source built from the
+    ``BAMBOOROSE_API_*`` settings, which keeps single-source deployments unchanged.
+    """
+    sources = settings.bamboorose.sources or [
+        SourceSettings(
+            name=DEFAULT_SOURCE_NAME,
+            api_url=settings.bamboorose.api_url,
+            api_username=settings.bamboorose.api_username,
+            api_password=settings.bamboorose.api_password,
+            api_timeout=settings.bamboorose.api_timeout,
+            soap_operation=settings.bamboorose.soap_operation,
+        )
+    ]
+    names = [source.name for source in sources]
+    if len(names) != len(set(names)):
+        raise ValueError(f"Bamboorose source names must be unique: {names}")
+    return [
+        source.model_copy(
+            update={
+                "producer_topic": source.producer_topic or settings.kafka.producer_topic,
+                "poll_interval_seconds": source.poll_interval_seconds
+                or settings.app.poll_interval_seconds,
+            }
+        )
+        for source in sources
+    ]
+
+
 @lru_cache()
 def get_settings() -> AppSettings:
     """Return the application settings."""
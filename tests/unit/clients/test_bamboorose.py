@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 """Unit tests for the Bamboorose client."""
+import asyncio
+
 import httpx
 import pytest
 import respx
 
 from src.clients.bamboorose import BambooroseClient, get_bamboorose_client
+from src.clients.resilience import HedgePolicy, RetryBudget
+from src.settings.config import SourceSettings
 
 
 @pytest.fixture
@@ -18,6 +22,7 @@ def bamboorose_client(mocker) -> BambooroseClient:
                 api_timeout=60,
                 api_username="test_user",
                 api_password=mocker.Mock(get_secret_value=lambda: "test_password"),
+                soap_operation="getCommercialInvoicesByAvailableTimestamp",
             ),
         ),
     )
@@ -73,3 +78,89 @@ async def test_get_invoices_no_retry_on_4xx(bamboorose_client: BambooroseClient)
         await bamboorose_client.get_invoices("2023-01-01T00:00:00Z")
 
     assert request.call_count == 1
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_get_invoices_for_source_uses_shared_client_and_operation():
+    """Test that a source-specific client sends its own operation through the shared client."""
+    request = respx.post("https://other.com").mock(
+        return_value=httpx.Response(200, text="<xml>Success</xml>")
+    )
+    source = SourceSettings(
+        name="other",
+        api_url="https://other.com",
+        api_username="other_user",
+        api_password="other&password",
+        soap_operation="getOtherInvoices",
+    )
+    async with httpx.AsyncClient() as http_client:
+        client = get_bamboorose_client(source, http_client)
+        await client.get_invoices("2023-01-01T00:00:00Z")
+
+    sent = request.calls.last.request
+    soap_request = sent.content.decode("utf-8")
+    assert sent.headers["SOAPAction"] == "getOtherInvoices"
+    assert "<ser:getOtherInvoices>" in soap_request
+    assert "<ser:password>other&amp;password</ser:password>" in soap_request
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_get_invoices_retry_on_timeout(bamboorose_client: BambooroseClient):
+    """Test that the get_invoices method retries timeouts and connection errors."""
+    request = respx.post("https://test.com").mock(
+        side_effect=[
+            httpx.ConnectTimeout("timed out"),
+            httpx.Response(200, text="<xml>Success</xml>"),
+        ]
+    )
+    response = await bamboorose_client.get_invoices("2023-01-01T00:00:00Z")
+
+    assert request.call_count == 2
+    assert response.text == "<xml>Success</xml>"
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_get_invoices_stops_retrying_when_budget_exhausted(
+    bamboorose_client: BambooroseClient,
+):
+    """Test that an error is not retried once the retry budget is used up."""
+    request = respx.post("https://test.com").mock(
+        side_effect=[
+            httpx.Response(500),
+            httpx.Response(200, text="<xml>Success</xml>"),
+        ]
+    )
+    bamboorose_client.retry_budget = RetryBudget(ratio=0, min_retries=0)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await bamboorose_client.get_invoices("2023-01-01T00:00:00Z")
+
+    assert request.call_count == 1
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_get_invoices_hedges_slow_request(bamboorose_client: BambooroseClient):
+    """Test that a request without headers after the hedge delay is sent again and the faster response used."""
+    calls = []
+
+    async def respond(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+            return httpx.Response(200, text="<xml>Slow</xml>")
+        return httpx.Response(200, text="<xml>Fast</xml>")
+
+    respx.post("https://test.com").mock(side_effect=respond)
+    bamboorose_client.hedge = HedgePolicy(min_delay_seconds=0.05, min_samples=1)
+    bamboorose_client.hedge.observe(0.01)
+
+    response = await asyncio.wait_for(
+        bamboorose_client.get_invoices("2023-01-01T00:00:00Z"), timeout=1
+    )
+
+    assert len(calls) == 2
+    assert response.text == "<xml>Fast</xml>"
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the blob store."""
+
+import pytest
+
+from src.clients.blob_store import LocalBlobStore, get_blob_store
+
+
+def test_local_blob_store_round_trip(tmp_path):
+    """Test that objects can be written, read, and deleted."""
+    store = LocalBlobStore(tmp_path)
+    store.put("a/b.bin", b"data")
+
+    assert store.exists("a/b.bin")
+    assert store.get("a/b.bin") == b"data"
+
+    store.delete("a/b.bin")
+    assert not store.exists("a/b.bin")
+    with pytest.raises(KeyError):
+        store.get("a/b.bin")
+
+
+def test_local_blob_store_rejects_escaping_keys(tmp_path):
+    """Test that keys cannot write outside of the store root."""
+    store = LocalBlobStore(tmp_path / "store")
+
+    with pytest.raises(ValueError):
+        store.put("../outside.bin", b"data")
+
+
+def test_get_blob_store_unsupported_scheme():
+    """Test that unsupported locations raise a ValueError."""
+    with pytest.raises(ValueError):
+        get_blob_store("s3://bucket/prefix")
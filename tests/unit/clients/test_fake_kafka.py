@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the in-process Kafka producer stand-in."""
+
+import pytest
+
+from scripts.fake_kafka import BrokerModel, FakeProducer, TransactionStateError
+
+INSTANT_BROKER = BrokerModel(
+    round_trip_ms=0, replication_ms=0, bandwidth_bytes_per_second=1e12
+)
+
+
+def test_fake_producer_delivers_every_message_on_flush():
+    """Test that flush waits for every message and runs the delivery callbacks."""
+    producer = FakeProducer({"linger.ms": 1000}, INSTANT_BROKER)
+    delivered = []
+
+    for index in range(10):
+        producer.produce(
+            "invoices",
+            value=f"invoice-{index}",
+            key="trace",
+            headers={"trace_id": "trace"},
+            on_delivery=lambda err, message: delivered.append((err, message)),
+        )
+
+    assert producer.flush(5) == 0
+    assert len(producer) == 0
+    assert [message.value() for _, message in delivered] == [
+        f"invoice-{index}".encode() for index in range(10)
+    ]
+    assert all(err is None and message.latency() >= 0 for err, message in delivered)
+    assert delivered[0][1].headers() == [("trace_id", b"trace")]
+
+
+def test_fake_producer_close_delivers_and_stops_its_threads():
+    """Test that close delivers the queued messages and stops the producer's threads."""
+    producer = FakeProducer({"linger.ms": 1000}, INSTANT_BROKER)
+    producer.produce("invoices", value=b"invoice", key=b"trace")
+
+    assert producer.close(5) == 0
+    assert len(producer.log) == 1
+    assert not producer._sender.is_alive()
+    assert not any(thread.is_alive() for thread in producer._transmitters)
+
+
+def test_fake_producer_splits_batches_at_batch_size():
+    """Test that a partition's messages are sent in batches no larger than batch.size."""
+    producer = FakeProducer({"linger.ms": 1000, "batch.size": 250}, INSTANT_BROKER)
+
+    for _ in range(10):
+        producer.produce("invoices", value=b"x" * 100, key=b"trace")
+    producer.flush(5)
+
+    assert producer.requests_sent == 5
+
+
+def test_fake_producer_compresses_batches():
+    """Test that gzip compression reduces the bytes sent to the broker."""
+    plain = FakeProducer({"compression.type": "none"}, INSTANT_BROKER)
+    gzipped = FakeProducer({"compression.type": "gzip"}, INSTANT_BROKER)
+
+    for producer in (plain, gzipped):
+        for _ in range(100):
+            producer.produce("invoices", value=b"<invoice>" * 50, key=b"trace")
+        producer.flush(5)
+
+    assert gzipped.bytes_sent < plain.bytes_sent / 10
+
+
+def test_fake_producer_rejects_unknown_compression():
+    """Test that an unsupported compression codec is reported on creation."""
+    with pytest.raises(ValueError):
+        FakeProducer({"compression.type": "brotli"})
+
+
+def test_fake_producer_read_committed_hides_aborted_and_open_transactions():
+    """Test that read-committed reads skip aborted transactions and stop at open ones."""
+    producer = FakeProducer({"transactional.id": "ingestor"}, INSTANT_BROKER)
+    producer.init_transactions()
+
+    producer.begin_transaction()
+    producer.produce("invoices", value="committed", key="trace")
+    producer.commit_transaction()
+    producer.begin_transaction()
+    producer.produce("invoices", value="aborted", key="trace")
+    producer.abort_transaction()
+    producer.begin_transaction()
+    producer.produce("invoices", value="open", key="trace")
+    producer.flush(5)
+
+    assert [message.value() for message in producer.messages()] == [b"committed"]
+    assert [message.value() for message in producer.messages("read_uncommitted")] == [
+        b"committed",
+        b"aborted",
+        b"open",
+    ]
+
+
+def test_fake_producer_transactional_state_errors():
+    """Test that a transactional producer only produces inside an initialized transaction."""
+    producer = FakeProducer({"transactional.id": "ingestor"}, INSTANT_BROKER)
+
+    with pytest.raises(TransactionStateError):
+        producer.begin_transaction()
+    producer.init_transactions()
+    with pytest.raises(TransactionStateError):
+        producer.produce("invoices", value="outside", key="trace")
+    with pytest.raises(TransactionStateError):
+        producer.commit_transaction()
+    with pytest.raises(TransactionStateError):
+        FakeProducer().init_transactions()
@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 """Unit tests for the Kafka client."""
+import asyncio
+import hashlib
+import json
 import sys
+from collections.abc import Iterator
 from unittest.mock import MagicMock
 
 import pytest
 from pytest_mock import MockerFixture
 
+from scripts.fake_kafka import BrokerModel, FakeProducer
+from src.clients.blob_store import LocalBlobStore
+
 # Mock the urbn_confluent_methods library to avoid the FileNotFoundError
 class KafkaProducerError(Exception):
     pass
@@ -16,6 +23,10 @@ sys.modules["urbn_confluent_methods"] = urbn_confluent_methods
 
 from src.clients.kafka import KafkaProducerClient, get_kafka_producer_client
 
+INSTANT_BROKER = BrokerModel(
+    round_trip_ms=0, replication_ms=0, bandwidth_bytes_per_second=1e12
+)
+
 
 @pytest.fixture
 def kafka_producer_client(mocker: MockerFixture) -> KafkaProducerClient:
@@ -25,7 +36,9 @@ def kafka_producer_client(mocker: MockerFixture) -> KafkaProducerClient:
         return_value=mocker.Mock(
             kafka=mocker.Mock(
                 producer_topic="test-topic",
+                transactional_id=None,
             ),
+            claim_check=mocker.Mock(enabled=False, threshold_bytes=900_000),
         ),
     )
     return get_kafka_producer_client()
@@ -48,3 +61,233 @@ def test_publish_invoice_error(kafka_producer_client: KafkaProducerClient, mocke
     
     with pytest.raises(KafkaProducerError):
         kafka_producer_client.publish_invoice("<invoice>test</invoice>", "test-trace-id")
+
+
+@pytest.mark.asyncio
+async def test_publish_invoice_memoryview(mocker: MockerFixture):
+    """Test that an invoice passed as a view of UTF-8 bytes is decoded before it is produced."""
+    mocker.patch("src.clients.kafka.ProducerService")
+    mocker.patch(
+        "src.clients.kafka.get_settings",
+        return_value=mocker.Mock(
+            kafka=mocker.Mock(producer_topic="test-topic", transactional_id=None),
+            claim_check=mocker.Mock(enabled=False, threshold_bytes=900_000),
+        ),
+    )
+    kafka_producer_client = get_kafka_producer_client()
+    buffer = "<document><invoice>Café</invoice></document>".encode("utf-8")
+    await kafka_producer_client.publish_invoice(memoryview(buffer)[10:-11], "test-trace-id")
+
+    kafka_producer_client.producer.create_message.assert_called_once_with(
+        key="test-trace-id",
+        message={"invoice": "<invoice>Café</invoice>"},
+        headers={"trace_id": "test-trace-id"},
+    )
+
+
+@pytest.mark.asyncio
+async def test_publish_invoice_claim_check(tmp_path, mocker: MockerFixture):
+    """Test that an invoice over the threshold is stored and published as a reference."""
+    mocker.patch("src.clients.kafka.ProducerService")
+    mocker.patch(
+        "src.clients.kafka.get_settings",
+        return_value=mocker.Mock(kafka=mocker.Mock(producer_topic="test-topic")),
+    )
+    store = LocalBlobStore(tmp_path)
+    kafka_producer_client = KafkaProducerClient(
+        claim_check_store=store, claim_check_threshold_bytes=32
+    )
+    invoice = "<invoice>" + "<line>Café</line>" * 10 + "</invoice>"
+    payload = invoice.encode("utf-8")
+
+    await kafka_producer_client.publish_invoice(invoice, "test-trace-id")
+    await kafka_producer_client.publish_invoice(memoryview(payload), "test-trace-id")
+
+    digest = hashlib.sha256(payload).hexdigest()
+    key = f"invoices/{digest[:2]}/{digest}.xml"
+    assert store.get(key) == payload
+    reference = {
+        "claim_check": {"uri": store.uri(key), "sha256": digest, "size": len(payload)}
+    }
+    assert kafka_producer_client.producer.create_message.call_args_list == [
+        mocker.call(
+            key="test-trace-id",
+            message=reference,
+            headers={"trace_id": "test-trace-id"},
+        )
+    ] * 2
+
+
+@pytest.mark.asyncio
+async def test_publish_invoice_claim_check_small_invoice_inline(
+    tmp_path, mocker: MockerFixture
+):
+    """Test that an invoice within the threshold is published inline and not stored."""
+    mocker.patch("src.clients.kafka.ProducerService")
+    mocker.patch(
+        "src.clients.kafka.get_settings",
+        return_value=mocker.Mock(kafka=mocker.Mock(producer_topic="test-topic")),
+    )
+    store = LocalBlobStore(tmp_path / "claims")
+    kafka_producer_client = KafkaProducerClient(
+        claim_check_store=store, claim_check_threshold_bytes=1024
+    )
+
+    await kafka_producer_client.publish_invoice("<invoice>test</invoice>", "test-trace-id")
+
+    kafka_producer_client.producer.create_message.assert_called_once_with(
+        key="test-trace-id",
+        message={"invoice": "<invoice>test</invoice>"},
+        headers={"trace_id": "test-trace-id"},
+    )
+    assert not any((tmp_path / "claims").iterdir())
+
+
+@pytest.mark.asyncio
+async def test_publish_envelope(mocker: MockerFixture):
+    """Test that several invoices are produced as one message listing their ids in a header."""
+    mocker.patch("src.clients.kafka.ProducerService")
+    mocker.patch(
+        "src.clients.kafka.get_settings",
+        return_value=mocker.Mock(kafka=mocker.Mock(producer_topic="test-topic")),
+    )
+    kafka_producer_client = KafkaProducerClient()
+    buffer = b"<invoice>2</invoice>"
+
+    await kafka_producer_client.publish_envelope(
+        ["<invoice>1</invoice>", memoryview(buffer)], ["1", "2"], "test-trace-id"
+    )
+
+    kafka_producer_client.producer.create_message.assert_called_once_with(
+        key="test-trace-id",
+        message={"invoices": ["<invoice>1</invoice>", "<invoice>2</invoice>"]},
+        headers={
+            "trace_id": "test-trace-id",
+            "invoice_ids": "1,2",
+            "invoice_count": "2",
+        },
+    )
+
+
+@pytest.fixture
+def transactional_producers(mocker: MockerFixture) -> Iterator[dict[str, FakeProducer]]:
+    """Returns the fake transactional producers created by ``transactional_client``, by name, and closes them."""
+    mocker.patch("src.clients.kafka.ProducerService")
+    mocker.patch(
+        "src.clients.kafka.get_settings",
+        return_value=mocker.Mock(kafka=mocker.Mock(producer_topic="test-topic")),
+    )
+    producers: dict[str, FakeProducer] = {}
+    yield producers
+    for producer in producers.values():
+        producer.close()
+
+
+@pytest.fixture
+def transactional_client(
+    transactional_producers: dict[str, FakeProducer],
+) -> KafkaProducerClient:
+    """Returns a transactional Kafka producer client backed by fake producers."""
+
+    def factory(name: str) -> FakeProducer:
+        producer = FakeProducer({"transactional.id": f"ingestor-{name}"}, INSTANT_BROKER)
+        transactional_producers[name] = producer
+        return producer
+
+    return KafkaProducerClient(transactional_producer_factory=factory)
+
+
+@pytest.mark.asyncio
+async def test_publish_in_transaction(
+    transactional_client: KafkaProducerClient,
+    transactional_producers: dict[str, FakeProducer],
+):
+    """Test that a transactional client produces JSON messages that become visible on commit."""
+    kafka_producer_client = await transactional_client.for_transactions("us")
+    producer = transactional_producers["us"]
+
+    await kafka_producer_client.begin_transaction()
+    await kafka_producer_client.publish_invoice("<invoice>1</invoice>", "test-trace-id")
+    await kafka_producer_client.publish_envelope(
+        ["<invoice>2</invoice>", "<invoice>3</invoice>"], ["2", "3"], "test-trace-id", "other-topic"
+    )
+    assert producer.messages() == []
+    await kafka_producer_client.commit_transaction()
+
+    messages = producer.messages()
+    assert [(message.topic(), json.loads(message.value())) for message in messages] == [
+        ("test-topic", {"invoice": "<invoice>1</invoice>"}),
+        ("other-topic", {"invoices": ["<invoice>2</invoice>", "<invoice>3</invoice>"]}),
+    ]
+    assert messages[0].headers() == [("trace_id", b"test-trace-id")]
+    kafka_producer_client.producer.create_message.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_commit_transaction_failure_aborts(
+    transactional_client: KafkaProducerClient,
+    transactional_producers: dict[str, FakeProducer],
+    mocker: MockerFixture,
+):
+    """Test that a transaction that fails to commit is aborted and the error raised."""
+    kafka_producer_client = await transactional_client.for_transactions("us")
+    producer = transactional_producers["us"]
+    mocker.patch.object(producer, "commit_transaction", side_effect=RuntimeError("fenced"))
+
+    await kafka_producer_client.begin_transaction()
+    await kafka_producer_client.publish_invoice("<invoice>1</invoice>", "test-trace-id")
+    with pytest.raises(RuntimeError):
+        await kafka_producer_client.commit_transaction()
+
+    assert producer.messages() == []
+    assert [
+        message.value() for message in producer.messages("read_uncommitted")
+    ] == [b'{"invoice": "<invoice>1</invoice>"}']
+
+    # The failed transaction no longer holds the client.
+    await asyncio.wait_for(kafka_producer_client.begin_transaction(), 1)
+    await kafka_producer_client.abort_transaction()
+
+
+@pytest.mark.asyncio
+async def test_transactions_get_a_producer_per_name(
+    transactional_client: KafkaProducerClient,
+    transactional_producers: dict[str, FakeProducer],
+):
+    """Test that each name publishes through its own producer, so their transactions may overlap."""
+    us = await transactional_client.for_transactions("us")
+    eu = await transactional_client.for_transactions("eu")
+    assert await transactional_client.for_transactions("us") is us
+
+    await us.begin_transaction()
+    await eu.begin_transaction()
+    await us.publish_invoice("<invoice>us</invoice>", "us-trace-id")
+    await eu.publish_invoice("<invoice>eu</invoice>", "eu-trace-id")
+    await eu.commit_transaction()
+    await us.abort_transaction()
+
+    assert [message.key() for message in transactional_producers["eu"].messages()] == [b"eu-trace-id"]
+    assert transactional_producers["us"].messages() == []
+    with pytest.raises(RuntimeError):
+        await transactional_client.publish_invoice("<invoice>1</invoice>", "test-trace-id")
+
+
+@pytest.mark.asyncio
+async def test_transactions_on_one_name_take_turns(
+    transactional_client: KafkaProducerClient,
+    transactional_producers: dict[str, FakeProducer],
+):
+    """Test that a second transaction on the same producer waits for the open one to end."""
+    kafka_producer_client = await transactional_client.for_transactions("us")
+
+    async def publish(invoice: str) -> None:
+        await kafka_producer_client.begin_transaction()
+        await kafka_producer_client.publish_invoice(invoice, "test-trace-id")
+        await asyncio.sleep(0)
+        await kafka_producer_client.commit_transaction()
+
+    await asyncio.gather(publish("<invoice>1</invoice>"), publish("<invoice>2</invoice>"))
+
+    assert [
+        json.loads(message.value()) for message in transactional_producers["us"].messages()
+    ] == [{"invoice": "<invoice>1</invoice>"}, {"invoice": "<invoice>2</invoice>"}]
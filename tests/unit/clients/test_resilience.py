@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the adaptive limiter and circuit breaker."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from src.clients.resilience import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgePolicy,
+    LatencyHistogram,
+    RequestGuard,
+    RetryBudget,
+)
+
+
+class FakeClock:
+    """A manually advanced monotonic clock."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_limiter_increases_additively_and_decreases_multiplicatively():
+    """Test that fast successes grow the limit and a failure halves it."""
+    clock = FakeClock()
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8, clock=clock)
+
+    for _ in range(8):
+        started_at = await limiter.acquire()
+        clock.now += 1
+        limiter.release(started_at, succeeded=True)
+    assert limiter.limit == 5
+
+    started_at = await limiter.acquire()
+    clock.now += 1
+    limiter.release(started_at, succeeded=False)
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_backs_off_once_per_round():
+    """Test that concurrent failures that started before a decrease do not decrease again."""
+    clock = FakeClock()
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, clock=clock)
+    started = [await limiter.acquire() for _ in range(4)]
+
+    clock.now += 1
+    for started_at in started:
+        limiter.release(started_at, succeeded=False)
+
+    assert limiter.limit == 4
+
+
+@pytest.mark.asyncio
+async def test_limiter_blocks_above_limit():
+    """Test that callers wait when the limit is reached and resume on release."""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+    started_at = await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    limiter.release(started_at, succeeded=None)
+    await asyncio.wait_for(waiter, timeout=1)
+    assert limiter.in_flight == 1
+
+
+def test_circuit_breaker_trips_and_recovers():
+    """Test that the breaker opens on failures, probes after the open period and closes."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(minimum_calls=2, open_seconds=30, clock=clock)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record(False)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.trips == 1
+
+
+@pytest.mark.asyncio
+async def test_request_guard_only_counts_upstream_failures():
+    """Test that 5xx responses count against the breaker but 4xx responses do not."""
+    guard = RequestGuard(
+        "test",
+        AdaptiveConcurrencyLimiter(),
+        CircuitBreaker(minimum_calls=2),
+    )
+    request = httpx.Request("POST", "https://test.com")
+
+    for status_code in (400, 400, 500, 503):
+        with pytest.raises(httpx.HTTPStatusError):
+            async with guard.attempt():
+                httpx.Response(status_code, request=request).raise_for_status()
+        if status_code == 400:
+            assert guard.breaker.state == CircuitBreaker.CLOSED
+
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        async with guard.attempt():
+            pass
+
+
+def test_retry_budget_caps_retries_at_ratio_of_requests():
+    """Test that retries are allowed up to the floor plus the ratio of recent requests."""
+    clock = FakeClock()
+    budget = RetryBudget(ratio=0.1, min_retries=1, window_seconds=10, clock=clock)
+
+    budget.record_retry()
+    assert not budget.can_retry()
+
+    for _ in range(20):
+        budget.record_request()
+    assert budget.can_retry()
+    budget.record_retry()
+    assert not budget.can_retry()
+
+    clock.now = 11
+    assert budget.can_retry()
+
+
+def test_hedge_policy_waits_for_samples_and_follows_percentile():
+    """Test that hedging starts once enough latencies are seen, after their percentile."""
+    policy = HedgePolicy(percentile=0.9, min_delay_seconds=0.1, min_samples=10)
+
+    for _ in range(9):
+        policy.observe(1.0)
+    assert policy.delay() is None
+
+    policy.observe(1.0)
+    assert 1.0 <= policy.delay() < 1.25
+
+
+def test_latency_histogram_decays_old_observations():
+    """Test that recent latencies outweigh old ones once the histogram decays."""
+    histogram = LatencyHistogram(decay_after=100)
+
+    for _ in range(99):
+        histogram.observe(5.0)
+    for _ in range(300):
+        histogram.observe(0.05)
+
+    assert histogram.quantile(0.9) < 0.1
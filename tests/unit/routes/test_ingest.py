@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the ingestion run endpoints."""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routes.ingest import ingest_router
+from src.services.runs import RunCoordinator
+from src.services.sources import IngestionSource, SourceRegistry
+
+
+@pytest.fixture
+def test_client() -> TestClient:
+    """Returns a test client whose runs publish one invoice per source."""
+
+    async def run(source):
+        await asyncio.sleep(0.01)
+        return {"invoices_published": 1}
+
+    app = FastAPI()
+    app.include_router(ingest_router)
+    app.state.runs = RunCoordinator(run)
+    app.state.sources = SourceRegistry()
+    for name in ("us", "eu"):
+        app.state.sources.register(
+            IngestionSource(name, MagicMock(), "topic", 300, "2023-01-01T00:00:00Z")
+        )
+    with TestClient(app) as client:
+        yield client
+
+
+def test_trigger_runs_and_wait(test_client: TestClient):
+    """Test that waiting for a trigger returns the finished runs of every source."""
+    response = test_client.post("/runs", params={"wait": True})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert {run["source"] for run in body} == {"us", "eu"}
+    assert all(run["status"] == "succeeded" for run in body)
+    assert body[0]["result"] == {"invoices_published": 1}
+
+
+def test_trigger_run_without_waiting_then_get_status(test_client: TestClient):
+    """Test that a trigger returns a run id immediately that can be looked up."""
+    response = test_client.post("/runs", params={"source": "us"})
+
+    assert response.status_code == 202
+    (run,) = response.json()
+    assert run["trigger"] == "api"
+
+    status = test_client.get(f"/runs/{run['run_id']}")
+    assert status.status_code == 200
+    assert status.json()["source"] == "us"
+    assert test_client.get("/runs").json()[0]["run_id"] == run["run_id"]
+
+
+def test_trigger_run_unknown_source_and_run(test_client: TestClient):
+    """Test that unknown sources and run ids return 404."""
+    assert test_client.post("/runs", params={"source": "apac"}).status_code == 404
+    assert test_client.get("/runs/missing").status_code == 404
+
+
+def test_trigger_runs_rejected_while_shutting_down(test_client: TestClient):
+    """Test that triggers are rejected once the service stops accepting runs."""
+    test_client.app.state.runs.stop_accepting()
+
+    assert test_client.post("/runs").status_code == 503
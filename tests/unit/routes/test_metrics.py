@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 """Unit tests for the metrics endpoint."""
+from contextlib import asynccontextmanager
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -11,6 +13,13 @@ def test_client(mocker) -> TestClient:
     """Returns a test client with mocked settings."""
     mocker.patch("src.settings.config.BambooroseSettings")
     mocker.patch("src.settings.config.KafkaProducerSettings")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # The ingest loop and its clients are not needed to serve metrics.
+        yield
+
+    mocker.patch("src.app.lifespan", lifespan)
     app = create_app()
     with TestClient(app) as client:
         yield client
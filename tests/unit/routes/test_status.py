@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the ingestion status endpoint."""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routes.status import status_router
+from src.services.backlog import BacklogTracker, parse_timestamp
+
+
+def test_get_status(mocker):
+    """Test that the lag and backlog of every configured source are reported, with totals."""
+    backlog = BacklogTracker(clock=lambda: parse_timestamp("2024-01-01T00:10:00Z"))
+    backlog.committed("us", "2024-01-01T00:00:00Z")
+    backlog.batch_started("us", invoices=4, size=400)
+    backlog.batch_progress("us", pending=1)
+    app = FastAPI()
+    app.include_router(status_router)
+    app.state.backlog = backlog
+    app.state.sources = [mocker.Mock(), mocker.Mock()]
+    app.state.sources[0].name = "us"
+    app.state.sources[1].name = "eu"
+    app.state.runs = mocker.Mock(in_flight=mocker.Mock(return_value=["us"]))
+    app.state.memory_budget = None
+
+    response = TestClient(app).get("/status")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "max_lag_seconds": 600.0,
+        "backlog_invoices": 1,
+        "backlog_bytes": 100,
+        "throughput_invoices_per_second": 0.0,
+        "runs_in_flight": 1,
+        "runs_waiting_for_memory": 0,
+        "sources": [
+            {
+                "source": "us",
+                "lane": "live",
+                "checkpoint": "2024-01-01T00:00:00Z",
+                "lag_seconds": 600.0,
+                "backlog_invoices": 1,
+                "backlog_bytes": 100,
+                "running": True,
+            },
+            {
+                "source": "eu",
+                "lane": "live",
+                "checkpoint": None,
+                "lag_seconds": None,
+                "backlog_invoices": 0,
+                "backlog_bytes": 0,
+                "running": False,
+            },
+        ],
+    }
+
+
+def test_get_status_lists_background_lane_while_draining(mocker):
+    """Test that a source's background lane is reported only while it has a backfill to drain."""
+    backlog = BacklogTracker(clock=lambda: parse_timestamp("2024-01-01T00:10:00Z"))
+    backlog.committed("us", "2024-01-01T00:09:00Z")
+    backlog.committed("us:background", "2023-12-31T00:10:00Z")
+    app = FastAPI()
+    app.include_router(status_router)
+    app.state.backlog = backlog
+    app.state.sources = [mocker.Mock()]
+    app.state.sources[0].name = "us"
+    app.state.runs = mocker.Mock(in_flight=mocker.Mock(return_value=[]))
+    app.state.memory_budget = None
+
+    body = TestClient(app).get("/status").json()
+
+    assert body["max_lag_seconds"] == 86400.0
+    assert [(source["lane"], source["lag_seconds"]) for source in body["sources"]] == [
+        ("live", 60.0),
+        ("background", 86400.0),
+    ]
+
+    backlog.forget("us:background")
+    body = TestClient(app).get("/status").json()
+
+    assert [source["lane"] for source in body["sources"]] == ["live"]
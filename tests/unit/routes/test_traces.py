@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the run trace endpoints."""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routes.traces import traces_router
+from src.services.tracing import TraceBuffer
+
+
+def _test_client(traces: TraceBuffer | None) -> TestClient:
+    app = FastAPI()
+    app.include_router(traces_router)
+    app.state.traces = traces
+    return TestClient(app)
+
+
+def test_get_traces():
+    """Test that recent runs and single runs are returned as Chrome trace documents."""
+    traces = TraceBuffer(capacity=5)
+    trace = traces.start("trace-1", "us")
+    with trace.span("fetch"):
+        pass
+    traces.add(trace)
+    test_client = _test_client(traces)
+
+    recent = test_client.get("/traces")
+    single = test_client.get("/traces/trace-1")
+
+    assert recent.status_code == 200
+    assert recent.json()["otherData"]["trace_ids"] == ["trace-1"]
+    assert single.status_code == 200
+    assert [event["name"] for event in single.json()["traceEvents"]] == [
+        "thread_name",
+        "fetch",
+    ]
+    assert test_client.get("/traces/unknown").status_code == 404
+
+
+def test_get_traces_disabled():
+    """Test that the endpoints report tracing as unavailable when it is disabled."""
+    assert _test_client(None).get("/traces").status_code == 404
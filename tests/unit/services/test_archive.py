@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the response archive."""
+
+import pytest
+
+from src.clients.blob_store import LocalBlobStore
+from src.services.archive import ArchiveError, ResponseArchive
+
+
+@pytest.fixture
+def archive(tmp_path) -> ResponseArchive:
+    """Returns a response archive backed by a temporary directory."""
+    return ResponseArchive(LocalBlobStore(tmp_path))
+
+
+def test_archive_round_trip(archive: ResponseArchive):
+    """Test that an archived response can be read back for its window."""
+    entry = archive.archive("2023-01-01T00:00:00Z", b"<xml>1</xml>", now=100.0)
+
+    assert archive.entries("2023-01-01T00:00:00Z", "2023-01-01T00:00:00Z") == [entry]
+    assert archive.read(entry) == b"<xml>1</xml>"
+
+
+def test_archive_deduplicates_identical_bodies(archive: ResponseArchive, tmp_path):
+    """Test that identical bodies in different windows share a single blob."""
+    first = archive.archive("2023-01-01T00:00:00Z", b"<xml>same</xml>", now=100.0)
+    second = archive.archive("2023-01-02T00:00:00Z", b"<xml>same</xml>", now=200.0)
+
+    assert first.blob_key == second.blob_key
+    assert len(list((tmp_path / "responses").rglob("*.xml.gz"))) == 1
+
+
+def test_archive_entries_filters_by_window(archive: ResponseArchive):
+    """Test that entries only returns windows within the requested range, in order."""
+    archive.archive("2023-01-03T00:00:00Z", b"<xml>3</xml>", now=300.0)
+    archive.archive("2023-01-01T00:00:00Z", b"<xml>1</xml>", now=100.0)
+    archive.archive("2023-01-02T00:00:00Z", b"<xml>2</xml>", now=200.0)
+
+    entries = archive.entries("2023-01-01T00:00:00Z", "2023-01-02T00:00:00Z")
+
+    assert [entry.window for entry in entries] == [
+        "2023-01-01T00:00:00Z",
+        "2023-01-02T00:00:00Z",
+    ]
+
+
+def test_archive_retention_prunes_old_entries(tmp_path):
+    """Test that entries beyond the retention limits are pruned along with their blobs."""
+    archive = ResponseArchive(
+        LocalBlobStore(tmp_path), max_age_seconds=50, max_entries=1
+    )
+    old = archive.archive("2023-01-01T00:00:00Z", b"<xml>old</xml>", now=100.0)
+    new = archive.archive("2023-01-02T00:00:00Z", b"<xml>new</xml>", now=200.0)
+
+    assert archive.entries("2023-01-01T00:00:00Z", "2023-12-31T00:00:00Z") == [new]
+    with pytest.raises(ArchiveError):
+        archive.read(old)
+
+
+def test_archive_read_detects_corruption(archive: ResponseArchive):
+    """Test that reading a blob that does not match its digest raises an ArchiveError."""
+    entry = archive.archive("2023-01-01T00:00:00Z", b"<xml>1</xml>", now=100.0)
+    archive.store.put(entry.blob_key, b"not gzip")
+
+    with pytest.raises(ArchiveError):
+        archive.read(entry)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the ingestion backlog tracker."""
+
+import math
+
+from src.services.backlog import BacklogTracker, parse_timestamp
+
+NOW = parse_timestamp("2024-01-01T01:00:00Z")
+
+
+def test_backlog_tracker_lag():
+    """Test that lag is the time since the committed checkpoint, and unknown before one is committed."""
+    backlog = BacklogTracker(clock=lambda: NOW)
+
+    assert math.isnan(backlog.lag_seconds("us"))
+
+    backlog.committed("us", "2024-01-01T00:00:00Z")
+
+    assert backlog.lag_seconds("us") == 3600
+
+
+def test_backlog_tracker_pending_invoices_and_bytes():
+    """Test that the backlog shrinks as a batch is published and keeps failed invoices after the run."""
+    backlog = BacklogTracker(clock=lambda: NOW)
+
+    backlog.batch_started("us", invoices=10, size=5000)
+    assert backlog.source("us").running
+    assert backlog.pending_invoices("us") == 10
+    assert backlog.pending_bytes("us") == 5000
+
+    backlog.batch_progress("us", pending=2)
+    backlog.batch_finished("us")
+
+    assert not backlog.source("us").running
+    assert backlog.pending_invoices("us") == 2
+    assert backlog.pending_bytes("us") == 1000
+    assert backlog.pending_invoices("eu") == 0
+
+
+def test_backlog_tracker_throughput_window():
+    """Test that throughput averages the invoices published within the window only."""
+    now = [NOW]
+    backlog = BacklogTracker(throughput_window_seconds=10, clock=lambda: now[0])
+
+    backlog.record_published(30)
+    now[0] += 5
+    backlog.record_published(20)
+
+    assert backlog.throughput() == 5
+
+    now[0] += 6
+
+    assert backlog.throughput() == 2
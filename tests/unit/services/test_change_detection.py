@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the change detection service."""
+
+from src.services.change_detection import (
+    ChangeDetector,
+    StagedChangeDetector,
+    fingerprint,
+)
+
+
+def test_fingerprint_matches_across_input_types():
+    """Test that bytes, strings, and chunk iterables of the same content hash identically."""
+    data = "<invoice>é</invoice>"
+
+    assert fingerprint(data) == fingerprint(data.encode("utf-8"))
+    assert fingerprint(data) == fingerprint(
+        iter([b"<invoice>", "é</invoice>".encode("utf-8")])
+    )
+    assert fingerprint(data) != fingerprint("<invoice>e</invoice>")
+
+
+def test_response_unchanged_only_after_commit():
+    """Test that a response is only considered unchanged once it has been committed."""
+    detector = ChangeDetector()
+
+    assert not detector.response_unchanged("abc")
+    detector.commit_response("abc")
+    assert detector.response_unchanged("abc")
+    assert not detector.response_unchanged("def")
+
+
+def test_invoice_unchanged_tracks_latest_content():
+    """Test that only invoices whose content changed are reported as changed."""
+    detector = ChangeDetector()
+    detector.commit_invoice("1", "abc")
+
+    assert detector.invoice_unchanged("1", "abc")
+    assert not detector.invoice_unchanged("1", "def")
+    assert not detector.invoice_unchanged("2", "abc")
+
+
+def test_invoice_fingerprints_are_bounded():
+    """Test that the least recently seen invoices are forgotten first."""
+    detector = ChangeDetector(max_invoices=2)
+    detector.commit_invoice("1", "a")
+    detector.commit_invoice("2", "b")
+    assert detector.invoice_unchanged("1", "a")
+    detector.commit_invoice("3", "c")
+
+    assert detector.invoice_unchanged("1", "a")
+    assert not detector.invoice_unchanged("2", "b")
+    assert detector.invoice_unchanged("3", "c")
+
+
+def test_staged_change_detector_records_invoices_on_apply():
+    """Test that staged invoices are seen by the view but only recorded once applied."""
+    detector = ChangeDetector()
+    detector.commit_invoice("1", "a")
+    staged = StagedChangeDetector(detector)
+
+    staged.commit_invoice("1", "b")
+    staged.commit_invoice("2", "c")
+    assert staged.invoice_unchanged("1", "b")
+    assert not staged.invoice_unchanged("1", "a")
+    assert detector.invoice_unchanged("1", "a")
+    assert not detector.invoice_unchanged("2", "c")
+
+    staged.apply()
+    assert detector.invoice_unchanged("1", "b")
+    assert detector.invoice_unchanged("2", "c")
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the checkpoint store."""
+
+from src.clients.blob_store import LocalBlobStore
+from src.services.checkpoint import CheckpointStore
+
+
+def test_checkpoint_store_in_memory():
+    """Test that checkpoints can be stored and removed without a blob store."""
+    checkpoints = CheckpointStore()
+    checkpoints.set("default", "2023-01-01T00:00:00Z")
+
+    assert checkpoints.get("default") == "2023-01-01T00:00:00Z"
+    checkpoints.delete("default")
+    assert checkpoints.get("default", "fallback") == "fallback"
+
+
+def test_checkpoint_store_survives_restart(tmp_path):
+    """Test that checkpoints written through a blob store are loaded by a new instance."""
+    CheckpointStore(LocalBlobStore(tmp_path)).set("default", "2023-01-02T00:00:00Z")
+
+    restarted = CheckpointStore(LocalBlobStore(tmp_path))
+
+    assert restarted.get("default") == "2023-01-02T00:00:00Z"
+    assert restarted.snapshot() == {"default": "2023-01-02T00:00:00Z"}
+
+
+def test_checkpoint_store_blobs_are_kept_apart(tmp_path):
+    """Test that blobs survive a restart without being written into the checkpoints."""
+    checkpoints = CheckpointStore(LocalBlobStore(tmp_path))
+    checkpoints.set("default", "2023-01-02T00:00:00Z")
+    checkpoints.put_blob("progress/default", b"\x00\x01")
+
+    restarted = CheckpointStore(LocalBlobStore(tmp_path))
+
+    assert restarted.get_blob("progress/default") == b"\x00\x01"
+    assert restarted.snapshot() == {"default": "2023-01-02T00:00:00Z"}
+    restarted.delete_blob("progress/default")
+    restarted.delete_blob("progress/default")
+    assert restarted.get_blob("progress/default") is None
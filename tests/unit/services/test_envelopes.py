@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for envelope batching."""
+
+import pytest
+
+from src.services.envelopes import EnvelopeBatcher
+
+
+def test_envelope_batcher_closes_at_max_items():
+    """Test that an envelope is handed out once it holds the maximum number of items."""
+    batcher = EnvelopeBatcher(max_items=3, max_bytes=1000)
+
+    assert batcher.add("trace", "a", 10) == []
+    assert batcher.add("trace", "b", 10) == []
+    assert batcher.add("trace", "c", 10) == [("trace", ["a", "b", "c"])]
+    assert list(batcher.drain()) == []
+
+
+def test_envelope_batcher_closes_before_exceeding_max_bytes():
+    """Test that an item that would overflow the envelope starts the next one, and an oversized item goes alone."""
+    batcher = EnvelopeBatcher(max_items=10, max_bytes=100)
+
+    batcher.add("trace", "a", 60)
+    assert batcher.add("trace", "b", 60) == [("trace", ["a"])]
+    assert batcher.add("trace", "big", 500) == [("trace", ["b"]), ("trace", ["big"])]
+    assert list(batcher.drain()) == []
+
+
+def test_envelope_batcher_groups_by_key_in_order():
+    """Test that items only share envelopes with items of the same key and keep their order."""
+    batcher = EnvelopeBatcher(max_items=2, max_bytes=1000)
+
+    batcher.add("v1", 1, 1)
+    batcher.add("v2", 2, 1)
+    assert batcher.add("v1", 3, 1) == [("v1", [1, 3])]
+    batcher.add("v1", 4, 1)
+
+    assert list(batcher.drain()) == [("v2", [2]), ("v1", [4])]
+
+
+def test_envelope_batcher_rejects_empty_limits():
+    """Test that limits below 1 are rejected."""
+    with pytest.raises(ValueError):
+        EnvelopeBatcher(max_items=0, max_bytes=100)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the cached metrics exposition."""
+
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry, Gauge
+
+from src.services.exposition import MetricsExposition, get_registry
+from src.services.shutdown import GracefulShutdown
+
+
+class FakeClock:
+    """A manually advanced monotonic clock."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_exposition_serves_cached_rendering_until_max_age():
+    """Test that scrapes within the max age share a rendering and refresh hooks run before each one."""
+    registry = CollectorRegistry()
+    gauge = Gauge("test_value", "A test gauge.", registry=registry)
+    clock = FakeClock()
+    exposition = MetricsExposition(registry, max_age_seconds=5, clock=clock)
+    refreshes = []
+    exposition.add_refresh_hook(lambda: refreshes.append(clock.now))
+
+    gauge.set(1)
+    first = await exposition.render()
+    gauge.set(2)
+    clock.now = 4
+    cached = await exposition.render()
+    clock.now = 5
+    refreshed = await exposition.render()
+
+    assert b"test_value 1.0" in first
+    assert cached == first
+    assert b"test_value 2.0" in refreshed
+    assert refreshes == [0, 5]
+
+
+@pytest.mark.asyncio
+async def test_exposition_keeps_gauges_fresh_until_shutdown():
+    """Test that refresh hooks run periodically without scrapes and stop on shutdown."""
+    exposition = MetricsExposition(CollectorRegistry())
+    shutdown = GracefulShutdown()
+    refreshes = []
+    exposition.add_refresh_hook(lambda: refreshes.append(None))
+
+    task = asyncio.create_task(exposition.keep_fresh(shutdown, interval=0.01))
+    await asyncio.sleep(0.05)
+    shutdown.request_stop()
+    await asyncio.wait_for(task, timeout=1)
+
+    assert len(refreshes) >= 2
+
+
+def test_get_registry_aggregates_workers_in_multiprocess_mode(monkeypatch, tmp_path):
+    """Test that multiprocess mode exposes a registry reading every worker's metric files."""
+    assert get_registry() is REGISTRY
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    assert get_registry() is not REGISTRY
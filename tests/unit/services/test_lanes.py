@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the live and background processing lanes."""
+
+from src.services.backlog import parse_timestamp
+from src.services.checkpoint import CheckpointStore
+from src.services.lanes import (
+    BACKGROUND_LANE,
+    LIVE_LANE,
+    finish_backfill,
+    hand_off_backfill,
+    lane_name,
+    split_lane_name,
+)
+
+NOW = parse_timestamp("2024-01-02T00:00:00Z")
+
+
+def test_lane_names_round_trip():
+    """Test that the live lane goes by the source's name and other lanes are suffixed."""
+    assert lane_name("us", LIVE_LANE) == "us"
+    assert lane_name("us", BACKGROUND_LANE) == "us:background"
+    assert split_lane_name("us:background") == ("us", BACKGROUND_LANE)
+    assert split_lane_name("us") == ("us", LIVE_LANE)
+    assert split_lane_name("us:east") == ("us:east", LIVE_LANE)
+
+
+def test_hand_off_backfill_moves_live_checkpoint_forward():
+    """Test that a live checkpoint too far behind is handed to the background lane."""
+    checkpoints = CheckpointStore()
+    checkpoints.set("us", "2024-01-01T00:00:00Z")
+
+    handed_off = hand_off_backfill(
+        checkpoints, "us", "2023-01-01T00:00:00Z", 600, now=NOW
+    )
+
+    assert handed_off == "2024-01-01T00:00:00Z"
+    assert checkpoints.snapshot() == {
+        "us": "2024-01-01T23:50:00Z",
+        "us:background": "2024-01-01T00:00:00Z",
+    }
+
+
+def test_hand_off_backfill_keeps_recent_checkpoint_and_older_backfill():
+    """Test that a recent live checkpoint stays, and a backfill in progress keeps its older start."""
+    checkpoints = CheckpointStore()
+    checkpoints.set("us", "2024-01-01T23:55:00Z")
+
+    assert (
+        hand_off_backfill(checkpoints, "us", "2023-01-01T00:00:00Z", 600, now=NOW)
+        is None
+    )
+    assert checkpoints.snapshot() == {"us": "2024-01-01T23:55:00Z"}
+
+    checkpoints.set("us", "2024-01-01T12:00:00Z")
+    checkpoints.set("us:background", "2024-01-01T00:00:00Z")
+    hand_off_backfill(checkpoints, "us", "2023-01-01T00:00:00Z", 600, now=NOW)
+
+    assert checkpoints.get("us:background") == "2024-01-01T00:00:00Z"
+    assert checkpoints.get("us") == "2024-01-01T23:50:00Z"
+
+
+def test_hand_off_backfill_without_checkpoint_starts_from_initial_timestamp():
+    """Test that a source that never ran backfills from its initial timestamp."""
+    checkpoints = CheckpointStore()
+
+    hand_off_backfill(checkpoints, "us", "2023-01-01T00:00:00Z", 600, now=NOW)
+
+    assert checkpoints.get("us:background") == "2023-01-01T00:00:00Z"
+
+
+def test_finish_backfill_only_once_caught_up_with_the_live_lane():
+    """Test that a backfill ends when its fetch reaches the live checkpoint, and continues from the fetch otherwise."""
+    checkpoints = CheckpointStore()
+    checkpoints.set("us", "2024-01-01T23:50:00Z")
+    checkpoints.set("us:background", "2024-01-01T00:00:00Z")
+
+    assert not finish_backfill(checkpoints, "us", "2024-01-01T12:00:00Z")
+    assert checkpoints.get("us:background") == "2024-01-01T12:00:00Z"
+
+    assert finish_backfill(checkpoints, "us", "2024-01-01T23:50:00Z")
+    assert checkpoints.snapshot() == {"us": "2024-01-01T23:50:00Z"}
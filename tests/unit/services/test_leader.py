@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the ingest leader lock."""
+
+from src.services.leader import LeaderLock
+
+
+def test_leader_lock_is_held_by_one_holder_at_a_time(tmp_path):
+    """Test that a second holder only gets the lock once the first releases it."""
+    path = tmp_path / "locks" / "ingest.lock"
+    first = LeaderLock(path)
+    second = LeaderLock(path)
+
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert first.try_acquire()
+
+    first.release()
+
+    assert second.try_acquire()
+    assert second.held and not first.held
+    second.release()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the memory budget."""
+
+import asyncio
+
+import pytest
+
+from src.services.memory_budget import ByteBudget, Reservation
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_acquire_waits_until_released():
+    """Test that an acquirer waits until enough bytes are released and reports that it waited."""
+    changes = []
+    budget = ByteBudget(100, on_change=changes.append)
+
+    assert await budget.acquire(60) is False
+    waiter = asyncio.create_task(budget.acquire(50))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    assert budget.waiting == 1
+
+    budget.release(60)
+
+    assert await asyncio.wait_for(waiter, timeout=1) is True
+    assert budget.in_use == 50
+    assert changes == [60, 0, 50]
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_serves_waiters_in_order():
+    """Test that a small request does not overtake a larger one that is already waiting."""
+    budget = ByteBudget(100)
+    await budget.acquire(90)
+    large = asyncio.create_task(budget.acquire(80))
+    await asyncio.sleep(0)
+    small = asyncio.create_task(budget.acquire(5))
+    await asyncio.sleep(0)
+
+    assert not small.done()
+
+    budget.release(90)
+    await asyncio.wait_for(large, timeout=1)
+    await asyncio.wait_for(small, timeout=1)
+    assert budget.in_use == 85
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_lets_an_oversized_request_through_alone():
+    """Test that a request larger than the limit is granted once nothing else is held."""
+    budget = ByteBudget(100)
+    await budget.acquire(10)
+    oversized = asyncio.create_task(budget.acquire(500))
+    await asyncio.sleep(0)
+    assert not oversized.done()
+
+    budget.release(10)
+
+    await asyncio.wait_for(oversized, timeout=1)
+    assert budget.in_use == 500
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_charge_never_waits_but_blocks_new_acquirers():
+    """Test that charges may exceed the limit and hold new runs back until released."""
+    budget = ByteBudget(100)
+    await budget.acquire(50)
+    budget.charge(100)
+    assert budget.in_use == 150
+
+    waiter = asyncio.create_task(budget.acquire(10))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    budget.release(100)
+    await asyncio.wait_for(waiter, timeout=1)
+    assert budget.in_use == 60
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_cancelled_waiter_does_not_hold_bytes():
+    """Test that a cancelled waiter leaves the queue and lets those behind it in."""
+    budget = ByteBudget(100)
+    await budget.acquire(90)
+    first = asyncio.create_task(budget.acquire(50))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(budget.acquire(10))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    await asyncio.wait_for(second, timeout=1)
+    assert budget.in_use == 100
+    assert budget.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_reservation_resizes_and_releases_on_close():
+    """Test that a reservation grows and shrinks its share and returns it all on close."""
+    budget = ByteBudget(100)
+    reservation = Reservation(budget)
+
+    await reservation.acquire(20)
+    reservation.resize(300)
+    assert budget.in_use == 300
+    reservation.resize(40)
+    assert budget.in_use == 40
+
+    reservation.close()
+    assert budget.in_use == 0
+    assert reservation.size == 0
+
+
+def test_byte_budget_remembers_expected_sizes():
+    """Test that the last recorded size of a key is used as its expected size."""
+    budget = ByteBudget(100)
+
+    assert budget.expected("us", 8) == 8
+    budget.record("us", 42)
+    assert budget.expected("us", 8) == 42
@@ -4,7 +4,7 @@ import re
 
 import pytest
 
-from src.services.parser import parse_invoices, XMLParsingError
+from src.services.parser import parse_invoice_slices, parse_invoices, XMLParsingError
 
 
 def _strip_whitespace(xml: str) -> str:
@@ -97,3 +97,80 @@ def test_parse_invoices_malformed_xml():
     """
     with pytest.raises(XMLParsingError):
         parse_invoices(xml)
+
+
+def _response(document: str) -> str:
+    """Wraps an inner document in a Bamboorose SOAP response."""
+    return f"""
+    <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+       <soapenv:Body>
+          <ns1:getCommercialInvoicesByAvailableTimestampResponse xmlns:ns1="http://services.bamboorose.com">
+             <ns1:return><![CDATA[<?xml version='1.0' encoding='UTF-8'?>{document}]]></ns1:return>
+          </ns1:getCommercialInvoicesByAvailableTimestampResponse>
+       </soapenv:Body>
+    </soapenv:Envelope>
+    """
+
+
+def test_parse_invoice_slices_returns_views_of_each_invoice():
+    """Test that parse_invoice_slices returns the exact bytes of each invoice without copying them."""
+    xml = _response(
+        "<document>"
+        "<!-- <invoice>ignored</invoice> -->"
+        '<invoice note="a>b"><invoice_id>123</invoice_id><vendor_id>V&amp;1</vendor_id><name>Café</name></invoice>'
+        "<invoice/>"
+        "</document>"
+    )
+    invoices = parse_invoice_slices(xml.encode("utf-8"))
+
+    assert len(invoices) == 2
+    assert isinstance(invoices[0], memoryview)
+    assert invoices[0].obj is invoices[1].obj
+    assert str(invoices[0], "utf-8") == (
+        '<invoice note="a>b"><invoice_id>123</invoice_id><vendor_id>V&amp;1</vendor_id><name>Café</name></invoice>'
+    )
+    assert bytes(invoices[1]) == b"<invoice/>"
+    assert invoices.metadata == [("123", "V&1"), (None, None)]
+
+
+def test_parse_invoice_slices_slicing_shares_the_buffer():
+    """Test that slicing the result returns slices over the same buffer."""
+    xml = _response(
+        "<document>"
+        "<invoice><invoice_id>1</invoice_id></invoice>"
+        "<invoice><invoice_id>2</invoice_id></invoice>"
+        "<invoice><invoice_id>3</invoice_id></invoice>"
+        "</document>"
+    )
+    invoices = parse_invoice_slices(xml)
+    chunk = invoices[1:]
+
+    assert len(chunk) == 2
+    assert chunk.buffer is invoices.buffer
+    assert bytes(chunk[0]) == b"<invoice><invoice_id>2</invoice_id></invoice>"
+    assert chunk.metadata == [("2", None), ("3", None)]
+
+
+def test_parse_invoice_slices_nested_invoice_elements():
+    """Test that only the outermost invoice elements are returned."""
+    xml = _response(
+        "<document>"
+        "<invoice><invoice_id>1</invoice_id><invoice>credit</invoice></invoice>"
+        "</document>"
+    )
+    invoices = parse_invoice_slices(xml)
+
+    assert len(invoices) == 1
+    assert bytes(invoices[0]) == b"<invoice><invoice_id>1</invoice_id><invoice>credit</invoice></invoice>"
+
+
+def test_parse_invoice_slices_no_invoices():
+    """Test that parse_invoice_slices handles a response with no invoices."""
+    assert len(parse_invoice_slices(_response("<document></document>"))) == 0
+
+
+def test_parse_invoice_slices_malformed_xml():
+    """Test that parse_invoice_slices raises an XMLParsingError for malformed XML."""
+    xml = _response("<document><invoice><invoiceId>123</invoiceId></invoice</document>")
+    with pytest.raises(XMLParsingError):
+        parse_invoice_slices(xml)
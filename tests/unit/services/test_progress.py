@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for mid-batch progress tracking."""
+
+import zlib
+
+from src.clients.blob_store import LocalBlobStore
+from src.services.change_detection import fingerprint
+from src.services.checkpoint import CHECKPOINTS_KEY, CheckpointStore
+from src.services.progress import (
+    BatchProgress,
+    StagedBatchProgress,
+    clear_batch_progress,
+    load_batch_progress,
+    progress_key,
+    save_batch_progress,
+)
+
+
+def test_batch_progress_tracks_invoices_by_fingerprint():
+    """Test that acknowledgements are keyed by invoice content, wherever the invoice appears."""
+    progress = BatchProgress("2023-01-01T00:00:00Z")
+    progress.acknowledge(fingerprint("<invoice>1</invoice>"))
+    progress.acknowledge(fingerprint("<invoice>2</invoice>"))
+    progress.acknowledge(fingerprint("<invoice>1</invoice>"))
+
+    assert progress.acknowledged == 2
+    assert progress.unsaved == 2
+
+    resumed = BatchProgress.from_bytes(progress.to_bytes())
+    assert resumed.was_acknowledged(fingerprint("<invoice>2</invoice>"))
+    assert not resumed.was_acknowledged(fingerprint("<invoice>2 changed</invoice>"))
+
+
+def test_batch_progress_only_earlier_attempts_count_as_acknowledged():
+    """Test that invoices acknowledged in this attempt, e.g. a repeated one, do not count as resumed."""
+    progress = BatchProgress("2023-01-01T00:00:00Z")
+    progress.acknowledge(fingerprint("<invoice>1</invoice>"))
+
+    assert not progress.was_acknowledged(fingerprint("<invoice>1</invoice>"))
+
+
+def test_staged_batch_progress_holds_acknowledgements_until_applied():
+    """Test that staged acknowledgements only reach the batch progress once applied."""
+    progress = BatchProgress(
+        "batch", [bytes.fromhex(fingerprint("<invoice>1</invoice>")[:16])]
+    )
+    staged = StagedBatchProgress(progress)
+    staged.acknowledge(fingerprint("<invoice>2</invoice>"))
+
+    assert staged.was_acknowledged(fingerprint("<invoice>1</invoice>"))
+    assert progress.acknowledged == 1
+
+    staged.apply()
+
+    assert progress.acknowledged == 2
+    assert progress.unsaved == 1
+
+
+def test_batch_progress_round_trip_is_compact():
+    """Test that progress serializes compactly and restores the same acknowledgements."""
+    progress = BatchProgress("batch")
+    for index in range(50_000):
+        progress.acknowledge(fingerprint(f"<invoice>{index}</invoice>"))
+
+    data = progress.to_bytes()
+    restored = BatchProgress.from_bytes(data)
+
+    assert len(data) < 50_000 * 7
+    assert restored.batch_id == "batch"
+    assert restored.acknowledged == 50_000
+    assert restored.was_acknowledged(fingerprint("<invoice>49999</invoice>"))
+    assert not restored.was_acknowledged(fingerprint("<invoice>50000</invoice>"))
+    assert restored.unsaved == 0
+
+
+def test_load_batch_progress_resumes_the_same_batch(tmp_path):
+    """Test that progress saved before a restart is resumed, from a blob apart from the checkpoints."""
+    checkpoints = CheckpointStore(LocalBlobStore(tmp_path))
+    progress = BatchProgress("2023-01-01T00:00:00Z")
+    progress.acknowledge(fingerprint("<invoice>1</invoice>"))
+    save_batch_progress(checkpoints, "us:background", progress)
+
+    restarted = CheckpointStore(LocalBlobStore(tmp_path))
+    resumed = load_batch_progress(restarted, "us:background", "2023-01-01T00:00:00Z")
+
+    assert resumed.was_acknowledged(fingerprint("<invoice>1</invoice>"))
+    assert not resumed.was_acknowledged(fingerprint("<invoice>2</invoice>"))
+    assert restarted.snapshot() == {}
+    assert not (tmp_path / CHECKPOINTS_KEY).exists()
+
+
+def test_load_batch_progress_ignores_other_batches():
+    """Test that progress recorded for a different window or a malformed record is ignored."""
+    checkpoints = CheckpointStore()
+    progress = BatchProgress("2023-01-01T00:00:00Z")
+    progress.acknowledge(fingerprint("<invoice>1</invoice>"))
+    save_batch_progress(checkpoints, "default", progress)
+
+    assert (
+        load_batch_progress(checkpoints, "default", "2023-01-02T00:00:00Z").acknowledged
+        == 0
+    )
+
+    for malformed in (b"x", b"x\nnot zlib", b"x\n" + zlib.compress(b"\x80")):
+        checkpoints.put_blob(progress_key("default"), malformed)
+        assert load_batch_progress(checkpoints, "default", "x").acknowledged == 0
+
+
+def test_clear_batch_progress(tmp_path):
+    """Test that completed batch progress is removed."""
+    checkpoints = CheckpointStore(LocalBlobStore(tmp_path))
+    save_batch_progress(checkpoints, "default", BatchProgress("batch"))
+
+    clear_batch_progress(checkpoints, "default")
+    clear_batch_progress(checkpoints, "default")
+
+    assert checkpoints.get_blob(progress_key("default")) is None
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the run logging helpers."""
+
+import pytest
+
+from src.services.run_logging import InvoiceLogSampler, RunSummary
+
+
+@pytest.mark.parametrize(
+    ("sample_rate", "expected"),
+    [
+        (1, [True, True, True, True, True]),
+        (2, [True, False, True, False, True]),
+        (0, [False, False, False, False, False]),
+    ],
+)
+def test_invoice_log_sampler(sample_rate: int, expected: list[bool]):
+    """Test that the sampler logs the first invoice and every Nth one after it."""
+    sampler = InvoiceLogSampler(sample_rate)
+
+    assert [sampler.should_log() for _ in range(5)] == expected
+
+
+def test_invoice_log_sampler_rejects_negative_rate():
+    """Test that a negative sample rate raises a ValueError."""
+    with pytest.raises(ValueError):
+        InvoiceLogSampler(-1)
+
+
+def test_run_summary_as_extra(mocker):
+    """Test that the run summary aggregates counts and stage timings."""
+    mocker.patch(
+        "src.services.run_logging.time.perf_counter", side_effect=[1.0, 1.5, 2.0, 2.25]
+    )
+    summary = RunSummary()
+    summary.count("invoices_published")
+    summary.count("invoices_published", 2)
+    with summary.timed("publish"):
+        pass
+    with summary.timed("publish"):
+        pass
+
+    assert summary.as_extra() == {"invoices_published": 3, "publish_seconds": 0.75}
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the run coordinator."""
+
+import asyncio
+
+import pytest
+
+from src.services.runs import FAILED, SUCCEEDED, RunCoordinator, RunRejectedError
+
+
+@pytest.mark.asyncio
+async def test_run_coordinator_coalesces_concurrent_runs():
+    """Test that a second request for a source with a run in flight joins that run."""
+    release = asyncio.Event()
+    calls = []
+
+    async def run(source):
+        calls.append(source)
+        await release.wait()
+        return {"invoices_published": 3}
+
+    coordinator = RunCoordinator(run)
+    first, first_created = coordinator.start("default", trigger="schedule")
+    second, second_created = coordinator.start("default", trigger="api")
+    other, _ = coordinator.start("eu", trigger="api")
+    await asyncio.sleep(0)
+
+    assert first is second
+    assert (first_created, second_created) == (True, False)
+    assert other is not first
+    assert sorted(calls) == ["default", "eu"]
+
+    release.set()
+    results = await asyncio.gather(coordinator.wait(first), coordinator.wait(second))
+
+    assert all(r.status == SUCCEEDED for r in results)
+    assert first.result == {"invoices_published": 3}
+    assert coordinator.start("default", trigger="api")[1] is True
+
+
+@pytest.mark.asyncio
+async def test_run_coordinator_records_failures():
+    """Test that a failed run is reported through its status instead of raising to waiters."""
+
+    async def run(source):
+        raise RuntimeError("Bamboorose unavailable")
+
+    coordinator = RunCoordinator(run)
+    run_, _ = coordinator.start("default", trigger="api")
+    await coordinator.wait(run_)
+
+    assert run_.status == FAILED
+    assert run_.error == "Bamboorose unavailable"
+    assert coordinator.get(run_.id) is run_
+    assert coordinator.in_flight() == []
+
+
+@pytest.mark.asyncio
+async def test_run_coordinator_cancelled_waiter_does_not_cancel_run():
+    """Test that a waiter giving up leaves the shared run running."""
+    release = asyncio.Event()
+
+    async def run(source):
+        await release.wait()
+        return {}
+
+    coordinator = RunCoordinator(run)
+    run_, _ = coordinator.start("default", trigger="api")
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(coordinator.wait(run_), timeout=0.01)
+
+    release.set()
+    await coordinator.wait(run_)
+    assert run_.status == SUCCEEDED
+
+
+@pytest.mark.asyncio
+async def test_run_coordinator_rejects_runs_after_stop():
+    """Test that no new run starts once the coordinator stops accepting them."""
+
+    async def run(source):
+        return {}
+
+    coordinator = RunCoordinator(run, history_size=1)
+    for _ in range(3):
+        await coordinator.wait(coordinator.start("default", trigger="api")[0])
+    coordinator.stop_accepting()
+
+    assert len(coordinator.recent()) == 1
+    with pytest.raises(RunRejectedError):
+        coordinator.start("default", trigger="api")
+
+
+@pytest.mark.asyncio
+async def test_run_coordinator_accepts_runs_again():
+    """Test that runs rejected for a reason are accepted again once the reason clears."""
+
+    async def run(source):
+        return {}
+
+    coordinator = RunCoordinator(run)
+    coordinator.stop_accepting("not the leader")
+
+    with pytest.raises(RunRejectedError, match="not the leader"):
+        coordinator.start("default", trigger="api")
+
+    coordinator.start_accepting()
+    run_, created = coordinator.start("default", trigger="api")
+    await coordinator.wait(run_)
+
+    assert created
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for runtime tuning of settings."""
+
+import json
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.runtime_config import RuntimeConfig, RuntimeConfigWatcher
+from src.settings.config import BambooroseSettings, ServiceSettings
+
+
+@pytest.fixture
+def settings() -> SimpleNamespace:
+    """Returns settings groups built without the environment's values."""
+    return SimpleNamespace(
+        app=ServiceSettings(publish_chunk_size=100, scheduler_slots=1),
+        bamboorose=BambooroseSettings(
+            api_url="https://test.com", api_username="user", api_password="password"
+        ),
+    )
+
+
+def test_runtime_config_applies_overrides_and_notifies_listeners(settings, caplog):
+    """Test that overrides update the settings, call listeners and revert when removed."""
+    runtime_config = RuntimeConfig(settings)
+    slots = []
+    runtime_config.on_change("app.scheduler_slots", slots.append)
+
+    with caplog.at_level(logging.INFO):
+        changes = runtime_config.apply(
+            {"app": {"scheduler_slots": 4, "publish_chunk_size": 100}}
+        )
+
+    assert changes == {"app.scheduler_slots": (1, 4)}
+    assert caplog.messages == ["Runtime setting changed."]
+    assert settings.app.scheduler_slots == 4
+    assert slots == [4]
+
+    runtime_config.apply({})
+
+    assert settings.app.scheduler_slots == 1
+    assert slots == [4, 1]
+
+
+def test_runtime_config_rejects_invalid_overrides_atomically(settings):
+    """Test that an invalid value or a startup-only setting changes nothing."""
+    runtime_config = RuntimeConfig(settings)
+
+    with pytest.raises(ValueError):
+        runtime_config.apply({"app": {"publish_chunk_size": 500, "scheduler_slots": 0}})
+    with pytest.raises(ValueError):
+        runtime_config.apply({"app": {"checkpoint_location": "/tmp"}})
+
+    assert settings.app.publish_chunk_size == 100
+    assert settings.app.scheduler_slots == 1
+
+
+@pytest.mark.asyncio
+async def test_runtime_config_watcher_applies_file_changes(settings, tmp_path):
+    """Test that the watcher applies a changed file and ignores an invalid one."""
+    path = tmp_path / "runtime.json"
+    watcher = RuntimeConfigWatcher(RuntimeConfig(settings), path)
+
+    assert not await watcher.check()
+
+    path.write_text(json.dumps({"bamboorose": {"api_timeout": 15}}))
+    assert await watcher.check()
+    assert settings.bamboorose.api_timeout == 15
+    assert not await watcher.check()
+
+    path.write_text("{not json")
+    assert await watcher.check()
+    assert settings.bamboorose.api_timeout == 15
+
+    path.unlink()
+    assert await watcher.check()
+    assert settings.bamboorose.api_timeout == 60
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the fair scheduler."""
+
+import asyncio
+
+import pytest
+
+from src.services.lanes import BACKGROUND_LANE, LIVE_LANE
+from src.services.scheduling import FairScheduler
+
+
+@pytest.mark.asyncio
+async def test_scheduler_alternates_between_sources():
+    """Test that a backlogged source cannot starve another source."""
+    scheduler = FairScheduler(slots=1)
+    order: list[str] = []
+
+    async def work(source: str, chunks: int):
+        for _ in range(chunks):
+            async with scheduler.turn(source):
+                order.append(source)
+                await asyncio.sleep(0)
+
+    await asyncio.gather(work("backfill", 6), work("live", 2))
+
+    assert order[:4] == ["backfill", "live", "backfill", "live"]
+    assert order.count("backfill") == 6
+    assert scheduler.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_concurrency():
+    """Test that no more than the configured number of slots are held at once."""
+    scheduler = FairScheduler(slots=2)
+    running = 0
+    peak = 0
+
+    async def work(source: str):
+        nonlocal running, peak
+        async with scheduler.turn(source):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(work(f"source-{i % 3}") for i in range(9)))
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancelled_waiter_does_not_leak_slot():
+    """Test that cancelling a waiting task leaves the slot available to others."""
+    scheduler = FairScheduler(slots=1)
+    await scheduler.acquire("a")
+    waiter = asyncio.create_task(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    scheduler.release()
+    await asyncio.wait_for(scheduler.acquire("c"), timeout=1)
+    assert scheduler.in_use == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_resize_grants_new_slots_to_waiters():
+    """Test that growing the scheduler lets a waiting source in right away."""
+    scheduler = FairScheduler(slots=1)
+    await scheduler.acquire("a")
+    waiter = asyncio.create_task(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+
+    scheduler.resize(2)
+
+    await asyncio.wait_for(waiter, timeout=1)
+    assert scheduler.in_use == 2
+
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_live_lane_first():
+    """Test that a freed slot goes to a live waiter even if a background waiter queued first."""
+    scheduler = FairScheduler(slots=1)
+    await scheduler.acquire("us", BACKGROUND_LANE)
+    background = asyncio.create_task(scheduler.acquire("us", BACKGROUND_LANE))
+    await asyncio.sleep(0)
+    live = asyncio.create_task(scheduler.acquire("us", LIVE_LANE))
+    await asyncio.sleep(0)
+
+    scheduler.release(BACKGROUND_LANE)
+    await asyncio.wait_for(live, timeout=1)
+    assert not background.done()
+
+    scheduler.release(LIVE_LANE)
+    await asyncio.wait_for(background, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_background_lane_to_its_share():
+    """Test that the background lane leaves the slots beyond its share to the live lane."""
+    scheduler = FairScheduler(slots=4, lane_shares={BACKGROUND_LANE: 0.5})
+    await scheduler.acquire("us", BACKGROUND_LANE)
+    await scheduler.acquire("eu", BACKGROUND_LANE)
+    background = asyncio.create_task(scheduler.acquire("us", BACKGROUND_LANE))
+    await asyncio.sleep(0)
+    assert not background.done()
+    assert scheduler.lane_slots(BACKGROUND_LANE) == 2
+
+    await asyncio.wait_for(scheduler.acquire("us", LIVE_LANE), timeout=1)
+    await asyncio.wait_for(scheduler.acquire("eu", LIVE_LANE), timeout=1)
+    assert scheduler.in_use == 4
+
+    scheduler.release(BACKGROUND_LANE)
+    await asyncio.wait_for(background, timeout=1)
+
+
+def test_scheduler_rejects_invalid_lane_share():
+    """Test that lane shares must name a lane and lie in (0, 1]."""
+    with pytest.raises(ValueError):
+        FairScheduler(slots=2, lane_shares={BACKGROUND_LANE: 0})
+    with pytest.raises(ValueError):
+        FairScheduler(slots=2, lane_shares={"batch": 0.5})
+
+
+def test_scheduler_rejects_zero_slots():
+    """Test that at least one slot is required."""
+    with pytest.raises(ValueError):
+        FairScheduler(slots=0)
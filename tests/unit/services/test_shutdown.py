@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for the graceful shutdown coordinator."""
+
+import asyncio
+
+import pytest
+
+from src.services.shutdown import GracefulShutdown
+
+
+@pytest.mark.asyncio
+async def test_graceful_shutdown_sleep_returns_early_on_stop():
+    """Test that a stop request wakes up a sleeping processing loop."""
+    shutdown = GracefulShutdown()
+    sleeper = asyncio.create_task(shutdown.sleep(60))
+    await asyncio.sleep(0)
+
+    shutdown.request_stop()
+
+    await asyncio.wait_for(sleeper, timeout=1)
+    assert shutdown.stopping
+
+
+@pytest.mark.asyncio
+async def test_graceful_shutdown_sleep_times_out():
+    """Test that sleep returns after the timeout when no stop is requested."""
+    shutdown = GracefulShutdown()
+
+    await shutdown.sleep(0.01)
+
+    assert not shutdown.stopping
+    assert shutdown.drained == shutdown.abandoned == 0
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for run span tracing."""
+
+import asyncio
+import json
+
+import pytest
+
+from src.services.tracing import TraceBuffer, chrome_trace, record_run, span
+
+
+def _parse() -> None:
+    with span("parse"):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_record_run_collects_spans_from_the_run():
+    """Test that spans inside a recorded run, including from threads, land on its trace."""
+    buffer = TraceBuffer(capacity=5)
+
+    with record_run(buffer, "trace-1", "us"):
+        with span("fetch", available_timestamp="t") as args:
+            args["status_code"] = 200
+        await asyncio.to_thread(_parse)
+        with pytest.raises(RuntimeError), span("publish_chunk", offset=0):
+            raise RuntimeError
+
+    trace = buffer.get("trace-1")
+    spans = {event["name"]: event for event in trace.events}
+    assert set(spans) == {"fetch", "parse", "publish_chunk", "run"}
+    assert spans["fetch"]["args"] == {"available_timestamp": "t", "status_code": 200}
+    assert spans["publish_chunk"]["args"]["error"] == "RuntimeError"
+    assert spans["run"]["ts"] <= spans["fetch"]["ts"]
+    assert all(
+        event["ph"] == "X" and event["tid"] == trace.lane for event in trace.events
+    )
+
+
+def test_span_without_a_run_records_nothing():
+    """Test that spans outside a recorded run are no-ops."""
+    buffer = TraceBuffer(capacity=5)
+
+    with span("fetch") as args:
+        args["status_code"] = 200
+    with record_run(None, "trace-1", "us") as trace:
+        with span("fetch"):
+            pass
+
+    assert trace is None
+    assert buffer.recent() == []
+
+
+@pytest.mark.asyncio
+async def test_trace_buffer_keeps_recent_runs_on_separate_lanes(tmp_path):
+    """Test that the buffer drops the oldest runs and writes each run's Chrome trace file."""
+    buffer = TraceBuffer(capacity=2, directory=tmp_path)
+
+    for index in range(3):
+        with record_run(buffer, f"trace-{index}", "us"):
+            with span("fetch"):
+                pass
+    await asyncio.sleep(0.1)
+
+    recent = buffer.recent()
+    assert [trace.trace_id for trace in recent] == ["trace-1", "trace-2"]
+    assert recent[0].lane != recent[1].lane
+
+    document = chrome_trace(recent)
+    assert document["otherData"]["trace_ids"] == ["trace-1", "trace-2"]
+    assert [event["ph"] for event in document["traceEvents"]].count("M") == 2
+
+    written = json.loads((tmp_path / "trace-0.json").read_text())
+    assert {event["name"] for event in written["traceEvents"]} == {
+        "thread_name",
+        "fetch",
+        "run",
+    }
@@ -1,38 +1,209 @@
 # -*- coding: utf-8 -*-
 """Unit tests for the main application logic."""
 import asyncio
+import json
 import logging
 import sys
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi import FastAPI
 
+from scripts.fake_kafka import BrokerModel, FakeProducer
+from src.clients.blob_store import LocalBlobStore
+from src.services.archive import ResponseArchive
+from src.services.backlog import BacklogTracker
+from src.services.change_detection import ChangeDetector, fingerprint
+from src.services.checkpoint import CheckpointStore
+from src.services.envelopes import EnvelopeBatcher
+from src.services.lanes import BACKGROUND_LANE
+from src.services.memory_budget import ByteBudget
+from src.services.progress import BatchProgress
+from src.services.runs import RunCoordinator, RunRejectedError
+from src.services.scheduling import FairScheduler
+from src.services.shutdown import GracefulShutdown
+from src.services.sources import IngestionSource, SourceRegistry
+from src.settings.config import ServiceSettings, get_settings
+
 # Mock the urbn_confluent_methods library to avoid the FileNotFoundError
-sys.modules["urbn_confluent_methods"] = MagicMock()
+class KafkaProducerError(Exception):
+    pass
+
+urbn_confluent_methods = MagicMock()
+urbn_confluent_methods.KafkaProducerError = KafkaProducerError
+sys.modules["urbn_confluent_methods"] = urbn_confluent_methods
+
+from src.app import (
+    create_app,
+    drain,
+    lifespan,
+    process_invoices,
+    publish_invoices,
+    replay_invoices,
+    run_source,
+)
+from src.clients.kafka import KafkaProducerClient
+
+INSTANT_BROKER = BrokerModel(
+    round_trip_ms=0, replication_ms=0, bandwidth_bytes_per_second=1e12
+)
+
+
+def soap_body(*invoice_ids: str) -> bytes:
+    """Returns a Bamboorose response body holding an invoice for each id."""
+    invoices = "".join(
+        f"<invoice><invoice_id>{invoice_id}</invoice_id></invoice>" for invoice_id in invoice_ids
+    )
+    return f"<e><return><![CDATA[<document>{invoices}</document>]]></return></e>".encode()
+
+
+class FakeBambooroseClient:
+    """A Bamboorose client returning a fixed response body and recording the windows fetched."""
+
+    def __init__(self, name: str, body: bytes) -> None:
+        self.name = name
+        self.body = body
+        self.windows: list[str] = []
+
+    async def get_invoices(self, available_timestamp: str) -> SimpleNamespace:
+        self.windows.append(available_timestamp)
+        await asyncio.sleep(0)
+        return SimpleNamespace(content=self.body, text=self.body.decode())
+
+
+class RecordingKafkaClient:
+    """A non-transactional Kafka client recording what it publishes and failing the invoice ids in ``failing``."""
+
+    transactional = False
+
+    def __init__(self) -> None:
+        self.published: list[str] = []
+        self.envelopes: list[list[str]] = []
+        self.failing: set[str] = set()
+        # Publishing these invoice ids waits until their event is set.
+        self.stalled: dict[str, asyncio.Event] = {}
+        self.waiting: set[str] = set()
+
+    async def publish_invoice(self, invoice, trace_id: str, topic: str | None = None) -> None:
+        invoice = invoice if isinstance(invoice, str) else str(invoice, "utf-8")
+        await asyncio.sleep(0)
+        for invoice_id, release in self.stalled.items():
+            if f"<invoice_id>{invoice_id}</invoice_id>" in invoice:
+                self.waiting.add(invoice_id)
+                await release.wait()
+        if any(f"<invoice_id>{invoice_id}</invoice_id>" in invoice for invoice_id in self.failing):
+            raise KafkaProducerError("Broker unavailable")
+        self.published.append(invoice)
+
+    async def publish_envelope(self, invoices, invoice_ids, trace_id: str, topic: str | None = None) -> None:
+        await asyncio.sleep(0)
+        if self.failing.intersection(invoice_ids):
+            raise KafkaProducerError("Broker unavailable")
+        self.envelopes.append(list(invoice_ids))
+
+
+async def wait_until(condition) -> None:
+    """Lets other tasks run until ``condition()`` holds."""
+    for _ in range(1000):
+        if condition():
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError("Condition not reached")
+
+
+def invoice(invoice_id: str) -> str:
+    """Returns the invoice with ``invoice_id`` as ``soap_body`` serializes it."""
+    return f"<invoice><invoice_id>{invoice_id}</invoice_id></invoice>"
+
 
-from src.app import create_app, lifespan, process_invoices
-from src.main import main
+@pytest.fixture
+def producers() -> Iterator[dict[str, FakeProducer]]:
+    """Returns the fake transactional producers created by ``transactional_client``, by name, and closes them."""
+    producers: dict[str, FakeProducer] = {}
+    yield producers
+    for producer in producers.values():
+        producer.close()
+
+
+@pytest.fixture
+def transactional_client(mocker, producers: dict[str, FakeProducer]) -> KafkaProducerClient:
+    """Returns a transactional Kafka producer client backed by fake producers."""
+    mocker.patch(
+        "src.clients.kafka.get_settings",
+        return_value=mocker.Mock(kafka=mocker.Mock(producer_topic="test-topic")),
+    )
+
+    def factory(name: str) -> FakeProducer:
+        producers[name] = FakeProducer({"transactional.id": f"ingestor-{name}"}, INSTANT_BROKER)
+        return producers[name]
+
+    return KafkaProducerClient(transactional_producer_factory=factory)
+
+
+@pytest.fixture
+def ingest_app(mocker, transactional_client: KafkaProducerClient) -> FastAPI:
+    """Returns an app whose state runs the ``us`` source in live and background lanes."""
+    mocker.patch(
+        "src.app.get_settings",
+        return_value=SimpleNamespace(app=ServiceSettings(live_lane_lookback_seconds=3600)),
+    )
+    app = FastAPI()
+    app.state.sources = SourceRegistry()
+    app.state.sources.register(
+        IngestionSource(
+            "us",
+            FakeBambooroseClient("us", soap_body("1", "2")),
+            "test-topic",
+            300,
+            "2023-01-01T00:00:00Z",
+        )
+    )
+    app.state.checkpoints = CheckpointStore()
+    app.state.scheduler = FairScheduler(2, lane_shares={BACKGROUND_LANE: 0.5})
+    app.state.kafka_producer_client = transactional_client
+    app.state.response_archive = None
+    app.state.memory_budget = None
+    app.state.traces = None
+    app.state.backlog = BacklogTracker()
+    app.state.shutdown = GracefulShutdown()
+    app.state.runs = RunCoordinator(lambda name: run_source(app, name))
+    return app
+
+
+def published_invoices(producer: FakeProducer) -> list[str]:
+    """Returns the invoices a producer's committed messages carry, in order."""
+    return [json.loads(message.value())["invoice"] for message in producer.messages()]
+
+
+def fail_invoice(mocker, producer: FakeProducer, invoice_id: str):
+    """Makes producing the invoice with ``invoice_id`` fail, until the returned mock is stopped."""
+    produce = producer.produce
+
+    def flaky_produce(topic, value=None, **kwargs):
+        if f"<invoice_id>{invoice_id}</invoice_id>".encode() in value:
+            raise KafkaProducerError("Broker unavailable")
+        return produce(topic, value=value, **kwargs)
+
+    return mocker.patch.object(producer, "produce", side_effect=flaky_produce)
 
 
 @pytest.mark.asyncio
 async def test_process_invoices(mocker):
-    """
-    Test that the process_invoices function orchestrates the correct sequence of calls.
-    
-    This test mocks the functions that will be implemented in later steps and
-    verifies that they are called in the correct order.
-    """
-    # These mocks will be replaced with actual implementations in later steps.
+    """Test that the process_invoices function fetches, parses and publishes the invoices in turn."""
     logger_mock = mocker.patch("src.app.logger")
     trace_context_mock = mocker.patch("src.app.trace_context")
     bamboorose_client_mock = MagicMock()
-    bamboorose_client_mock.get_invoices = AsyncMock(return_value=MagicMock(text="<xml/>"))
-    mocker.patch("src.app.get_bamboorose_client", return_value=bamboorose_client_mock)
-    
-    kafka_producer_client_mock = MagicMock()
-    mocker.patch("src.app.get_kafka_producer_client", return_value=kafka_producer_client_mock)
-    
+    bamboorose_client_mock.name = "default"
+    bamboorose_client_mock.get_invoices = AsyncMock(
+        return_value=MagicMock(text="<xml/>", content=b"<xml/>")
+    )
+
+    kafka_producer_client_mock = MagicMock(transactional=False)
+    kafka_producer_client_mock.publish_invoice = AsyncMock()
+
     parse_invoices_mock = mocker.patch("src.app.parse_invoices", return_value=["<invoice>1</invoice>", "<invoice>2</invoice>"])
     
     invoices_fetched_total_mock = mocker.patch("src.app.invoices_fetched_total")
@@ -41,7 +212,7 @@ async def test_process_invoices(mocker):
     bamboorose_api_request_duration_seconds_mock = mocker.patch("src.app.bamboorose_api_request_duration_seconds")
     kafka_produce_failures_total_mock = mocker.patch("src.app.kafka_produce_failures_total")
     
-    await process_invoices()
+    await process_invoices(bamboorose_client_mock, kafka_producer_client_mock)
     
     trace_context_mock.assert_called_once()
     assert isinstance(trace_context_mock.call_args[0][0], str)
@@ -61,10 +232,14 @@ async def test_process_invoices(mocker):
     kafka_produce_failures_total_mock.inc.assert_not_called()
     
     assert mocker.call("Starting invoice processing run.") in logger_mock.info.call_args_list
-    assert mocker.call(
-        "Invoice processing run finished.",
-        extra={"invoices_published": 2},
-    ) in logger_mock.info.call_args_list
+    finished_call = next(
+        call
+        for call in logger_mock.info.call_args_list
+        if call.args == ("Invoice processing run finished.",)
+    )
+    assert finished_call.kwargs["extra"]["invoices_published"] == 2
+    assert finished_call.kwargs["extra"]["invoices_fetched"] == 2
+    assert "publish_seconds" in finished_call.kwargs["extra"]
 
 
 def test_create_app(mocker):
@@ -80,27 +255,473 @@ def test_create_app(mocker):
 
 
 @pytest.mark.asyncio
-async def test_lifespan(mocker):
+async def test_lifespan(mocker, monkeypatch):
     """Test that the lifespan context manager logs startup and shutdown messages."""
+    for name, value in {
+        "BAMBOOROSE_API_URL": "https://test.com",
+        "BAMBOOROSE_API_USERNAME": "test_user",
+        "BAMBOOROSE_API_PASSWORD": "test_password",
+        "X35_KAFKA_BOOTSTRAP_SERVERS": "kafka:9092",
+        "X35_KAFKA_API_KEY": "kafka_key",
+        "X35_KAFKA_API_SECRET": "kafka_secret",
+    }.items():
+        monkeypatch.setenv(name, value)
+    get_settings.cache_clear()
     logger_mock = mocker.patch("src.app.logger")
     get_kafka_producer_client_mock = mocker.patch("src.app.get_kafka_producer_client")
+    mocker.patch("src.app.leader_processing_loop", new_callable=AsyncMock)
     app = FastAPI()
-    
-    async with lifespan(app):
-        pass
-    
-    assert mocker.call("Application startup.") in logger_mock.info.call_args_list
-    assert mocker.call("Application shutdown.") in logger_mock.info.call_args_list
+
+    try:
+        async with lifespan(app):
+            pass
+    finally:
+        get_settings.cache_clear()
+
+    assert mocker.call("Application startup: initializing clients.") in logger_mock.info.call_args_list
+    assert mocker.call("Shutdown complete.") in logger_mock.info.call_args_list
     get_kafka_producer_client_mock.assert_called_once()
+    app.state.kafka_producer_client.flush.assert_called_once()
 
 
-@pytest.mark.asyncio
-async def test_main(mocker):
-    """Test that the main function creates the app and calls process_invoices."""
-    create_app_mock = mocker.patch("src.main.create_app")
-    process_invoices_mock = mocker.patch("src.main.process_invoices", new_callable=AsyncMock)
-    
-    await main()
-    
+def test_main_creates_app_on_first_access(mocker):
+    """Test that the entrypoint module creates the app when ``app`` is first accessed."""
+    import src.main
+
+    create_app_mock = mocker.patch("src.app.create_app")
+    mocker.patch.dict(src.main.__dict__)
+    src.main.__dict__.pop("app", None)
+
+    assert src.main.app is create_app_mock.return_value
+    assert src.main.app is create_app_mock.return_value
     create_app_mock.assert_called_once()
-    process_invoices_mock.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_transactional_commits_before_checkpoint(
+    transactional_client: KafkaProducerClient, producers: dict[str, FakeProducer], mocker
+):
+    """Test that a transactional run only advances its checkpoint once its transaction is committed."""
+    checkpoints = CheckpointStore()
+    committed_at_checkpoint = []
+    set_checkpoint = checkpoints.set
+
+    def record_checkpoint(name, value):
+        committed_at_checkpoint.append(len(producers["us"].messages()))
+        set_checkpoint(name, value)
+
+    mocker.patch.object(checkpoints, "set", side_effect=record_checkpoint)
+
+    summary = await process_invoices(
+        FakeBambooroseClient("us", soap_body("1", "2", "3")),
+        transactional_client,
+        checkpoints=checkpoints,
+        publish_chunk_size=2,
+    )
+
+    assert summary.as_extra()["invoices_published"] == 3
+    assert committed_at_checkpoint == [3]
+    assert checkpoints.get("us") is not None
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_transactional_incomplete_window_aborts(
+    transactional_client: KafkaProducerClient, producers: dict[str, FakeProducer], mocker
+):
+    """Test that a window with a failed invoice is aborted, keeps its checkpoint and is retried in full."""
+    checkpoints = CheckpointStore()
+    bamboorose_client = FakeBambooroseClient("us", soap_body("1", "2", "3"))
+    await transactional_client.for_transactions("us")
+    failure = fail_invoice(mocker, producers["us"], "2")
+
+    summary = await process_invoices(bamboorose_client, transactional_client, checkpoints=checkpoints)
+
+    assert summary.as_extra()["invoices_failed"] == 1
+    assert checkpoints.get("us") is None
+    assert producers["us"].messages() == []
+    assert len(producers["us"].messages("read_uncommitted")) == 2
+
+    mocker.stop(failure)
+    await process_invoices(bamboorose_client, transactional_client, checkpoints=checkpoints)
+
+    assert bamboorose_client.windows == ["2023-01-01T00:00:00Z"] * 2
+    assert published_invoices(producers["us"]) == [
+        f"<invoice><invoice_id>{invoice_id}</invoice_id></invoice>" for invoice_id in "123"
+    ]
+    assert checkpoints.get("us") is not None
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_transactional_commits_each_chunk(
+    transactional_client: KafkaProducerClient, producers: dict[str, FakeProducer], mocker
+):
+    """Test that each chunk is committed on its own and a retry only republishes the aborted chunk."""
+    checkpoints = CheckpointStore()
+    bamboorose_client = FakeBambooroseClient("us", soap_body("1", "2", "3", "4"))
+    await transactional_client.for_transactions("us")
+    failure = fail_invoice(mocker, producers["us"], "3")
+
+    summary = await process_invoices(
+        bamboorose_client, transactional_client, checkpoints=checkpoints, publish_chunk_size=2
+    )
+
+    assert summary.as_extra()["invoices_failed"] == 1
+    assert checkpoints.get("us") is None
+    assert published_invoices(producers["us"]) == [invoice("1"), invoice("2")]
+    assert checkpoints.get_blob("progress/us") is not None
+
+    mocker.stop(failure)
+    summary = await process_invoices(
+        bamboorose_client, transactional_client, checkpoints=checkpoints, publish_chunk_size=2
+    )
+
+    assert summary.as_extra()["invoices_resumed"] == 2
+    assert published_invoices(producers["us"]) == [invoice(invoice_id) for invoice_id in "1234"]
+    assert checkpoints.get("us") is not None
+    assert checkpoints.get_blob("progress/us") is None
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_transactional_concurrent_sources(
+    transactional_client: KafkaProducerClient, producers: dict[str, FakeProducer]
+):
+    """Test that sources sharing a transactional client and checkpoints can run at the same time."""
+    checkpoints = CheckpointStore()
+
+    await asyncio.gather(
+        *(
+            process_invoices(
+                FakeBambooroseClient(name, soap_body(f"{name}-1", f"{name}-2")),
+                transactional_client,
+                checkpoints=checkpoints,
+                publish_chunk_size=1,
+            )
+            for name in ("us", "eu")
+        )
+    )
+
+    assert set(checkpoints.snapshot()) == {"us", "eu"}
+    assert producers["us"].transactional_id == "ingestor-us"
+    assert len(published_invoices(producers["us"])) == 2
+    assert len(published_invoices(producers["eu"])) == 2
+
+
+@pytest.mark.asyncio
+async def test_replay_invoices_transactional(
+    tmp_path, transactional_client: KafkaProducerClient, producers: dict[str, FakeProducer], mocker
+):
+    """Test that a transactional replay commits each response on its own and aborts incomplete ones."""
+    archive = ResponseArchive(LocalBlobStore(str(tmp_path)))
+    archive.archive("2024-01-01T00:00:00Z", soap_body("1", "2"))
+    archive.archive("2024-01-02T00:00:00Z", soap_body("3", "4"))
+    await transactional_client.for_transactions("replay")
+    fail_invoice(mocker, producers["replay"], "4")
+
+    replayed = await replay_invoices(
+        archive, transactional_client, "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z"
+    )
+
+    assert replayed == 2
+    assert published_invoices(producers["replay"]) == [
+        "<invoice><invoice_id>1</invoice_id></invoice>",
+        "<invoice><invoice_id>2</invoice_id></invoice>",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_run_source_hands_off_backfill(ingest_app: FastAPI, producers: dict[str, FakeProducer]):
+    """Test that a live run far behind hands its window to a background run and both publish."""
+    checkpoints = ingest_app.state.checkpoints
+    bamboorose_client = ingest_app.state.sources.get("us").bamboorose_client
+
+    run, _ = ingest_app.state.runs.start("us", trigger="api")
+    await ingest_app.state.runs.wait(run)
+    (background,) = [past for past in ingest_app.state.runs.recent() if past.source == "us:background"]
+    await ingest_app.state.runs.wait(background)
+
+    assert run.status == background.status == "succeeded"
+    assert background.trigger == "handoff"
+    # The background lane drains from the old checkpoint, the live lane from an hour ago.
+    assert sorted(bamboorose_client.windows)[0] == "2023-01-01T00:00:00Z"
+    assert len(bamboorose_client.windows) == 2
+    assert checkpoints.get("us:background") is None
+    assert checkpoints.get("us") > "2023-01-01T00:00:00Z"
+    assert len(published_invoices(producers["us"])) == 2
+    assert len(published_invoices(producers["us:background"])) == 2
+
+
+@pytest.mark.asyncio
+async def test_run_source_background_lane_checkpoint(ingest_app: FastAPI):
+    """Test that a background run processes from the lane's own checkpoint, or does nothing without one."""
+    checkpoints = ingest_app.state.checkpoints
+    bamboorose_client = ingest_app.state.sources.get("us").bamboorose_client
+
+    assert await run_source(ingest_app, "us:background") == {}
+    assert bamboorose_client.windows == []
+
+    checkpoints.set("us:background", "2024-01-01T00:00:00Z")
+    checkpoints.set("us", "2024-06-01T00:00:00Z")
+    summary = await run_source(ingest_app, "us:background")
+
+    assert summary["invoices_published"] == 2
+    assert bamboorose_client.windows == ["2024-01-01T00:00:00Z"]
+    assert checkpoints.snapshot() == {"us": "2024-06-01T00:00:00Z"}
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_resumes_partly_failed_window():
+    """Test that a retried window only publishes what was not acknowledged, even when the response changed."""
+    checkpoints = CheckpointStore()
+    kafka_producer_client = RecordingKafkaClient()
+    kafka_producer_client.failing = {"2"}
+
+    summary = await process_invoices(
+        FakeBambooroseClient("us", soap_body("1", "2", "3")),
+        kafka_producer_client,
+        checkpoints=checkpoints,
+        publish_chunk_size=2,
+    )
+
+    assert summary.as_extra()["invoices_failed"] == 1
+    assert checkpoints.get("us") is None
+    assert kafka_producer_client.published == [invoice("1"), invoice("3")]
+
+    # The retry's response has gained an invoice, ahead of the ones already published.
+    kafka_producer_client.failing = set()
+    summary = await process_invoices(
+        FakeBambooroseClient("us", soap_body("0", "1", "2", "3")),
+        kafka_producer_client,
+        checkpoints=checkpoints,
+        publish_chunk_size=2,
+    )
+
+    assert summary.as_extra()["invoices_resumed"] == 2
+    assert kafka_producer_client.published == [invoice("1"), invoice("3"), invoice("0"), invoice("2")]
+    assert checkpoints.get("us") is not None
+    assert checkpoints.get_blob("progress/us") is None
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_publishes_repeated_invoices_on_a_first_attempt():
+    """Test that an invoice repeated within one response is not counted as resumed."""
+    kafka_producer_client = RecordingKafkaClient()
+
+    summary = await process_invoices(
+        FakeBambooroseClient("us", soap_body("1", "1", "2")),
+        kafka_producer_client,
+        checkpoints=CheckpointStore(),
+        publish_chunk_size=2,
+    )
+
+    assert summary.as_extra()["invoices_resumed"] == 0
+    assert kafka_producer_client.published == [invoice("1"), invoice("1"), invoice("2")]
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_skips_fetch_when_stopping_during_memory_wait():
+    """Test that a run still waiting for memory when a shutdown is requested does not fetch."""
+    bamboorose_client = FakeBambooroseClient("us", soap_body("1"))
+    budget = ByteBudget(10)
+    budget.charge(10)
+    shutdown = GracefulShutdown()
+
+    task = asyncio.create_task(
+        process_invoices(
+            bamboorose_client, RecordingKafkaClient(), memory_budget=budget, shutdown=shutdown
+        )
+    )
+    await wait_until(lambda: budget.waiting)
+    shutdown.request_stop()
+    budget.release(10)
+    summary = await task
+
+    assert bamboorose_client.windows == []
+    assert "invoices_fetched" not in summary.as_extra()
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_skips_fetch_when_stopping_during_turn_wait():
+    """Test that a run still waiting for its fetch turn when a shutdown is requested does not fetch."""
+    bamboorose_client = FakeBambooroseClient("us", soap_body("1"))
+    scheduler = FairScheduler(1)
+    await scheduler.acquire("eu")
+    shutdown = GracefulShutdown()
+
+    task = asyncio.create_task(
+        process_invoices(
+            bamboorose_client, RecordingKafkaClient(), scheduler=scheduler, shutdown=shutdown
+        )
+    )
+    for _ in range(5):
+        await asyncio.sleep(0)
+    shutdown.request_stop()
+    scheduler.release()
+    summary = await task
+
+    assert bamboorose_client.windows == []
+    assert "invoices_fetched" not in summary.as_extra()
+    assert scheduler.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_counts_drained_and_abandoned_invoices():
+    """Test that a batch cut short during shutdown counts what it drained and abandoned, and resumes later."""
+    checkpoints = CheckpointStore()
+    bamboorose_client = FakeBambooroseClient("us", soap_body("1", "2", "3", "4", "5", "6"))
+    kafka_producer_client = RecordingKafkaClient()
+    kafka_producer_client.stalled = {"5": asyncio.Event()}
+    shutdown = GracefulShutdown()
+    get_invoices = bamboorose_client.get_invoices
+
+    async def get_invoices_then_stop(available_timestamp: str) -> SimpleNamespace:
+        # The shutdown is requested once the window has been fetched.
+        response = await get_invoices(available_timestamp)
+        shutdown.request_stop()
+        return response
+
+    bamboorose_client.get_invoices = get_invoices_then_stop
+
+    task = asyncio.create_task(
+        process_invoices(
+            bamboorose_client,
+            kafka_producer_client,
+            checkpoints=checkpoints,
+            publish_chunk_size=2,
+            shutdown=shutdown,
+        )
+    )
+    await wait_until(lambda: "5" in kafka_producer_client.waiting)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert (shutdown.drained, shutdown.abandoned) == (4, 2)
+    assert checkpoints.get("us") is None
+
+    kafka_producer_client.stalled = {}
+    summary = await process_invoices(
+        bamboorose_client, kafka_producer_client, checkpoints=checkpoints, publish_chunk_size=2
+    )
+
+    assert summary.as_extra()["invoices_resumed"] == 4
+    assert kafka_producer_client.published == [invoice(invoice_id) for invoice_id in "123456"]
+    assert checkpoints.get("us") is not None
+
+
+@pytest.mark.asyncio
+async def test_drain_cancels_runs_past_the_deadline():
+    """Test that drain lets in-flight runs keep publishing until the deadline, then cancels them."""
+    app = FastAPI()
+    app.state.shutdown = shutdown = GracefulShutdown()
+    app.state.checkpoints = checkpoints = CheckpointStore()
+    kafka_producer_client = RecordingKafkaClient()
+    kafka_producer_client.stalled = {"2": asyncio.Event(), "4": asyncio.Event()}
+    app.state.runs = RunCoordinator(
+        lambda name: process_invoices(
+            FakeBambooroseClient(name, soap_body("1", "2", "3", "4")),
+            kafka_producer_client,
+            checkpoints=checkpoints,
+            publish_chunk_size=1,
+            shutdown=shutdown,
+        )
+    )
+    app.state.invoice_processor_task = asyncio.create_task(shutdown.sleep(3600))
+    run, _ = app.state.runs.start("us", trigger="schedule")
+    await wait_until(lambda: "2" in kafka_producer_client.waiting)
+
+    draining = asyncio.create_task(
+        drain(app, SimpleNamespace(app=SimpleNamespace(shutdown_drain_seconds=0.1)))
+    )
+    await wait_until(lambda: shutdown.stopping)
+    kafka_producer_client.stalled["2"].set()
+    await draining
+
+    assert run.status == "cancelled"
+    assert kafka_producer_client.published == [invoice("1"), invoice("2"), invoice("3")]
+    # The third invoice went out after the stop; the fourth was still waiting at the deadline.
+    assert (shutdown.drained, shutdown.abandoned) == (1, 1)
+    assert checkpoints.get_blob("progress/us") is not None
+    with pytest.raises(RunRejectedError):
+        app.state.runs.start("us", trigger="api")
+
+
+@pytest.mark.asyncio
+async def test_publish_invoices_acknowledges_envelopes_once_published(mocker):
+    """Test that invoices in envelopes are counted, acknowledged and remembered only with their envelope."""
+    envelopes_published_total_mock = mocker.patch("src.app.envelopes_published_total")
+    kafka_produce_failures_total_mock = mocker.patch("src.app.kafka_produce_failures_total")
+    kafka_producer_client = RecordingKafkaClient()
+    kafka_producer_client.failing = {"3"}
+    change_detector = ChangeDetector()
+    progress = BatchProgress("2023-01-01T00:00:00Z")
+
+    stats = await publish_invoices(
+        [invoice(invoice_id) for invoice_id in "12345"],
+        "test-trace-id",
+        kafka_producer_client,
+        change_detector,
+        progress=progress,
+        envelopes=EnvelopeBatcher(2, 256_000),
+    )
+
+    # The last envelope holds a single invoice, so it goes out as a plain message.
+    assert kafka_producer_client.envelopes == [["1", "2"]]
+    assert kafka_producer_client.published == [invoice("5")]
+    assert (stats.published, stats.failed) == (3, 2)
+    envelopes_published_total_mock.inc.assert_called_once_with()
+    kafka_produce_failures_total_mock.inc.assert_called_once_with()
+    saved = BatchProgress.from_bytes(progress.to_bytes())
+    for invoice_id, published in {"1": True, "2": True, "3": False, "4": False, "5": True}.items():
+        digest = fingerprint(invoice(invoice_id))
+        assert saved.was_acknowledged(digest) is published
+        assert change_detector.invoice_unchanged(invoice_id, digest) is published
+
+
+@pytest.mark.asyncio
+async def test_process_invoices_skips_repeated_response():
+    """Test that a response identical to the last completed one is skipped although the window moved on."""
+    checkpoints = CheckpointStore()
+    bamboorose_client = FakeBambooroseClient("us", soap_body("1", "2"))
+    kafka_producer_client = RecordingKafkaClient()
+    change_detector = ChangeDetector()
+
+    for _ in range(2):
+        summary = await process_invoices(
+            bamboorose_client, kafka_producer_client, change_detector=change_detector, checkpoints=checkpoints
+        )
+
+    assert summary.as_extra()["responses_unchanged"] == 1
+    assert bamboorose_client.windows[0] != bamboorose_client.windows[1]
+    assert kafka_producer_client.published == [invoice("1"), invoice("2")]
+    assert checkpoints.get("us") >= bamboorose_client.windows[1]
+
+
+@pytest.mark.asyncio
+async def test_hand_off_during_background_run_keeps_the_gap(ingest_app: FastAPI, mocker):
+    """Test that a background run outpaced by a later hand-off continues from its fetch instead of finishing."""
+    checkpoints = ingest_app.state.checkpoints
+    checkpoints.set("us", "2024-01-01T00:00:00Z")
+    checkpoints.set("us:background", "2023-01-01T00:00:00Z")
+    kafka_producer_client = ingest_app.state.kafka_producer_client = RecordingKafkaClient()
+    kafka_producer_client.stalled = {"1": asyncio.Event()}
+    # The background run fetched long ago; later fetches happen now.
+    fetch_times = iter(["2024-06-01T00:00:00Z"])
+    mocker.patch(
+        "src.app._utc_timestamp",
+        side_effect=lambda: next(
+            fetch_times, datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        ),
+    )
+
+    background, _ = ingest_app.state.runs.start("us:background", trigger="schedule")
+    await wait_until(lambda: "1" in kafka_producer_client.waiting)
+    live = asyncio.create_task(run_source(ingest_app, "us"))
+    await wait_until(lambda: checkpoints.get("us") > "2024-06-01T00:00:00Z")
+    kafka_producer_client.stalled["1"].set()
+    await live
+    await ingest_app.state.runs.wait(background)
+
+    assert background.status == "succeeded"
+    assert checkpoints.get("us:background") == "2024-06-01T00:00:00Z"
+    assert ingest_app.state.backlog.lag_seconds("us:background") > 0
@@ -6,7 +6,7 @@ from unittest import mock
 import pytest
 from pydantic import ValidationError
 
-from src.settings.config import get_settings
+from src.settings.config import get_settings, get_source_settings
 
 
 @pytest.fixture(autouse=True)
@@ -84,4 +84,86 @@ def test_app_settings_defaults(mocker):
     settings = get_settings()
     assert settings.bamboorose.api_timeout == 60
     assert settings.kafka.producer_topic == "x35-invoice-events"
+    assert settings.app.poll_interval_seconds == 300
+    assert settings.app.skip_unchanged is False
+    assert settings.archive.enabled is False
 
+
+
+def test_source_settings_default_to_single_source(mocker):
+    """Test that without BAMBOOROSE_SOURCES a single source is built from the api_* settings."""
+    mocker.patch.dict(
+        os.environ,
+        {
+            "BAMBOOROSE_API_URL": "https://test.com",
+            "BAMBOOROSE_API_USERNAME": "test_user",
+            "BAMBOOROSE_API_PASSWORD": "test_password",
+            "X35_KAFKA_BOOTSTRAP_SERVERS": "kafka:9092",
+            "X35_KAFKA_API_KEY": "kafka_key",
+            "X35_KAFKA_API_SECRET": "kafka_secret",
+        },
+    )
+    (source,) = get_source_settings(get_settings())
+    assert source.name == "default"
+    assert source.api_url == "https://test.com"
+    assert source.producer_topic == "x35-invoice-events"
+    assert source.poll_interval_seconds == 300
+
+
+def test_source_settings_load_from_json(mocker):
+    """Test that BAMBOOROSE_SOURCES configures multiple sources with their own overrides."""
+    mocker.patch.dict(
+        os.environ,
+        {
+            "BAMBOOROSE_API_URL": "https://test.com",
+            "BAMBOOROSE_API_USERNAME": "test_user",
+            "BAMBOOROSE_API_PASSWORD": "test_password",
+            "BAMBOOROSE_SOURCES": (
+                '[{"name": "us", "api_url": "https://us.test.com", "api_username": "us",'
+                ' "api_password": "us"},'
+                ' {"name": "eu", "api_url": "https://eu.test.com", "api_username": "eu",'
+                ' "api_password": "eu", "producer_topic": "eu-topic", "poll_interval_seconds": 60}]'
+            ),
+            "X35_KAFKA_BOOTSTRAP_SERVERS": "kafka:9092",
+            "X35_KAFKA_API_KEY": "kafka_key",
+            "X35_KAFKA_API_SECRET": "kafka_secret",
+        },
+    )
+    us, eu = get_source_settings(get_settings())
+    assert (us.name, us.producer_topic, us.poll_interval_seconds) == ("us", "x35-invoice-events", 300)
+    assert (eu.name, eu.producer_topic, eu.poll_interval_seconds) == ("eu", "eu-topic", 60)
+
+
+def test_source_settings_do_not_need_api_settings(mocker):
+    """Test that the api_* settings are optional when BAMBOOROSE_SOURCES defines every source."""
+    mocker.patch.dict(
+        os.environ,
+        {
+            "BAMBOOROSE_SOURCES": (
+                '[{"name": "us", "api_url": "https://us.test.com", "api_username": "us",'
+                ' "api_password": "us"}]'
+            ),
+            "X35_KAFKA_BOOTSTRAP_SERVERS": "kafka:9092",
+            "X35_KAFKA_API_KEY": "kafka_key",
+            "X35_KAFKA_API_SECRET": "kafka_secret",
+        },
+    )
+    settings = get_settings()
+
+    assert settings.bamboorose.api_url is None
+    assert [source.name for source in get_source_settings(settings)] == ["us"]
+
+
+def test_api_settings_required_without_sources(mocker):
+    """Test that the api_* settings are required when no BAMBOOROSE_SOURCES are set."""
+    mocker.patch.dict(
+        os.environ,
+        {
+            "BAMBOOROSE_API_URL": "https://test.com",
+            "X35_KAFKA_BOOTSTRAP_SERVERS": "kafka:9092",
+            "X35_KAFKA_API_KEY": "kafka_key",
+            "X35_KAFKA_API_SECRET": "kafka_secret",
+        },
+    )
+    with pytest.raises(ValidationError, match="BAMBOOROSE_API_USERNAME, BAMBOOROSE_API_PASSWORD"):
+        get_settings()